@@ -14,7 +14,7 @@ from routes.organizations import organization_bp
 from dotenv import load_dotenv
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     load_dotenv()
     
@@ -126,6 +126,17 @@ def create_app():
             "connect_args": {"timeout": 10}
         }
         print(f"⚠️  Using SQLite database (local development)")
+
+    # Overrides for tests (e.g. a temporary SQLALCHEMY_DATABASE_URI), applied before extensions read the config
+    if test_config:
+        app.config.update(test_config)
+
+    # Background jobs get their own, separately sized pool; both pools record checkout waits
+    from utils.db_pools import JOBS_BIND, jobs_engine_options, timed_pool_class
+    app.config["SQLALCHEMY_BINDS"] = {
+        JOBS_BIND: jobs_engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+    }
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["poolclass"] = timed_pool_class("web")
     # Load the secret key from the environment variable
     app.config["SECRET_KEY"] = os.environ.get("FLASK_SECRET_KEY")
     app.config["MAIL_SERVER"] = os.environ.get("MAIL_SERVER")
@@ -135,6 +146,8 @@ def create_app():
     app.config["MAIL_USERNAME"] = os.environ.get("MAIL_USERNAME")
     app.config["MAIL_PASSWORD"] = os.environ.get("MAIL_PASSWORD")
     app.config["MAIL_DEFAULT_SENDER"] = os.environ.get("VERIFIED_EMAIL")
+    # bcrypt work factor; existing hashes are upgraded on their owner's next login
+    app.config["BCRYPT_LOG_ROUNDS"] = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
     # Initialize extensions
     db.init_app(app)
     bcrypt.init_app(app)
@@ -143,6 +156,9 @@ def create_app():
     migrate.init_app(app, db, directory=migrations_dir)
     mail.init_app(app)
 
+    from utils.rate_limiter import init_rate_limiter
+    init_rate_limiter(app)
+
    
 
     # Register blueprints
@@ -151,6 +167,12 @@ def create_app():
     app.register_blueprint(chat_bp)
     app.register_blueprint(organization_bp)
 
+    from utils.password_hashing import PasswordHashingBusy, busy_response
+
+    @app.errorhandler(PasswordHashingBusy)
+    def password_hashing_busy(e):
+        return busy_response()
+
     # Start reminder scheduler (only in main process, not in reloader)
     if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         from scheduler import init_scheduler
@@ -1,7 +1,7 @@
 # Decorator to protect routes based on user roles.
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt
+from utils.auth_context import auth_required, current_claims
 
 
 def role_required(*required_roles):
@@ -11,11 +11,10 @@ def role_required(*required_roles):
     """
     def decorator(f):
         @wraps(f)
-        @jwt_required()
+        @auth_required
         def decorated_function(*args, **kwargs):
             try:
-                jwt_data = get_jwt()
-                user_role = jwt_data.get('role')
+                user_role = current_claims().get('role')
                 
                 if not user_role:
                     return jsonify({"error": "No role found in token"}), 403
@@ -1,12 +1,36 @@
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
 
 
-db = SQLAlchemy()
+class BindAwareSession(Session):
+    """Session that sends every query to session.info["bind_key"] when it is set"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        bind_key = self.info.get("bind_key")
+        if bind is None and bind_key is not None:
+            return self._db.engines[bind_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": BindAwareSession})
 bcrypt = Bcrypt()
 jwt = JWTManager()
 migrate = Migrate()
 mail = Mail()
+
+
+@jwt.token_in_blocklist_loader
+def _token_is_revoked(jwt_header, jwt_payload):
+    from utils.token_blocklist import revocation_list
+    from utils.token_versions import is_stale
+    return revocation_list.is_revoked(jwt_payload.get("jti")) or is_stale(jwt_payload)
+
+
+@jwt.revoked_token_loader
+def _revoked_token_response(jwt_header, jwt_payload):
+    from flask import jsonify
+    return jsonify({"error": "Your session is no longer valid. Please log in again."}), 401
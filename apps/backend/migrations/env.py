@@ -71,6 +71,10 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the reminder job store manages its own table
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'table' and name == 'apscheduler_jobs')
+
     connectable = current_app.extensions['migrate'].db.get_engine()
 
     with connectable.connect() as connection:
@@ -78,6 +82,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
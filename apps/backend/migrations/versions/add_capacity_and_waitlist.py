@@ -0,0 +1,46 @@
+"""Add capacity to Event and waitlist tracking to EventInvitation
+
+Revision ID: c4a9d2e7f318
+Revises: b7e3c4f5a123
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9d2e7f318'
+down_revision = 'b7e3c4f5a123'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Null capacity means unlimited, so existing events keep accepting everyone
+    op.add_column('event', sa.Column('max_capacity', sa.Integer(), nullable=True))
+    op.add_column('event', sa.Column('seats_taken', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('event_invitation', sa.Column('waitlisted_at', sa.DateTime(), nullable=True))
+
+    # Backfill seat counts from guests who already accepted
+    op.execute("""
+        UPDATE event SET seats_taken = (
+            SELECT COUNT(*) FROM event_invitation
+            WHERE event_invitation.event_id = event.id
+            AND event_invitation.status = 'accepted'
+        )
+    """)
+
+    # Supports the FIFO waitlist lookup per event
+    op.create_index(
+        'ix_event_invitation_waitlist',
+        'event_invitation',
+        ['event_id', 'status', 'waitlisted_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_event_invitation_waitlist', table_name='event_invitation')
+    op.drop_column('event_invitation', 'waitlisted_at')
+    op.drop_column('event', 'seats_taken')
+    op.drop_column('event', 'max_capacity')
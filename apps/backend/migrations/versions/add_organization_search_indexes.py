@@ -0,0 +1,41 @@
+"""Add organization name indexes; search falls back to an in-process index off Postgres
+
+Revision ID: f2c8e4a61b97
+Revises: e5b9c3d17a24
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8e4a61b97'
+down_revision = 'e5b9c3d17a24'
+branch_labels = None
+depends_on = None
+
+USER_SEARCH_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade():
+    # Case-insensitive name uniqueness checks
+    op.create_index('ix_organization_name_lower', 'organization', [sa.text('lower(name)')])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            'CREATE INDEX ix_organization_name_search ON organization USING gin (lower(name) gin_trgm_ops)'
+        )
+    else:
+        # Searches no longer use the prefix indexes outside Postgres
+        for column in USER_SEARCH_COLUMNS:
+            op.drop_index(f'ix_user_{column}_search', table_name='user')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_organization_name_search', table_name='organization')
+    else:
+        for column in USER_SEARCH_COLUMNS:
+            op.create_index(f'ix_user_{column}_search', 'user', [sa.text(f'lower({column})')])
+    op.drop_index('ix_organization_name_lower', table_name='organization')
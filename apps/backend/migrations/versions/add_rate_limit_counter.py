@@ -0,0 +1,30 @@
+"""Add rate_limit_counter table for the shared rate-limit store
+
+Revision ID: a6d0e4c93b18
+Revises: f3c8a1d2b957
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d0e4c93b18'
+down_revision = 'f3c8a1d2b957'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'rate_limit_counter',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('window_start', sa.BigInteger(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('key', 'window_start'),
+    )
+
+
+def downgrade():
+    op.drop_table('rate_limit_counter')
@@ -0,0 +1,30 @@
+"""Add expires_at to rate_limit_counter for sweeping expired windows
+
+Revision ID: b81f5c2e7d40
+Revises: a6d0e4c93b18
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f5c2e7d40'
+down_revision = 'a6d0e4c93b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Counters are disposable, so existing rows are dropped rather than backfilled
+    op.execute('DELETE FROM rate_limit_counter')
+    with op.batch_alter_table('rate_limit_counter') as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.BigInteger(), nullable=False))
+    op.create_index('ix_rate_limit_counter_expires_at', 'rate_limit_counter', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_rate_limit_counter_expires_at', table_name='rate_limit_counter')
+    with op.batch_alter_table('rate_limit_counter') as batch_op:
+        batch_op.drop_column('expires_at')
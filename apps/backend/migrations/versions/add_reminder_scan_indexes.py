@@ -0,0 +1,27 @@
+"""Add indexes for the windowed reminder scan
+
+Revision ID: d81f3b6a0c52
+Revises: c4a9d2e7f318
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f3b6a0c52'
+down_revision = 'c4a9d2e7f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Range scan on event start for each reminder window
+    op.create_index('ix_event_date_time', 'event', ['date', 'time'])
+    # Join from the in-window events to their accepted invitations
+    op.create_index('ix_event_invitation_event_status', 'event_invitation', ['event_id', 'status'])
+
+
+def downgrade():
+    op.drop_index('ix_event_invitation_event_status', table_name='event_invitation')
+    op.drop_index('ix_event_date_time', table_name='event')
@@ -0,0 +1,125 @@
+"""Replace per-invitation reminder flags with a reminder_schedule table
+
+Revision ID: f3c8a1d2b957
+Revises: e2b7c9f41a06
+Create Date: 2026-10-19
+
+"""
+from datetime import datetime, timedelta, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d2b957'
+down_revision = 'e2b7c9f41a06'
+branch_labels = None
+depends_on = None
+
+# (offset in minutes, flag it replaces)
+LEGACY_OFFSETS = [(24 * 60, 'reminder_24h_sent'), (60, 'reminder_1h_sent')]
+
+
+def _invitation_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('event_invitation')}
+
+
+def upgrade():
+    op.add_column('organization', sa.Column('reminder_offsets', sa.JSON(), nullable=True))
+    op.add_column('event', sa.Column('reminder_offsets', sa.JSON(), nullable=True))
+
+    op.create_table(
+        'reminder_schedule',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('invitation_id', sa.Integer(), sa.ForeignKey('event_invitation.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_id', sa.Integer(), sa.ForeignKey('event.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('offset_minutes', sa.Integer(), nullable=False),
+        sa.Column('due_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('invitation_id', 'offset_minutes', name='uq_reminder_schedule_invitation_offset'),
+    )
+    op.create_index(
+        'ix_reminder_schedule_unsent_due',
+        'reminder_schedule',
+        ['due_at'],
+        postgresql_where=sa.text('sent_at IS NULL'),
+        sqlite_where=sa.text('sent_at IS NULL'),
+    )
+    op.create_index('ix_reminder_schedule_event', 'reminder_schedule', ['event_id'])
+
+    # Carry pending and sent reminders of upcoming events over from the flags
+    legacy_flags = [flag for _offset, flag in LEGACY_OFFSETS if flag in _invitation_columns()]
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    event = sa.table(
+        'event',
+        sa.column('id', sa.Integer),
+        sa.column('starts_at', sa.DateTime),
+        sa.column('deleted_at', sa.DateTime),
+    )
+    invitation = sa.table(
+        'event_invitation',
+        sa.column('id', sa.Integer),
+        sa.column('event_id', sa.Integer),
+        sa.column('status', sa.String),
+        *[sa.column(flag, sa.Boolean) for flag in legacy_flags]
+    )
+    reminder = sa.table(
+        'reminder_schedule',
+        sa.column('invitation_id', sa.Integer),
+        sa.column('event_id', sa.Integer),
+        sa.column('offset_minutes', sa.Integer),
+        sa.column('due_at', sa.DateTime),
+        sa.column('sent_at', sa.DateTime),
+    )
+    accepted = bind.execute(
+        sa.select(invitation, event.c.starts_at)
+        .join(event, invitation.c.event_id == event.c.id)
+        .where(
+            invitation.c.status == 'accepted',
+            event.c.deleted_at.is_(None),
+            event.c.starts_at > now,
+        )
+    ).mappings().fetchall()
+
+    rows = []
+    for row in accepted:
+        for offset, flag in LEGACY_OFFSETS:
+            due_at = row['starts_at'] - timedelta(minutes=offset)
+            sent = bool(row.get(flag))
+            if due_at <= now and not sent:
+                continue
+            rows.append({
+                'invitation_id': row['id'],
+                'event_id': row['event_id'],
+                'offset_minutes': offset,
+                'due_at': due_at,
+                'sent_at': now if sent else None,
+            })
+    if rows:
+        bind.execute(reminder.insert(), rows)
+
+    with op.batch_alter_table('event_invitation') as batch_op:
+        for flag in legacy_flags:
+            batch_op.drop_column(flag)
+
+
+def downgrade():
+    with op.batch_alter_table('event_invitation') as batch_op:
+        batch_op.add_column(sa.Column('reminder_24h_sent', sa.Boolean(), nullable=True, server_default=sa.false()))
+        batch_op.add_column(sa.Column('reminder_1h_sent', sa.Boolean(), nullable=True, server_default=sa.false()))
+
+    for offset, flag in LEGACY_OFFSETS:
+        op.execute(
+            f"UPDATE event_invitation SET {flag} = TRUE WHERE id IN ("
+            f"SELECT invitation_id FROM reminder_schedule "
+            f"WHERE offset_minutes = {offset} AND sent_at IS NOT NULL)"
+        )
+
+    op.drop_index('ix_reminder_schedule_event', table_name='reminder_schedule')
+    op.drop_index('ix_reminder_schedule_unsent_due', table_name='reminder_schedule')
+    op.drop_table('reminder_schedule')
+    op.drop_column('event', 'reminder_offsets')
+    op.drop_column('organization', 'reminder_offsets')
@@ -0,0 +1,37 @@
+"""Add revoked_token table for logout and token revocation
+
+Revision ID: d7a3f1b28e56
+Revises: c4e2a7f90d13
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f1b28e56'
+down_revision = 'c4e2a7f90d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'revoked_token',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jti', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('jti')
+    )
+    op.create_index('ix_revoked_token_expires_at', 'revoked_token', ['expires_at'])
+    op.create_index('ix_revoked_token_revoked_at', 'revoked_token', ['revoked_at'])
+
+
+def downgrade():
+    op.drop_index('ix_revoked_token_revoked_at', table_name='revoked_token')
+    op.drop_index('ix_revoked_token_expires_at', table_name='revoked_token')
+    op.drop_table('revoked_token')
@@ -0,0 +1,36 @@
+"""Add scheduler_run table so every process's job runs feed the metrics
+
+Revision ID: c6f1a8d3e502
+Revises: b3e7f5a9c264
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8d3e502'
+down_revision = 'b3e7f5a9c264'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scheduler_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job', sa.String(length=50), nullable=False),
+        sa.Column('pid', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('stats', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_scheduler_run_started_at', 'scheduler_run', ['started_at'])
+
+
+def downgrade():
+    op.drop_index('ix_scheduler_run_started_at', table_name='scheduler_run')
+    op.drop_table('scheduler_run')
@@ -0,0 +1,33 @@
+"""Add prefix indexes for search words too short for trigrams
+
+Revision ID: d8b2e4f6a371
+Revises: c6f1a8d3e502
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b2e4f6a371'
+down_revision = 'c6f1a8d3e502'
+branch_labels = None
+depends_on = None
+
+USER_SEARCH_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade():
+    # Words of one or two characters have no trigrams and are matched as
+    # prefixes (LIKE 'ab%'), which a text_pattern_ops btree serves in any collation
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in USER_SEARCH_COLUMNS:
+            op.execute(f'CREATE INDEX ix_user_{column}_prefix ON "user" (lower({column}) text_pattern_ops)')
+        op.execute('CREATE INDEX ix_organization_name_prefix ON organization (lower(name) text_pattern_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_organization_name_prefix', table_name='organization')
+        for column in USER_SEARCH_COLUMNS:
+            op.drop_index(f'ix_user_{column}_prefix', table_name='user')
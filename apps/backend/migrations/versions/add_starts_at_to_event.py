@@ -0,0 +1,51 @@
+"""Add precomputed starts_at and ends_at to Event
+
+Revision ID: e2b7c9f41a06
+Revises: d81f3b6a0c52
+Create Date: 2026-10-19
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c9f41a06'
+down_revision = 'd81f3b6a0c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('event', sa.Column('starts_at', sa.DateTime(), nullable=True))
+    op.add_column('event', sa.Column('ends_at', sa.DateTime(), nullable=True))
+
+    # Backfill starts_at from date + time in Python so it works on SQLite and PostgreSQL alike
+    bind = op.get_bind()
+    event = sa.table(
+        'event',
+        sa.column('id', sa.Integer),
+        sa.column('date', sa.Date),
+        sa.column('time', sa.Time),
+        sa.column('starts_at', sa.DateTime),
+    )
+    rows = bind.execute(sa.select(event.c.id, event.c.date, event.c.time)).fetchall()
+    for row in rows:
+        bind.execute(
+            event.update()
+            .where(event.c.id == row.id)
+            .values(starts_at=datetime.combine(row.date, row.time))
+        )
+
+    # starts_at replaces the (date, time) index for reminders, listings and cursors
+    op.drop_index('ix_event_date_time', table_name='event')
+    op.create_index('ix_event_starts_at', 'event', ['starts_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_event_starts_at', table_name='event')
+    op.create_index('ix_event_date_time', 'event', ['date', 'time'])
+    op.drop_column('event', 'ends_at')
+    op.drop_column('event', 'starts_at')
@@ -0,0 +1,39 @@
+"""Add keyset and search indexes for the admin user list
+
+Revision ID: e5b9c3d17a24
+Revises: d7a3f1b28e56
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c3d17a24'
+down_revision = 'd7a3f1b28e56'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade():
+    op.create_index('ix_user_created_at', 'user', ['created_at', 'id'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Trigram GIN indexes serve substring (ILIKE '%..%') searches
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in SEARCH_COLUMNS:
+            op.execute(
+                f'CREATE INDEX ix_user_{column}_search ON "user" USING gin (lower({column}) gin_trgm_ops)'
+            )
+    else:
+        for column in SEARCH_COLUMNS:
+            op.create_index(f'ix_user_{column}_search', 'user', [sa.text(f'lower({column})')])
+
+
+def downgrade():
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_user_{column}_search', table_name='user')
+    op.drop_index('ix_user_created_at', table_name='user')
@@ -0,0 +1,26 @@
+"""Add token_version to user so role and organization changes invalidate tokens
+
+Revision ID: c4e2a7f90d13
+Revises: b81f5c2e7d40
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e2a7f90d13'
+down_revision = 'b81f5c2e7d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('token_version')
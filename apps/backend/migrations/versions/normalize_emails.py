@@ -0,0 +1,149 @@
+"""Normalize stored emails to trimmed lower case, dedupe, and index them
+
+Revision ID: b3e7f5a9c264
+Revises: a9d4e6c2f813
+Create Date: 2026-10-19
+
+Users, organization invitations and event invitations are looked up by email
+with plain equality from now on, so every stored address is normalized here.
+
+User accounts that collide once normalized are not merged: they may belong to
+different organizations and roles, so the migration aborts with the list of
+conflicting emails and their accounts before changing anything. Resolve them
+(delete or re-address the extra accounts) and run the upgrade again.
+
+Invitations that collide are merged:
+
+- organization_invitation: of several open invitations to one organization, the
+  newest is kept
+- event_invitation: per event and guest the most advanced response is kept
+  (accepted, then waitlisted, declined, pending; oldest first), and the event's
+  seats_taken is recounted
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7f5a9c264'
+down_revision = 'a9d4e6c2f813'
+branch_labels = None
+depends_on = None
+
+STATUS_PRIORITY = {'accepted': 0, 'waitlisted': 1, 'declined': 2, 'pending': 3}
+
+
+def _normalize(email):
+    return (email or '').strip().lower()
+
+
+def _duplicate_groups(rows, key):
+    """Rows grouped by key, only groups with more than one row"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def _delete_ids(bind, table, ids):
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        bind.execute(
+            sa.text(f'DELETE FROM {table} WHERE id IN :ids').bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': ids[start:start + 500]}
+        )
+
+
+def _check_user_conflicts(bind):
+    """Abort if two accounts share an email once normalized; they need an operator"""
+    rows = bind.execute(sa.text('SELECT id, email, role, organization_id FROM "user"')).all()
+    groups = sorted(_duplicate_groups(rows, lambda row: _normalize(row.email)), key=lambda group: _normalize(group[0].email))
+    if not groups:
+        return
+
+    lines = []
+    for group in groups:
+        accounts = ', '.join(
+            f"id {row.id} ({row.email!r}, {row.role}, organization {row.organization_id})"
+            for row in sorted(group, key=lambda row: row.id)
+        )
+        lines.append(f"  {_normalize(group[0].email)}: {accounts}")
+    raise RuntimeError(
+        f"{len(groups)} emails are shared by several accounts once normalized. Resolve them and "
+        "run the upgrade again:\n" + '\n'.join(lines)
+    )
+
+
+def _dedupe_organization_invitations(bind):
+    rows = bind.execute(sa.text(
+        'SELECT id, email, organization_id FROM organization_invitation WHERE is_accepted = :accepted'
+    ), {'accepted': False}).all()
+    duplicate_ids = []
+    for group in _duplicate_groups(rows, lambda row: (row.organization_id, _normalize(row.email))):
+        duplicate_ids.extend(row.id for row in sorted(group, key=lambda row: row.id)[:-1])
+    _delete_ids(bind, 'organization_invitation', duplicate_ids)
+    return len(duplicate_ids)
+
+
+def _dedupe_event_invitations(bind):
+    rows = bind.execute(sa.text('SELECT id, event_id, guest_email, status FROM event_invitation')).all()
+    duplicate_ids = []
+    event_ids = set()
+    for group in _duplicate_groups(rows, lambda row: (row.event_id, _normalize(row.guest_email))):
+        ranked = sorted(group, key=lambda row: (STATUS_PRIORITY.get(row.status, len(STATUS_PRIORITY)), row.id))
+        duplicate_ids.extend(row.id for row in ranked[1:])
+        event_ids.add(group[0].event_id)
+
+    if duplicate_ids:
+        for start in range(0, len(duplicate_ids), 500):
+            bind.execute(
+                sa.text('DELETE FROM reminder_schedule WHERE invitation_id IN :ids')
+                .bindparams(sa.bindparam('ids', expanding=True)),
+                {'ids': duplicate_ids[start:start + 500]}
+            )
+        _delete_ids(bind, 'event_invitation', duplicate_ids)
+        bind.execute(
+            sa.text(
+                "UPDATE event SET seats_taken = (SELECT COUNT(*) FROM event_invitation "
+                "WHERE event_invitation.event_id = event.id AND event_invitation.status = 'accepted') "
+                "WHERE id IN :ids"
+            ).bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': list(event_ids)}
+        )
+    return len(duplicate_ids)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    _check_user_conflicts(bind)
+    removed_org_invitations = _dedupe_organization_invitations(bind)
+    removed_event_invitations = _dedupe_event_invitations(bind)
+    print(
+        f"Email dedupe: {removed_org_invitations} organization invitations, "
+        f"{removed_event_invitations} event invitations removed"
+    )
+
+    op.execute('UPDATE "user" SET email = LOWER(TRIM(email))')
+    op.execute('UPDATE organization_invitation SET email = LOWER(TRIM(email))')
+    op.execute('UPDATE event_invitation SET guest_email = LOWER(TRIM(guest_email))')
+
+    op.create_index('ix_organization_invitation_email', 'organization_invitation', ['email', 'organization_id'])
+    op.create_index(
+        'uq_organization_invitation_pending',
+        'organization_invitation',
+        ['organization_id', 'email'],
+        unique=True,
+        postgresql_where=sa.text('is_accepted = false'),
+        sqlite_where=sa.text('is_accepted = 0'),
+    )
+    with op.batch_alter_table('event_invitation') as batch_op:
+        batch_op.create_unique_constraint('uq_event_invitation_event_guest_email', ['event_id', 'guest_email'])
+
+
+def downgrade():
+    # Normalized addresses and merged invitations are kept; only the indexes go
+    with op.batch_alter_table('event_invitation') as batch_op:
+        batch_op.drop_constraint('uq_event_invitation_event_guest_email', type_='unique')
+    op.drop_index('uq_organization_invitation_pending', table_name='organization_invitation')
+    op.drop_index('ix_organization_invitation_email', table_name='organization_invitation')
@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 import os
-from extensions import db, bcrypt
+from extensions import db
 from flask_jwt_extended import create_access_token
 from itsdangerous import URLSafeTimedSerializer
-from sqlalchemy import func
+from sqlalchemy import and_, case, delete, event, exists, func, insert, inspect, or_, update
+from sqlalchemy.orm import validates
+from utils.password_hashing import hash_password, needs_rehash, verify_password
+from utils.validators import normalize_email
 
 
 class UserRole(Enum):
@@ -24,6 +27,10 @@ class EventCategory(Enum):
     OTHER = "other"
 
 
+# Minutes before an event starts at which accepted guests get a reminder
+DEFAULT_REMINDER_OFFSETS = [24 * 60, 60]
+
+
 class Organization(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(
@@ -38,9 +45,28 @@ class Organization(db.Model):
     events = db.relationship(
         "Event", backref="organization", lazy=True
     )  # Relationship to events
+    reminder_offsets = db.Column(db.JSON(none_as_null=True), nullable=True)  # Minutes before start; null = default
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     deleted_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        # Case-insensitive name checks (func.lower(name) == ...)
+        db.Index('ix_organization_name_lower', func.lower(name)),
+        # Fuzzy name search (utils/search.py); other databases use an in-process index
+        db.Index(
+            'ix_organization_name_search',
+            func.lower(name).label('name'),
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+        # Prefix matches of search words too short for trigrams
+        db.Index(
+            'ix_organization_name_prefix',
+            func.lower(name).label('name'),
+            postgresql_ops={'name': 'text_pattern_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
+
     def __init__(self, name, description=None):
         self.name = name
         self.description = description
@@ -60,6 +86,7 @@ class Organization(db.Model):
             'id': self.id,
             'name': self.name,
             'description': self.description,
+            'reminder_offsets': self.reminder_offsets,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None,
             'is_deleted': self.is_deleted
@@ -130,6 +157,38 @@ class Organization(db.Model):
         except ValueError as e:
             return False, str(e)
 
+    @classmethod
+    def detach_members(cls, org_id, limit=None, user_ids=None):
+        """
+        Remove members from the organization with one UPDATE: organization_id
+        is cleared, organizers and team members become guests and their tokens
+        are invalidated. At most limit members, or only user_ids if given.
+        Returns the ids of the detached users (caller commits).
+        """
+        query = db.select(User.id).where(User.organization_id == org_id)
+        if user_ids is not None:
+            query = query.where(User.id.in_(user_ids))
+        if limit is not None:
+            query = query.order_by(User.id).limit(limit)
+        detached_ids = db.session.execute(query).scalars().all()
+        if not detached_ids:
+            return []
+
+        db.session.execute(
+            update(User).where(User.id.in_(detached_ids)).values(
+                organization_id=None,
+                role=case(
+                    (User.role.in_([UserRole.ORGANIZER.value, UserRole.TEAM_MEMBER.value]), UserRole.GUEST.value),
+                    else_=User.role
+                ),
+                # Bulk updates skip the before_flush hook, so bump versions here
+                token_version=User.token_version + 1
+            ),
+            execution_options={"synchronize_session": "fetch"}
+        )
+        db.session.info.setdefault("token_versions_bumped", set()).update(detached_ids)
+        return detached_ids
+
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -143,9 +202,35 @@ class User(db.Model):
     )
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     pending_organizer_approval = db.Column(db.Boolean, default=False)
+    # Bumped on every role or organization change; tokens carrying an older value are rejected
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     events = db.relationship("Event", backref="organizer", lazy=True)
 
+    __table_args__ = (
+        # Keyset pagination of the admin user list (newest first)
+        db.Index('ix_user_created_at', 'created_at', 'id'),
+        # Fuzzy name and email search (utils/search.py); other databases use an in-process index
+        *(
+            db.Index(
+                f'ix_user_{name}_search',
+                func.lower(column).label(name),
+                postgresql_using='gin',
+                postgresql_ops={name: 'gin_trgm_ops'},
+            ).ddl_if(dialect='postgresql')
+            for name, column in (('first_name', first_name), ('last_name', last_name), ('email', email))
+        ),
+        # Prefix matches of search words too short for trigrams
+        *(
+            db.Index(
+                f'ix_user_{name}_prefix',
+                func.lower(column).label(name),
+                postgresql_ops={name: 'text_pattern_ops'},
+            ).ddl_if(dialect='postgresql')
+            for name, column in (('first_name', first_name), ('last_name', last_name), ('email', email))
+        ),
+    )
+
     def __init__(
         self,
         email,
@@ -159,7 +244,7 @@ class User(db.Model):
         self.first_name = first_name
         self.last_name = last_name
         self.email = email
-        self.password = bcrypt.generate_password_hash(password).decode("utf-8")
+        self.set_password(password)
         self.role = role
         self.pending_organizer_approval = pending_organizer_approval
         if role == UserRole.ADMIN.value:
@@ -167,17 +252,32 @@ class User(db.Model):
         else:
             self.organization_id = organization_id
 
+    @validates("email")
+    def _normalize_email(self, key, email):
+        # Stored normalized so lookups can compare directly and use the unique index
+        return normalize_email(email)
+
+    def set_password(self, password):
+        self.password = hash_password(password)
+
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password, password)
+        return verify_password(self.password, password)
+
+    def password_needs_rehash(self):
+        """Whether the stored hash uses a different bcrypt cost than configured"""
+        return needs_rehash(self.password)
 
     def generate_token(self, expires_delta=None):
         if expires_delta is None:
             expires_delta = timedelta(days=1)
         
-        # Create additional claims for user data
+        # Create additional claims for user data; authorization relies on these
+        # staying current, which token_version guarantees
         additional_claims = {
             "user_id": self.id,
-            "role": self.role
+            "role": self.role,
+            "organization_id": self.organization_id,
+            "token_version": self.token_version or 0
         }
         
         # Use email as the subject (must be a string)
@@ -188,9 +288,14 @@ class User(db.Model):
         )
 
     def generate_reset_token(self, expires_sec=1800):
+        return User.reset_token_for_email(self.email)
+
+    @staticmethod
+    def reset_token_for_email(email):
+        """Password reset token for an account, without loading it"""
         secret_key = os.environ.get("FLASK_SECRET_KEY")
         s = URLSafeTimedSerializer(secret_key)
-        return s.dumps(self.email, salt="password-reset-salt")
+        return s.dumps(email, salt="password-reset-salt")
 
     @staticmethod
     def verify_reset_token(token, expires_sec=1800):
@@ -200,7 +305,99 @@ class User(db.Model):
             email = s.loads(token, salt="password-reset-salt", max_age=expires_sec)
         except Exception:
             return None
-        return User.query.filter_by(email=email).first()
+        return User.query.filter_by(email=normalize_email(email)).first()
+
+    @classmethod
+    def delete_with_dependents(cls, user_id):
+        """
+        Delete the user with set-based statements (caller commits): their events
+        with those events' invitations and reminder rows, then the user. If they
+        were the last organizer of their organization, it is soft-deleted.
+        Returns whether an organization was soft-deleted.
+        """
+        user = db.session.execute(
+            db.select(cls.role, cls.organization_id).where(cls.id == user_id)
+        ).one()
+
+        organization_deleted = False
+        if user.organization_id and user.role == UserRole.ORGANIZER.value:
+            other_organizers = exists().where(
+                cls.organization_id == user.organization_id,
+                cls.role == UserRole.ORGANIZER.value,
+                cls.id != user_id
+            )
+            organization_deleted = db.session.execute(
+                update(Organization).where(
+                    Organization.id == user.organization_id,
+                    Organization.deleted_at.is_(None),
+                    ~other_organizers
+                ).values(deleted_at=datetime.now(timezone.utc))
+            ).rowcount > 0
+
+        event_ids = db.select(Event.id).where(Event.user_id == user_id).scalar_subquery()
+        db.session.execute(delete(ReminderSchedule).where(ReminderSchedule.event_id.in_(event_ids)))
+        db.session.execute(delete(EventInvitation).where(EventInvitation.event_id.in_(event_ids)))
+        db.session.execute(delete(Event).where(Event.user_id == user_id))
+        db.session.execute(delete(cls).where(cls.id == user_id))
+
+        # Bulk deletes skip the session hooks; drop the cached token version
+        # and the search index entry here
+        db.session.info.setdefault("token_versions_bumped", set()).add(user_id)
+        db.session.info.setdefault("search_changed", set()).add("User")
+        return organization_deleted
+
+
+@event.listens_for(db.session, "before_flush")
+def _bump_token_versions(session, flush_context, instances):
+    """Invalidate a user's tokens when their role or organization changes"""
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if state.attrs.role.history.has_changes() or state.attrs.organization_id.history.has_changes():
+            obj.token_version = User.token_version + 1
+            session.info.setdefault("token_versions_bumped", set()).add(obj.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _forget_bumped_token_versions(session):
+    from utils.token_versions import forget
+    forget(session.info.pop("token_versions_bumped", ()))
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_bumped_token_versions(session):
+    session.info.pop("token_versions_bumped", None)
+
+
+# Searchable fields per model, for keeping the in-process search indexes fresh
+_SEARCH_FIELDS = {"User": ("first_name", "last_name", "email"), "Organization": ("name",)}
+
+
+@event.listens_for(db.session, "after_flush")
+def _note_search_changes(session, flush_context):
+    """Remember which searchable models this transaction changed"""
+    changed = session.info.setdefault("search_changed", set())
+    for obj in (*session.new, *session.deleted):
+        if type(obj).__name__ in _SEARCH_FIELDS:
+            changed.add(type(obj).__name__)
+    for obj in session.dirty:
+        fields = _SEARCH_FIELDS.get(type(obj).__name__)
+        if fields:
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in fields):
+                changed.add(type(obj).__name__)
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_search_indexes(session):
+    from utils.search import invalidate
+    invalidate(session.info.pop("search_changed", ()))
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_search_changes(session):
+    session.info.pop("search_changed", None)
 
 
 class Event(db.Model):
@@ -211,7 +408,12 @@ class Event(db.Model):
     location = db.Column(db.String(255), nullable=False)
     is_public = db.Column(db.Boolean, default=False)
     time = db.Column(db.Time, nullable=False)
+    starts_at = db.Column(db.DateTime, nullable=True)  # UTC, derived from date + time
+    ends_at = db.Column(db.DateTime, nullable=True)  # UTC, optional
     category = db.Column(db.String(50), default=EventCategory.OTHER.value)  # Event category
+    max_capacity = db.Column(db.Integer, nullable=True)  # null = unlimited
+    seats_taken = db.Column(db.Integer, nullable=False, default=0)  # Accepted guests holding a seat
+    reminder_offsets = db.Column(db.JSON(none_as_null=True), nullable=True)  # Minutes before start; null = organization's
     organization_id = db.Column(
         db.Integer, db.ForeignKey("organization.id"), nullable=False
     )  # Required for events
@@ -224,6 +426,10 @@ class Event(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
     deleted_at = db.Column(db.DateTime, nullable=True)  # For soft delete
 
+    __table_args__ = (
+        db.Index('ix_event_starts_at', 'starts_at', 'id'),
+    )
+
     def __init__(
         self,
         title,
@@ -235,6 +441,9 @@ class Event(db.Model):
         organization_id,
         user_id,
         category=None,
+        max_capacity=None,
+        ends_at=None,
+        reminder_offsets=None,
     ):
         self.title = title
         self.description = description
@@ -245,6 +454,11 @@ class Event(db.Model):
         self.organization_id = organization_id  # Set the organization ID
         self.user_id = user_id  # Set the user ID (organizer)
         self.category = category or EventCategory.OTHER.value
+        self.max_capacity = max_capacity
+        self.seats_taken = 0
+        self.starts_at = self.compute_starts_at()
+        self.ends_at = ends_at
+        self.reminder_offsets = reminder_offsets
     
     @property
     def is_deleted(self):
@@ -269,6 +483,62 @@ class Event(db.Model):
     def get_organization_events(cls, org_id):
         """Get all active events for a specific organization"""
         return cls.get_active().filter(cls.organization_id == org_id)
+
+    @classmethod
+    def get_upcoming(cls, now=None):
+        """Get active events that have not started yet, soonest first"""
+        if now is None:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return cls.get_active().filter(cls.starts_at >= now).order_by(cls.starts_at.asc(), cls.id.asc())
+
+    def compute_starts_at(self):
+        """Combine the date and time columns into a naive UTC start timestamp"""
+        if self.date is None or self.time is None:
+            return None
+        return datetime.combine(self.date, self.time)
+
+    def effective_reminder_offsets(self):
+        """Reminder offsets in minutes: the event's own, else its organization's, else the default"""
+        if self.reminder_offsets is not None:
+            return sorted(set(self.reminder_offsets), reverse=True)
+        if self.organization is not None and self.organization.reminder_offsets is not None:
+            return sorted(set(self.organization.reminder_offsets), reverse=True)
+        return list(DEFAULT_REMINDER_OFFSETS)
+
+    @property
+    def spots_left(self):
+        """Remaining seats, or None when the event has no capacity limit"""
+        if self.max_capacity is None:
+            return None
+        return max(self.max_capacity - (self.seats_taken or 0), 0)
+
+    @classmethod
+    def reserve_seat(cls, event_id):
+        """
+        Atomically take one seat if the event has room.
+        The capacity check and the increment happen in a single UPDATE,
+        so only the event row is locked and concurrent accepts cannot overbook.
+        """
+        result = db.session.execute(
+            update(cls)
+            .where(
+                cls.id == event_id,
+                or_(cls.max_capacity.is_(None), cls.seats_taken < cls.max_capacity)
+            )
+            .values(seats_taken=cls.seats_taken + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def release_seat(cls, event_id):
+        """Atomically give back one seat"""
+        db.session.execute(
+            update(cls)
+            .where(cls.id == event_id, cls.seats_taken > 0)
+            .values(seats_taken=cls.seats_taken - 1)
+            .execution_options(synchronize_session=False)
+        )
     
     def to_dict(self, include_private=False):
         """Convert event to dictionary"""
@@ -278,9 +548,15 @@ class Event(db.Model):
             'description': self.description,
             'date': self.date.isoformat() if self.date else None,
             'time': self.time.isoformat() if self.time else None,
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
             'location': self.location,
             'is_public': self.is_public,
             'category': self.category,
+            'max_capacity': self.max_capacity,
+            'seats_taken': self.seats_taken or 0,
+            'spots_left': self.spots_left,
+            'reminder_offsets': self.reminder_offsets,
             'organization_id': self.organization_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
@@ -296,22 +572,39 @@ class Event(db.Model):
         return data
 
 
+@db.event.listens_for(Event, "before_insert")
+@db.event.listens_for(Event, "before_update")
+def _sync_event_starts_at(mapper, connection, target):
+    """Keep starts_at in step with date and time on every write"""
+    target.starts_at = target.compute_starts_at()
+
+
 class EventInvitation(db.Model):
     """Event invitations for external guests (no platform access)"""
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey("event.id"), nullable=False)
     guest_email = db.Column(db.String(150), nullable=False)
     guest_name = db.Column(db.String(100), nullable=True)  # Optional guest name
-    status = db.Column(db.String(20), default='pending')  # pending, accepted, declined
+    status = db.Column(db.String(20), default='pending')  # pending, accepted, waitlisted, declined
     invitation_token = db.Column(db.String(255), nullable=False, unique=True)  # Secure token for email links
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     responded_at = db.Column(db.DateTime, nullable=True)  # When guest responded
-    reminder_24h_sent = db.Column(db.Boolean, default=False)  # 24-hour reminder sent
-    reminder_1h_sent = db.Column(db.Boolean, default=False)   # 1-hour reminder sent
+    waitlisted_at = db.Column(db.DateTime, nullable=True)  # FIFO position on the waitlist
     
     # Relationships
     event = db.relationship("Event", backref="guest_invitations")
+
+    __table_args__ = (
+        db.Index('ix_event_invitation_waitlist', 'event_id', 'status', 'waitlisted_at'),
+        db.Index('ix_event_invitation_event_status', 'event_id', 'status'),
+        # One invitation per guest and event; guest_email is stored normalized
+        db.UniqueConstraint('event_id', 'guest_email', name='uq_event_invitation_event_guest_email'),
+    )
     
+    @validates("guest_email")
+    def _normalize_guest_email(self, key, guest_email):
+        return normalize_email(guest_email)
+
     def __init__(self, event_id, guest_email, guest_name=None):
         self.event_id = event_id
         self.guest_email = guest_email
@@ -319,8 +612,91 @@ class EventInvitation(db.Model):
         # Generate secure token for email links
         import secrets
         self.invitation_token = secrets.token_urlsafe(32)
-    
-    def to_dict(self):
+
+    def transition(self, from_status, to_status, **values):
+        """
+        Move this invitation from one status to another with a conditional UPDATE.
+        Returns False if another request changed the status first.
+        """
+        cls = self.__class__
+        result = db.session.execute(
+            update(cls)
+            .where(cls.id == self.id, cls.status == from_status)
+            .values(status=to_status, **values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        self.status = to_status
+        for key, value in values.items():
+            setattr(self, key, value)
+        return True
+
+    @property
+    def waitlist_position(self):
+        """1-based position on the event waitlist, or None if not waitlisted"""
+        if self.status != 'waitlisted':
+            return None
+        cls = self.__class__
+        ahead = cls.query.filter(
+            cls.event_id == self.event_id,
+            cls.status == 'waitlisted',
+            or_(
+                cls.waitlisted_at < self.waitlisted_at,
+                and_(cls.waitlisted_at == self.waitlisted_at, cls.id < self.id)
+            )
+        ).count()
+        return ahead + 1
+
+    @classmethod
+    def waitlist_positions(cls, event_id):
+        """
+        {invitation id: 1-based waitlist position} for every waitlisted guest of
+        the event, in one query; for listings, where the per-row property would
+        cost a COUNT each
+        """
+        position = func.row_number().over(order_by=(cls.waitlisted_at, cls.id))
+        rows = db.session.execute(
+            db.select(cls.id, position).where(cls.event_id == event_id, cls.status == 'waitlisted')
+        ).all()
+        return dict(rows)
+
+    @classmethod
+    def promote_from_waitlist(cls, event_id):
+        """
+        Fill free seats from the waitlist in FIFO order.
+        Each promotion reserves a seat first and then claims the invitation,
+        releasing the seat again if the guest left the waitlist in the meantime.
+        Returns the list of promoted invitations.
+        """
+        promoted = []
+        while True:
+            candidate = cls.query.filter_by(
+                event_id=event_id,
+                status='waitlisted'
+            ).order_by(cls.waitlisted_at.asc(), cls.id.asc()).first()
+
+            if not candidate:
+                break
+
+            if not Event.reserve_seat(event_id):
+                break
+
+            if candidate.transition('waitlisted', 'accepted', waitlisted_at=None):
+                promoted.append(candidate)
+            else:
+                Event.release_seat(event_id)
+
+        if promoted:
+            ReminderSchedule.sync(db.session.get(Event, event_id), invitation_ids=[inv.id for inv in promoted])
+        return promoted
+
+    def to_dict(self, waitlist_positions=None):
+        """waitlist_positions: optional map from waitlist_positions(), to skip the per-row query"""
+        if waitlist_positions is not None:
+            waitlist_position = waitlist_positions.get(self.id)
+        else:
+            waitlist_position = self.waitlist_position
         return {
             'id': self.id,
             'event_id': self.event_id,
@@ -329,9 +705,93 @@ class EventInvitation(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'responded_at': self.responded_at.isoformat() if self.responded_at else None,
+            'waitlist_position': waitlist_position,
         }
 
 
+class ReminderSchedule(db.Model):
+    """One pending or sent reminder per (accepted invitation, offset)"""
+    __tablename__ = 'reminder_schedule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    invitation_id = db.Column(
+        db.Integer, db.ForeignKey("event_invitation.id", ondelete="CASCADE"), nullable=False
+    )
+    event_id = db.Column(db.Integer, db.ForeignKey("event.id", ondelete="CASCADE"), nullable=False)
+    offset_minutes = db.Column(db.Integer, nullable=False)  # Minutes before the event starts
+    due_at = db.Column(db.DateTime, nullable=False)  # UTC
+    claimed_at = db.Column(db.DateTime, nullable=True)  # Set while a scheduler run is sending it
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('invitation_id', 'offset_minutes', name='uq_reminder_schedule_invitation_offset'),
+        # Only unsent rows are ever scanned, so the index stays as small as the backlog
+        db.Index(
+            'ix_reminder_schedule_unsent_due',
+            'due_at',
+            postgresql_where=db.text('sent_at IS NULL'),
+            sqlite_where=db.text('sent_at IS NULL'),
+        ),
+        db.Index('ix_reminder_schedule_event', 'event_id'),
+    )
+
+    @classmethod
+    def sync(cls, event, invitation_ids=None, reset=False):
+        """
+        Bring an event's reminder rows in line with its offsets and accepted guests.
+        Only reminders still in the future are created. reset=True also forgets
+        reminders already sent, for when the event moves.
+        """
+        if event is None or event.starts_at is None:
+            return
+
+        offsets = event.effective_reminder_offsets()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        stale = cls.query.filter(cls.event_id == event.id)
+        if not reset:
+            stale = stale.filter(cls.sent_at.is_(None), cls.offset_minutes.notin_(offsets))
+        if invitation_ids is not None:
+            stale = stale.filter(cls.invitation_id.in_(invitation_ids))
+        stale.delete(synchronize_session=False)
+
+        accepted = db.session.query(EventInvitation.id).filter(
+            EventInvitation.event_id == event.id,
+            EventInvitation.status == 'accepted'
+        )
+        if invitation_ids is not None:
+            accepted = accepted.filter(EventInvitation.id.in_(invitation_ids))
+        accepted_ids = [row.id for row in accepted]
+        if not accepted_ids:
+            return
+
+        existing = set(
+            db.session.query(cls.invitation_id, cls.offset_minutes)
+            .filter(cls.event_id == event.id, cls.invitation_id.in_(accepted_ids))
+            .all()
+        )
+        rows = []
+        for offset in offsets:
+            due_at = event.starts_at - timedelta(minutes=offset)
+            if due_at <= now:
+                continue
+            rows.extend(
+                {'invitation_id': inv_id, 'event_id': event.id, 'offset_minutes': offset, 'due_at': due_at}
+                for inv_id in accepted_ids
+                if (inv_id, offset) not in existing
+            )
+        if rows:
+            db.session.execute(insert(cls), rows)
+
+    @classmethod
+    def clear_for_invitation(cls, invitation_id):
+        """Drop the unsent reminders of a guest who is no longer attending"""
+        cls.query.filter(
+            cls.invitation_id == invitation_id,
+            cls.sent_at.is_(None)
+        ).delete(synchronize_session=False)
+
+
 class OrganizationInvitation(db.Model):
     id=db.Column(db.Integer, primary_key=True)
     email=db.Column(db.String(150), nullable=False)
@@ -339,4 +799,123 @@ class OrganizationInvitation(db.Model):
     organization_id=db.Column(db.Integer, db.ForeignKey("organization.id"), nullable=False)
     is_accepted=db.Column(db.Boolean, default=False)
     created_at=db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    expires_at=db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+    expires_at=db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Invitations by email (login, registration, profile); email is stored normalized
+        db.Index('ix_organization_invitation_email', 'email', 'organization_id'),
+        # At most one open invitation per email and organization
+        db.Index(
+            'uq_organization_invitation_pending',
+            'organization_id',
+            'email',
+            unique=True,
+            postgresql_where=db.text('is_accepted = false'),
+            sqlite_where=db.text('is_accepted = 0'),
+        ),
+    )
+
+    @validates("email")
+    def _normalize_email(self, key, email):
+        return normalize_email(email)
+
+    @classmethod
+    def cancel_pending(cls, org_id):
+        """Delete the organization's unaccepted invitations in one statement; returns how many"""
+        return db.session.execute(
+            delete(cls).where(cls.organization_id == org_id, cls.is_accepted == False)
+        ).rowcount
+
+    @classmethod
+    def pending_for_email(cls, email):
+        """
+        Unaccepted, unexpired invitations for the email to organizations that
+        still exist, as (invitation, organization) pairs from one joined query.
+        """
+        return db.session.query(cls, Organization).join(
+            Organization, Organization.id == cls.organization_id
+        ).filter(
+            cls.email == normalize_email(email),
+            cls.is_accepted == False,
+            cls.expires_at > datetime.now(timezone.utc),
+            Organization.deleted_at.is_(None)
+        ).order_by(cls.expires_at).all()
+
+
+class BackgroundJob(db.Model):
+    """Work too large for one request, run in a background thread with progress"""
+    __tablename__ = 'background_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # e.g. "organization_delete"
+    target_id = db.Column(db.Integer, nullable=True)  # Row the job works on
+    requested_by = db.Column(db.Integer, nullable=True)  # User who started it
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Renewed by the thread running the job (its lease)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'target_id': self.target_id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'progress': round(self.processed / self.total, 3) if self.total else 1.0,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class RevokedToken(db.Model):
+    """Access tokens revoked before their expiry (e.g. on logout), by JWT ID"""
+    __tablename__ = 'revoked_token'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Row can be purged after this
+    # Workers sync their filters by it (see utils/token_blocklist.py)
+    revoked_at = db.Column(
+        db.DateTime, nullable=False, index=True, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+
+
+class RateLimitCounter(db.Model):
+    """Shared rate-limit state: request count per limiter key and fixed window"""
+    __tablename__ = 'rate_limit_counter'
+
+    key = db.Column(db.String(255), primary_key=True)  # "<window seconds>:<identifier>"
+    window_start = db.Column(db.BigInteger, primary_key=True)  # Unix time the window began
+    count = db.Column(db.Integer, nullable=False, default=0)
+    expires_at = db.Column(db.BigInteger, nullable=False, index=True)  # Unix time both windows have ended
+
+
+class SchedulerRun(db.Model):
+    """One finished scheduler job run, from whichever process ran it (see utils/scheduler_metrics.py)"""
+    __tablename__ = 'scheduler_run'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(50), nullable=False)  # e.g. "catch_up", "event_reminder"
+    pid = db.Column(db.Integer, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC
+    duration_ms = db.Column(db.Float, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    stats = db.Column(db.JSON, nullable=False)  # What the run did, including its reminder lag histogram
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job': self.job,
+            'pid': self.pid,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': self.duration_ms,
+            'error': self.error,
+            **self.stats
+        }
@@ -1,16 +1,23 @@
-from datetime import timedelta
+import base64
+import io
+from datetime import datetime, timedelta
 import os
-from flask_jwt_extended import get_jwt, jwt_required, get_jwt_identity
+from utils.auth_context import auth_required, current_claims, current_user, current_principal
 from flask_mail import Message
 from flask import request, jsonify
+from sqlalchemy import func, tuple_
 
 from . import auth_bp as auth
 from decorators import role_required
 from models import Organization, User, UserRole, OrganizationInvitation
-from extensions import db, mail, bcrypt
-from utils.validators import is_valid_email, is_strong_password, is_non_empty_string, clean_string
+from extensions import db, mail
+from utils.validators import is_valid_email, is_strong_password, is_non_empty_string, clean_string, normalize_email
 from utils.email_helpers import notify_admins_organizer_request, notify_user_organizer_approval
-from utils.rate_limiter import password_reset_rate_limit, email_rate_limit, registration_rate_limit, login_rate_limit
+from utils.password_hashing import PasswordHashingBusy, busy_response, dummy_verify
+from utils.token_blocklist import revocation_list
+from utils.search import count_users, search_users
+from utils.user_import import UserImportError, import_users
+from utils.rate_limiter import password_reset_rate_limit, email_rate_limit, registration_rate_limit, login_rate_limit, get_store as get_rate_limit_store
 
 
 @auth.route("/register", methods=["GET", "POST"])
@@ -21,7 +28,7 @@ def register():
             data = request.get_json()
             first_name = clean_string(data.get("first_name", ""))
             last_name = clean_string(data.get("last_name", ""))
-            email = clean_string(data.get("email", ""))
+            email = normalize_email(clean_string(data.get("email", "")))
             password = data.get("password", "")
             requested_role = data.get("role", "guest")  # Default to guest if not specified
 
@@ -120,14 +127,7 @@ def register():
             db.session.commit()
             
             # Check if user has any pending invitations
-            from datetime import datetime, timezone
-            
-            pending_invitations_count = OrganizationInvitation.query.filter_by(
-                email=email,
-                is_accepted=False
-            ).filter(
-                OrganizationInvitation.expires_at > datetime.now(timezone.utc)
-            ).count()
+            pending_invitations_count = len(OrganizationInvitation.pending_for_email(email))
             
             response_message = "User created successfully as guest"
             next_steps = "You can now request organizer privileges or wait for organization invitations"
@@ -158,7 +158,7 @@ def register():
 def login():
     if request.method == "POST":
         data = request.get_json()
-        email = data.get("email")
+        email = normalize_email(data.get("email"))
         password = data.get("password")
 
         # Validate email and password
@@ -167,36 +167,35 @@ def login():
 
         user = User.query.filter_by(email=email).first()
         if user is None:
+            # Take as long as a real check so timing does not reveal registered emails
+            dummy_verify(password)
             return jsonify({"message": "User not registered"}), 404
 
         # Validate password
         if not user.check_password(password):
             return jsonify({"message": "Invalid credentials"}), 401
 
+        # Upgrade the hash when the configured bcrypt cost has changed
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except PasswordHashingBusy:
+                pass
+
         # Generate token
         token = user.generate_token(timedelta(hours=2))
         
-        # Check for pending invitations
-        from datetime import datetime, timezone
-        
-        pending_invitations = OrganizationInvitation.query.filter_by(
-            email=email,
-            is_accepted=False
-        ).filter(
-            OrganizationInvitation.expires_at > datetime.now(timezone.utc)
-        ).all()
-        
-        # Prepare invitation info
-        invitation_info = []
-        for invitation in pending_invitations:
-            org = Organization.query.get(invitation.organization_id)
-            if org and not org.is_deleted:
-                invitation_info.append({
-                    "id": invitation.id,
-                    "organization_name": org.name,
-                    "role": invitation.role,
-                    "expires_at": invitation.expires_at.isoformat()
-                })
+        # Pending invitations to organizations that still exist
+        invitation_info = [
+            {
+                "id": invitation.id,
+                "organization_name": org.name,
+                "role": invitation.role,
+                "expires_at": invitation.expires_at.isoformat()
+            }
+            for invitation, org in OrganizationInvitation.pending_for_email(email)
+        ]
         
         response_data = {
             "message": "Logged in successfully",
@@ -221,12 +220,28 @@ def login():
     return jsonify({"message": "Login page"})
 
 
+@auth.route("/logout", methods=["POST"])
+@auth_required
+def logout():
+    """
+    Revoke the current access token so it stops working before it expires
+    """
+    try:
+        revocation_list.revoke(current_claims())
+        db.session.commit()
+        return jsonify({"message": "Logged out successfully"}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to log out: {str(e)}"}), 500
+
+
 @auth.route("/forgot-password", methods=["POST"])
 @password_reset_rate_limit
 def forgot_password():
     print("Forgot password route hit")
     data = request.get_json()
-    email = data.get("email")
+    email = normalize_email(data.get("email"))
 
     print(f"MAIL_DEFAULT_SENDER: {os.environ.get('MAIL_USERNAME')}")
 
@@ -313,22 +328,20 @@ def reset_password(token):
         )
 
     # Update the user's password
-    user.password = bcrypt.generate_password_hash(new_password).decode("utf-8")
+    user.set_password(new_password)
     db.session.commit()
 
     return jsonify({"message": "Your password has been updated!"}), 200
 
 
 @auth.route("/accept-invitation", methods=["POST"])
-@jwt_required()
+@auth_required
 def accept_invitation():
     """
     Accept an organization invitation
     """
     try:
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
+        user = current_user()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -394,7 +407,9 @@ def accept_invitation():
         return jsonify({
             "message": f"Successfully joined {organization.name}",
             "organization": organization.to_dict(),
-            "new_role": user.role
+            "new_role": user.role,
+            # Joining the organization invalidated the old token
+            "token": user.generate_token(timedelta(hours=2))
         }), 200
 
     except Exception as e:
@@ -407,15 +422,14 @@ def accept_invitation():
 
 
 @auth.route("/profile", methods=["GET"])
-@jwt_required()
+@auth_required
 def get_user_profile():
     """
     Get current user profile information
     """
     try:
         # Get user email from JWT identity
-        user_email = get_jwt_identity()
-        user = User.query.filter_by(email=user_email).first()
+        user = current_user()
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -439,14 +453,13 @@ def get_user_profile():
 
 
 @auth.route("/profile", methods=["PUT"])
-@jwt_required()
+@auth_required
 def update_user_profile():
     """
     Update current user profile information (first_name, last_name, email)
     """
     try:
-        user_email = get_jwt_identity()
-        user = User.query.filter_by(email=user_email).first()
+        user = current_user()
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -464,8 +477,8 @@ def update_user_profile():
             user.last_name = data["last_name"].strip()
 
         # Update email if provided and different
-        if "email" in data and data["email"] and data["email"] != user.email:
-            new_email = data["email"].strip().lower()
+        if "email" in data and data["email"] and normalize_email(data["email"]) != user.email:
+            new_email = normalize_email(data["email"])
 
             # Validate email format
             if not is_valid_email(new_email):
@@ -501,15 +514,14 @@ def update_user_profile():
 
 
 @auth.route("/change-password", methods=["POST"])
-@jwt_required()
+@auth_required
 def change_password():
     """
     Change current user's password (requires current password verification)
     Sends email notification on success
     """
     try:
-        user_email = get_jwt_identity()
-        user = User.query.filter_by(email=user_email).first()
+        user = current_user(full=True)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -539,7 +551,7 @@ def change_password():
             return jsonify({"error": "New password cannot be the same as the current password"}), 400
 
         # Update password
-        user.password = bcrypt.generate_password_hash(new_password).decode("utf-8")
+        user.set_password(new_password)
         db.session.commit()
 
         # Send email notification
@@ -567,6 +579,9 @@ def change_password():
 
         return jsonify({"message": "Password changed successfully"}), 200
 
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -576,15 +591,14 @@ def change_password():
 
 
 @auth.route("/account", methods=["DELETE"])
-@jwt_required()
+@auth_required
 def delete_account():
     """
     Delete current user's account
     Sends email notification on success
     """
     try:
-        user_email = get_jwt_identity()
-        user = User.query.filter_by(email=user_email).first()
+        user = current_user(full=True)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -609,26 +623,9 @@ def delete_account():
         user_name = user.first_name
         user_email_address = user.email
 
-        # Delete events created by this user before deleting the user
-        from models import Event
-        Event.query.filter_by(user_id=user.id).delete()
-
-        # If user is an organizer with an organization, handle cleanup
-        if user.organization_id and user.role == UserRole.ORGANIZER.value:
-            org = Organization.query.get(user.organization_id)
-            if org:
-                # Check if user is the only organizer in the organization
-                org_organizers = User.query.filter_by(
-                    organization_id=user.organization_id,
-                    role=UserRole.ORGANIZER.value
-                ).count()
-
-                if org_organizers <= 1:
-                    # Soft delete the organization if this is the only organizer
-                    org.soft_delete()
-
-        # Delete user
-        db.session.delete(user)
+        # Delete the user with their events and those events' guests and reminders;
+        # soft-deletes the organization if this was its only organizer
+        User.delete_with_dependents(user.id)
         db.session.commit()
 
         # Send email notification
@@ -657,6 +654,9 @@ def delete_account():
 
         return jsonify({"message": "Account deleted successfully"}), 200
 
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -666,31 +666,19 @@ def delete_account():
 
 
 @auth.route("/my-invitations", methods=["GET"])
-@jwt_required()
+@auth_required
 def get_my_invitations():
     """
     Get pending invitations for the current user
     """
     try:
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
+        user = current_user()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        from datetime import datetime, timezone
-        
-        pending_invitations = OrganizationInvitation.query.filter_by(
-            email=user.email,
-            is_accepted=False
-        ).filter(
-            OrganizationInvitation.expires_at > datetime.now(timezone.utc)
-        ).all()
-        
         invitations_data = []
-        for invitation in pending_invitations:
-            organization = Organization.query.get(invitation.organization_id)
+        for invitation, organization in OrganizationInvitation.pending_for_email(user.email):
             invitation_info = {
                 'id': invitation.id,
                 'role': invitation.role,
@@ -699,7 +687,7 @@ def get_my_invitations():
                     'id': organization.id,
                     'name': organization.name,
                     'description': organization.description
-                } if organization else None
+                }
             }
             invitations_data.append(invitation_info)
         
@@ -756,9 +744,7 @@ def approve_organizer_request(user_id):
     """Approve a pending organizer role request"""
     try:
         # Get the admin user from JWT
-        jwt_data = get_jwt()
-        admin_email = get_jwt_identity()
-        admin_user = User.query.filter_by(email=admin_email).first()
+        admin_user = current_user()
         
         if not admin_user:
             return jsonify({'error': 'Admin user not found'}), 404
@@ -811,9 +797,7 @@ def reject_organizer_request(user_id):
     """Reject a pending organizer role request"""
     try:
         # Get the admin user from JWT
-        jwt_data = get_jwt()
-        admin_email = get_jwt_identity()
-        admin_user = User.query.filter_by(email=admin_email).first()
+        admin_user = current_user()
         
         if not admin_user:
             return jsonify({'error': 'Admin user not found'}), 404
@@ -873,7 +857,7 @@ def register_admin():
         # Get user data
         first_name = data.get("first_name")
         last_name = data.get("last_name") 
-        email = data.get("email")
+        email = normalize_email(data.get("email"))
         password = data.get("password")
 
         # Validate required fields
@@ -927,6 +911,9 @@ def register_admin():
             }
         }), 201
         
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         db.session.rollback()
         print(f"Error in admin registration: {str(e)}")
@@ -959,63 +946,127 @@ def disable_admin_registration():
 
 # ==================== User Management (Admin Only) ====================
 
+def _encode_user_cursor(created_at, user_id):
+    """Opaque keyset cursor pointing just past the given user"""
+    raw = f"{created_at.isoformat()}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_user_cursor(cursor):
+    """Inverse of _encode_user_cursor, raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, user_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(user_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _user_rows(*where):
+    """Admin list rows: user columns plus the organization name, in one query"""
+    return (
+        db.select(
+            User.id, User.first_name, User.last_name, User.email, User.role,
+            User.organization_id, User.pending_organizer_approval, User.created_at,
+            Organization.name.label('organization_name')
+        )
+        .outerjoin(Organization, Organization.id == User.organization_id)
+        .where(*where)
+    )
+
+
+def _user_row_to_dict(row):
+    return {
+        'id': row.id,
+        'first_name': row.first_name,
+        'last_name': row.last_name,
+        'email': row.email,
+        'role': row.role,
+        'organization_id': row.organization_id,
+        'organization_name': row.organization_name,
+        'pending_organizer_approval': row.pending_organizer_approval,
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    }
+
+
+def _search_users_page(search, filters, page, per_page, include_count):
+    """One page of the admin user list for a search, most relevant first"""
+    # Rank only as deep as this page (plus one row to tell whether more follow)
+    ranked = search_users(search, *filters, limit=page * per_page + 1)
+    has_more = len(ranked) > page * per_page
+    page_ids = [user_id for user_id, _ in ranked[(page - 1) * per_page:page * per_page]]
+    rows = {row.id: row for row in db.session.execute(_user_rows(User.id.in_(page_ids)))} if page_ids else {}
+    # Counted separately, so the total is not capped by the ranking depth
+    total_count = count_users(search, *filters) if include_count else None
+
+    return jsonify({
+        'message': 'Users retrieved successfully',
+        'users': [_user_row_to_dict(rows[user_id]) for user_id in page_ids if user_id in rows],
+        'total_count': total_count,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': -(-total_count // per_page) if total_count is not None else None,
+        'has_more': has_more,
+        'next_cursor': None
+    }), 200
+
+
 @auth.route("/admin/users", methods=["GET"])
 @role_required("admin")
 def get_all_users():
     """
     Get all users with pagination and optional search/filter
-    Query params: page, per_page, search, role
+    Query params: page, per_page, search, role, cursor, include_count
+    - Search: fuzzy match on name and email, results ranked by relevance
+    - Pagination: page/per_page, or keyset via the returned next_cursor
+      (without search)
+    - The total is counted once per request; keyset requests skip it unless
+      include_count=true
     """
     try:
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        search = request.args.get('search', '', type=str)
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        search = request.args.get('search', '', type=str).strip()
         role_filter = request.args.get('role', '', type=str)
+        cursor = request.args.get('cursor')
+        include_count = request.args.get('include_count', 'false' if cursor else 'true').lower() == 'true'
 
-        # Base query
-        query = User.query
-
-        # Apply search filter (searches name and email)
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                db.or_(
-                    User.first_name.ilike(search_term),
-                    User.last_name.ilike(search_term),
-                    User.email.ilike(search_term)
-                )
-            )
+        filters = []
 
         # Apply role filter
         if role_filter and role_filter in [r.value for r in UserRole]:
-            query = query.filter(User.role == role_filter)
+            filters.append(User.role == role_filter)
 
-        # Get total count before pagination
-        total_count = query.count()
+        if search:
+            if cursor:
+                return jsonify({'error': 'Cursor pagination is not available with search; use page'}), 400
+            return _search_users_page(search, filters, max(page, 1), per_page, include_count)
 
-        # Apply pagination
-        users = query.order_by(User.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        total_count = None
+        if include_count:
+            total_count = db.session.execute(
+                db.select(func.count(User.id)).where(*filters)
+            ).scalar_one()
 
-        users_data = []
-        for user in users.items:
-            org_name = None
-            if user.organization_id:
-                org = Organization.query.get(user.organization_id)
-                org_name = org.name if org else None
+        # Users with their organization name in one query
+        query = _user_rows(*filters).order_by(User.created_at.desc(), User.id.desc())
 
-            users_data.append({
-                'id': user.id,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email,
-                'role': user.role,
-                'organization_id': user.organization_id,
-                'organization_name': org_name,
-                'pending_organizer_approval': user.pending_organizer_approval,
-                'created_at': user.created_at.isoformat() if user.created_at else None
-            })
+        # Apply pagination - keyset when a cursor is given, offset otherwise
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = _decode_user_cursor(cursor)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.where(tuple_(User.created_at, User.id) < tuple_(cursor_created_at, cursor_id))
+        else:
+            query = query.offset((max(page, 1) - 1) * per_page)
+
+        rows = db.session.execute(query.limit(per_page + 1)).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = _encode_user_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+
+        users_data = [_user_row_to_dict(row) for row in rows]
 
         return jsonify({
             'message': 'Users retrieved successfully',
@@ -1023,13 +1074,51 @@ def get_all_users():
             'total_count': total_count,
             'page': page,
             'per_page': per_page,
-            'total_pages': users.pages
+            'total_pages': -(-total_count // per_page) if total_count is not None else None,
+            'has_more': has_more,
+            'next_cursor': next_cursor
         }), 200
 
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve users: {str(e)}'}), 500
 
 
+@auth.route("/admin/users/import", methods=["POST"])
+@role_required("admin")
+def import_users_csv():
+    """
+    Create users in bulk from a CSV (Admin only)
+    Body: multipart upload in the "file" field, or the CSV itself (text/csv)
+    Columns: email, first_name, last_name, and optionally role (guest,
+    team_member, organizer), organization_id and password
+    - Rows are validated, hashed and inserted in chunks; invalid rows are
+      reported with their line number and do not stop the import
+    - Rows without a password get a set-password link in the response
+    """
+    try:
+        upload = request.files.get('file')
+        stream = upload.stream if upload is not None else request.stream
+        lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+        try:
+            result = import_users(lines)
+        except UserImportError as e:
+            return jsonify({'error': str(e)}), 400
+        except UnicodeDecodeError:
+            db.session.rollback()
+            return jsonify({'error': 'The file must be UTF-8 encoded CSV'}), 400
+
+        print(f"[UserImport] {result['imported']} users imported, {result['failed']} rows rejected")
+        return jsonify({
+            'message': f"Imported {result['imported']} users",
+            **result
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to import users: {str(e)}'}), 500
+
+
 @auth.route("/admin/users/<int:user_id>/role", methods=["PUT"])
 @role_required("admin")
 def change_user_role(user_id):
@@ -1039,11 +1128,7 @@ def change_user_role(user_id):
     For organizer: organization_id is optional (can create own org later)
     """
     try:
-        admin_email = get_jwt_identity()
-        admin_user = User.query.filter_by(email=admin_email).first()
-
-        if not admin_user:
-            return jsonify({'error': 'Admin user not found'}), 404
+        admin_user = current_principal()
 
         # Get target user
         target_user = User.query.get(user_id)
@@ -1144,11 +1229,7 @@ def admin_delete_user(user_id):
     Delete a user (Admin only)
     """
     try:
-        admin_email = get_jwt_identity()
-        admin_user = User.query.filter_by(email=admin_email).first()
-
-        if not admin_user:
-            return jsonify({'error': 'Admin user not found'}), 404
+        admin_user = current_principal()
 
         # Get target user
         target_user = User.query.get(user_id)
@@ -1173,23 +1254,9 @@ def admin_delete_user(user_id):
             'role': target_user.role
         }
 
-        # Delete events created by this user
-        from models import Event
-        Event.query.filter_by(user_id=target_user.id).delete()
-
-        # Handle organization cleanup if user is organizer
-        if target_user.organization_id and target_user.role == UserRole.ORGANIZER.value:
-            org = Organization.query.get(target_user.organization_id)
-            if org:
-                org_organizers = User.query.filter_by(
-                    organization_id=target_user.organization_id,
-                    role=UserRole.ORGANIZER.value
-                ).count()
-
-                if org_organizers <= 1:
-                    org.soft_delete()
-
-        db.session.delete(target_user)
+        # Delete the user with their events and those events' guests and reminders;
+        # soft-deletes the organization if this was its only organizer
+        User.delete_with_dependents(target_user.id)
         db.session.commit()
 
         return jsonify({
@@ -1199,4 +1266,13 @@ def admin_delete_user(user_id):
 
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Failed to delete user: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Failed to delete user: {str(e)}'}), 500
+
+@auth.route("/admin/rate-limit-stats", methods=["GET"])
+@role_required("admin")
+def get_rate_limit_stats():
+    """Size, eviction and sweep metrics of the rate-limit store"""
+    try:
+        return jsonify(get_rate_limit_store().stats()), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to read rate-limit stats: {str(e)}'}), 500
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.auth_context import auth_required
 import requests
 import re
 import os
@@ -49,7 +49,7 @@ def filter_response(response_text):
     return response_text
 
 @chat_bp.route('/message', methods=['POST'])
-@jwt_required()
+@auth_required
 @chat_rate_limit
 def chat_message():
     try:
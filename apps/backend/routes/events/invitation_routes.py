@@ -2,27 +2,25 @@ import csv
 import io
 from datetime import datetime, timezone
 from flask import request, jsonify, Response
-from flask_jwt_extended import get_jwt, jwt_required
+from utils.auth_context import current_user, current_principal
 
 from . import events_bp
 from decorators import role_required
-from models import Event, EventInvitation, User
+from models import Event, EventInvitation, ReminderSchedule, User
 from extensions import db
-from utils.email_helpers import send_event_invitation_email
+from utils.email_helpers import send_event_invitation_email, send_waitlist_promotion_email
 from utils.rate_limiter import invitation_rate_limit
+from utils.validators import normalize_email
 
 
 @events_bp.route("/<int:event_id>/invite-guests", methods=["POST"])
-@jwt_required()
 @role_required("organizer", "admin")
 @invitation_rate_limit
 def invite_guests_to_event(event_id):
     """Send event invitations to external guests (no platform access)"""
     try:
         # Get the current user (organizer)
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        organizer = User.query.get(user_id)
+        organizer = current_user()
         
         if not organizer:
             return jsonify({"error": "Organizer not found"}), 404
@@ -33,7 +31,7 @@ def invite_guests_to_event(event_id):
             return jsonify({"error": "Event not found"}), 404
         
         # Check if organizer owns this event
-        if event.user_id != user_id and organizer.role != 'admin':
+        if event.user_id != organizer.id and organizer.role != 'admin':
             return jsonify({"error": "You can only invite guests to your own events"}), 403
 
         data = request.get_json()
@@ -46,7 +44,7 @@ def invite_guests_to_event(event_id):
         failed_invitations = []
 
         for guest_data in guest_invitations:
-            guest_email = guest_data.get("email")
+            guest_email = normalize_email(guest_data.get("email"))
             guest_name = guest_data.get("name", "")  # Optional
             
             if not guest_email:
@@ -116,15 +114,12 @@ def invite_guests_to_event(event_id):
 
 
 @events_bp.route("/<int:event_id>/guest-list", methods=["GET"])
-@jwt_required()
 @role_required("organizer", "admin")
 def get_event_guest_list(event_id):
     """Get list of invited guests for an event"""
     try:
         # Get the current user
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
+        user = current_principal()
         
         # Get the event
         event = Event.query.get(event_id)
@@ -132,12 +127,14 @@ def get_event_guest_list(event_id):
             return jsonify({"error": "Event not found"}), 404
         
         # Check if user owns this event or is admin
-        if event.user_id != user_id and user.role != 'admin':
+        if event.user_id != user.id and user.role != 'admin':
             return jsonify({"error": "You can only view guests for your own events"}), 403
 
         # Get all invitations for this event
         invitations = EventInvitation.query.filter_by(event_id=event_id).all()
-        
+        # Waitlist positions for the whole list in one query
+        waitlist_positions = EventInvitation.waitlist_positions(event_id)
+
         guest_data = []
         for invitation in invitations:
             guest_data.append({
@@ -147,6 +144,7 @@ def get_event_guest_list(event_id):
                 "status": invitation.status,
                 "invited_at": invitation.created_at.isoformat() if invitation.created_at else None,
                 "responded_at": invitation.responded_at.isoformat() if invitation.responded_at else None,
+                "waitlist_position": waitlist_positions.get(invitation.id),
             })
 
         # Count statuses
@@ -154,12 +152,15 @@ def get_event_guest_list(event_id):
             "pending": len([g for g in guest_data if g["status"] == "pending"]),
             "accepted": len([g for g in guest_data if g["status"] == "accepted"]),
             "declined": len([g for g in guest_data if g["status"] == "declined"]),
+            "waitlisted": len([g for g in guest_data if g["status"] == "waitlisted"]),
             "total": len(guest_data)
         }
 
         return jsonify({
             "event_id": event_id,
             "event_title": event.title,
+            "max_capacity": event.max_capacity,
+            "spots_left": event.spots_left,
             "guests": guest_data,
             "status_counts": status_counts
         }), 200
@@ -172,20 +173,17 @@ def get_event_guest_list(event_id):
 
 
 @events_bp.route("/<int:event_id>/guest-list/export", methods=["GET"])
-@jwt_required()
 @role_required("organizer", "admin")
 def export_guest_list_csv(event_id):
     """Export guest list as CSV file"""
     try:
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
+        user = current_principal()
 
         event = Event.query.get(event_id)
         if not event or event.is_deleted:
             return jsonify({"error": "Event not found"}), 404
 
-        if event.user_id != user_id and user.role != 'admin':
+        if event.user_id != user.id and user.role != 'admin':
             return jsonify({"error": "Access denied"}), 403
 
         invitations = EventInvitation.query.filter_by(event_id=event_id).all()
@@ -244,14 +242,19 @@ def guest_rsvp(token):
         if response not in ['accept', 'decline']:
             return jsonify({"error": "Invalid response. Must be 'accept' or 'decline'"}), 400
 
-        # Check if already responded
-        if invitation.status != 'pending':
+        # Check if already responded (accepted or waitlisted guests may still decline)
+        can_respond = (
+            invitation.status == 'pending' or
+            (response == 'decline' and invitation.status in ['accepted', 'waitlisted'])
+        )
+        if not can_respond:
             # Return existing response for frontend to display
             return jsonify({
                 "already_responded": True,
                 "message": f"You have already {invitation.status} this invitation",
                 "status": invitation.status,
                 "guest_name": invitation.guest_name or "Guest",
+                "waitlist_position": invitation.waitlist_position,
                 "event": {
                     "title": event.title,
                     "description": event.description,
@@ -261,21 +264,63 @@ def guest_rsvp(token):
                 }
             }), 200
 
-        # Update invitation status
-        invitation.status = 'accepted' if response == 'accept' else 'declined'
-        invitation.responded_at = datetime.now(timezone.utc)
-        
+        now = datetime.now(timezone.utc)
+        promoted = []
+
+        if response == 'accept':
+            # Reserve a seat atomically; guests past capacity join the waitlist
+            if Event.reserve_seat(event.id):
+                claimed = invitation.transition('pending', 'accepted', responded_at=now)
+                if claimed:
+                    ReminderSchedule.sync(event, invitation_ids=[invitation.id])
+                else:
+                    Event.release_seat(event.id)
+            else:
+                claimed = invitation.transition('pending', 'waitlisted', responded_at=now, waitlisted_at=now)
+        else:
+            previous_status = invitation.status
+            claimed = invitation.transition(previous_status, 'declined', responded_at=now, waitlisted_at=None)
+            if claimed and previous_status == 'accepted':
+                # Free the seat and hand it to the next guest on the waitlist
+                ReminderSchedule.clear_for_invitation(invitation.id)
+                Event.release_seat(event.id)
+                promoted = EventInvitation.promote_from_waitlist(event.id)
+
+        if not claimed:
+            # Another request answered this invitation first
+            db.session.rollback()
+            db.session.refresh(invitation)
+            return jsonify({
+                "already_responded": True,
+                "message": f"You have already {invitation.status} this invitation",
+                "status": invitation.status,
+                "guest_name": invitation.guest_name or "Guest",
+                "waitlist_position": invitation.waitlist_position,
+            }), 200
+
         db.session.commit()
 
+        for promoted_invitation in promoted:
+            try:
+                send_waitlist_promotion_email(promoted_invitation, event)
+            except Exception as e:
+                print(f"Failed to notify promoted guest {promoted_invitation.guest_email}: {str(e)}")
+
         # Format event date and time nicely
         event_datetime = f"{event.date.strftime('%B %d, %Y')} at {event.time.strftime('%I:%M %p')}"
 
+        if invitation.status == 'waitlisted':
+            message = f"{event.title} is full. You have been added to the waitlist and will be notified if a spot opens up"
+        else:
+            message = f"Thank you! You have {invitation.status} the invitation to {event.title}"
+
         return jsonify({
             "success": True,
             "already_responded": False,
-            "message": f"Thank you! You have {invitation.status} the invitation to {event.title}",
+            "message": message,
             "status": invitation.status,
             "guest_name": invitation.guest_name or "Guest",
+            "waitlist_position": invitation.waitlist_position,
             "event": {
                 "title": event.title,
                 "description": event.description,
@@ -1,16 +1,43 @@
+import base64
 import os
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta, timezone
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt
+from utils.auth_context import auth_required, current_claims, current_principal
+from sqlalchemy import tuple_
 from decorators import admin_or_organizer_required, role_required
-from models import Event, Organization, User, UserRole, EventCategory, EventInvitation
+from models import Event, Organization, User, UserRole, EventCategory, EventInvitation, ReminderSchedule
 from extensions import db
-from utils.validators import is_non_empty_string, clean_string
+from utils.validators import is_non_empty_string, clean_string, is_valid_reminder_offsets
+from utils.email_helpers import send_waitlist_promotion_email
+from scheduler import schedule_event_reminders, cancel_event_reminders
 from . import events_bp as events
 
 
+def _parse_event_end(end_date, end_time, default_date):
+    """Build the naive UTC end timestamp from an optional end_date and an end_time"""
+    parsed_end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else default_date
+    time_format = "%H:%M" if len(end_time) == 5 else "%H:%M:%S"
+    return datetime.combine(parsed_end_date, datetime.strptime(end_time, time_format).time())
+
+
+def _encode_event_cursor(event):
+    """Opaque keyset cursor pointing just past the given event"""
+    raw = f"{event.starts_at.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_event_cursor(cursor):
+    """Inverse of _encode_event_cursor, raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        starts_at, event_id = raw.split("|", 1)
+        return datetime.fromisoformat(starts_at), int(event_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
 @events.route("/categories", methods=["GET"])
-@jwt_required()
+@auth_required
 def get_categories():
     """Get all available event categories"""
     categories = [
@@ -33,13 +60,9 @@ def create_event():
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
+        jwt_data = current_claims()
         user_role = jwt_data.get('role')
-        user = User.query.get(user_id)
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get request data
         data = request.get_json()
@@ -111,6 +134,17 @@ def create_event():
         except ValueError:
             return jsonify({"error": "Invalid time format. Use HH:MM"}), 400
 
+        # Validate optional end (end_date defaults to the event date)
+        ends_at = None
+        end_time = clean_string(data.get("end_time"))
+        if end_time:
+            try:
+                ends_at = _parse_event_end(clean_string(data.get("end_date")), end_time, parsed_date)
+            except ValueError:
+                return jsonify({"error": "Invalid end date/time format. Use YYYY-MM-DD and HH:MM"}), 400
+            if ends_at <= datetime.combine(parsed_date, parsed_time):
+                return jsonify({"error": "Event end must be after its start"}), 400
+
         # Validate title length
         if len(title.strip()) < 3:
             return jsonify({"error": "Event title must be at least 3 characters long"}), 400
@@ -129,6 +163,19 @@ def create_event():
                 "error": f"Invalid category. Valid options: {', '.join(valid_categories)}"
             }), 400
 
+        # Validate capacity (optional, null = unlimited)
+        max_capacity = data.get("max_capacity")
+        if max_capacity is not None:
+            if isinstance(max_capacity, bool) or not isinstance(max_capacity, int) or max_capacity < 1:
+                return jsonify({"error": "Max capacity must be a positive whole number"}), 400
+
+        # Validate reminder offsets (optional, null = organization default)
+        reminder_offsets = data.get("reminder_offsets")
+        if reminder_offsets is not None and not is_valid_reminder_offsets(reminder_offsets):
+            return jsonify({
+                "error": "Reminder offsets must be a list of up to 10 whole minutes before the event (max 30 days)"
+            }), 400
+
         # Create new event
         new_event = Event(
             title=title.strip(),
@@ -139,12 +186,17 @@ def create_event():
             is_public=bool(is_public),
             organization_id=org_id,
             user_id=user.id,
-            category=category
+            category=category,
+            max_capacity=max_capacity,
+            ends_at=ends_at,
+            reminder_offsets=reminder_offsets
         )
 
         db.session.add(new_event)
         db.session.commit()
 
+        schedule_event_reminders(new_event)
+
         return jsonify({
             "message": "Event created successfully",
             "event": new_event.to_dict()
@@ -160,7 +212,7 @@ def create_event():
 
 
 @events.route("", methods=["GET"])
-@jwt_required()
+@auth_required
 def get_events():
     """
     Get events with filtering options.
@@ -169,24 +221,23 @@ def get_events():
     - Filter options: 'public', 'my_org', 'all' (admin only)
     - Search: search by title, description, location
     - Date filters: date_from, date_to for date range
+    - Upcoming filter: only events that have not started yet
     - Category filter: filter by event category
+    - Pagination: offset/limit, or keyset via the returned next_cursor
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get query parameters
         filter_type = request.args.get('filter', 'public')  # Default to public events
         limit = request.args.get('limit', 50, type=int)
         offset = request.args.get('offset', 0, type=int)
+        cursor = request.args.get('cursor')
 
         # Search, date, and category filter parameters
         search = request.args.get('search', '').strip()
+        upcoming = request.args.get('upcoming', 'false').lower() == 'true'
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         category = request.args.get('category')
@@ -231,18 +282,24 @@ def get_events():
                 )
             )
 
-        # Apply date range filters
+        # Apply upcoming and date range filters (range scans on starts_at)
+        if upcoming:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            events_query = events_query.filter(Event.starts_at >= now)
+
         if date_from:
             try:
                 parsed_date_from = datetime.strptime(date_from, "%Y-%m-%d").date()
-                events_query = events_query.filter(Event.date >= parsed_date_from)
+                events_query = events_query.filter(Event.starts_at >= datetime.combine(parsed_date_from, time.min))
             except ValueError:
                 return jsonify({"error": "Invalid date_from format. Use YYYY-MM-DD"}), 400
 
         if date_to:
             try:
                 parsed_date_to = datetime.strptime(date_to, "%Y-%m-%d").date()
-                events_query = events_query.filter(Event.date <= parsed_date_to)
+                events_query = events_query.filter(
+                    Event.starts_at < datetime.combine(parsed_date_to + timedelta(days=1), time.min)
+                )
             except ValueError:
                 return jsonify({"error": "Invalid date_to format. Use YYYY-MM-DD"}), 400
 
@@ -255,12 +312,27 @@ def get_events():
                 }), 400
             events_query = events_query.filter(Event.category == category)
 
-        # Apply pagination
-        events = events_query.order_by(Event.date.asc(), Event.time.asc()).offset(offset).limit(limit).all()
-
         # Get total count for pagination
         total_count = events_query.count()
 
+        # Apply pagination - keyset when a cursor is given, offset otherwise
+        page_query = events_query.order_by(Event.starts_at.asc(), Event.id.asc())
+        if cursor:
+            try:
+                cursor_starts_at, cursor_id = _decode_event_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            page_query = page_query.filter(
+                tuple_(Event.starts_at, Event.id) > tuple_(cursor_starts_at, cursor_id)
+            )
+        else:
+            page_query = page_query.offset(offset)
+
+        events = page_query.limit(limit + 1).all()
+        has_more = len(events) > limit
+        events = events[:limit]
+        next_cursor = _encode_event_cursor(events[-1]) if has_more else None
+
         # Prepare events data
         events_data = []
         for event in events:
@@ -293,7 +365,8 @@ def get_events():
                     'total': len(invitations),
                     'accepted': len([inv for inv in invitations if inv.status == 'accepted']),
                     'declined': len([inv for inv in invitations if inv.status == 'declined']),
-                    'pending': len([inv for inv in invitations if inv.status == 'pending'])
+                    'pending': len([inv for inv in invitations if inv.status == 'pending']),
+                    'waitlisted': len([inv for inv in invitations if inv.status == 'waitlisted'])
                 }
 
             events_data.append(event_dict)
@@ -304,13 +377,15 @@ def get_events():
             "search": search if search else None,
             "date_from": date_from if date_from else None,
             "date_to": date_to if date_to else None,
+            "upcoming": upcoming,
             "category": category if category else None,
             "total_count": total_count,
             "returned_count": len(events_data),
             "pagination": {
                 "offset": offset,
                 "limit": limit,
-                "has_more": offset + limit < total_count
+                "has_more": has_more,
+                "next_cursor": next_cursor
             },
             "events": events_data
         }), 200
@@ -324,7 +399,7 @@ def get_events():
 
 
 @events.route("/<int:event_id>", methods=["GET"])
-@jwt_required()
+@auth_required
 def get_event(event_id):
     """
     View a specific event.
@@ -333,12 +408,7 @@ def get_event(event_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get the event
         event = Event.get_active().filter(Event.id == event_id).first()
@@ -389,9 +459,11 @@ def get_event(event_id):
                 'total': len(invitations),
                 'accepted': len([inv for inv in invitations if inv.status == 'accepted']),
                 'declined': len([inv for inv in invitations if inv.status == 'declined']),
-                'pending': len([inv for inv in invitations if inv.status == 'pending'])
+                'pending': len([inv for inv in invitations if inv.status == 'pending']),
+                'waitlisted': len([inv for inv in invitations if inv.status == 'waitlisted'])
             }
-            # Add detailed guest list
+            # Add detailed guest list, with waitlist positions from one query
+            waitlist_positions = EventInvitation.waitlist_positions(event.id)
             event_data['guests'] = [
                 {
                     'id': inv.id,
@@ -399,7 +471,8 @@ def get_event(event_id):
                     'name': inv.guest_name,
                     'status': inv.status,
                     'invited_at': inv.created_at.isoformat() if inv.created_at else None,
-                    'responded_at': inv.responded_at.isoformat() if inv.responded_at else None
+                    'responded_at': inv.responded_at.isoformat() if inv.responded_at else None,
+                    'waitlist_position': waitlist_positions.get(inv.id)
                 }
                 for inv in invitations
             ]
@@ -426,12 +499,7 @@ def update_event(event_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get the event
         event = Event.get_active().filter(Event.id == event_id).first()
@@ -455,6 +523,10 @@ def update_event(event_id):
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
 
+        # Remember the start and duration so moving the event keeps its end and reminders in step
+        old_starts_at = event.starts_at
+        old_duration = event.ends_at - event.starts_at if event.ends_at and event.starts_at else None
+
         # Update fields if provided
         if 'title' in data:
             title = data['title']
@@ -506,11 +578,67 @@ def update_event(event_id):
                 }), 400
             event.category = category
 
+        if 'end_time' in data:
+            # Cleaned the same way as in create_event
+            end_time = clean_string(data['end_time'])
+            if end_time:
+                try:
+                    ends_at = _parse_event_end(clean_string(data.get('end_date')), end_time, event.date)
+                except ValueError:
+                    return jsonify({"error": "Invalid end date/time format. Use YYYY-MM-DD and HH:MM"}), 400
+                if ends_at <= event.compute_starts_at():
+                    return jsonify({"error": "Event end must be after its start"}), 400
+                event.ends_at = ends_at
+            else:
+                event.ends_at = None
+        elif old_duration is not None:
+            event.ends_at = event.compute_starts_at() + old_duration
+
+        promoted = []
+        if 'max_capacity' in data:
+            max_capacity = data['max_capacity']
+            if max_capacity is not None:
+                if isinstance(max_capacity, bool) or not isinstance(max_capacity, int) or max_capacity < 1:
+                    return jsonify({"error": "Max capacity must be a positive whole number"}), 400
+                if max_capacity < (event.seats_taken or 0):
+                    return jsonify({
+                        "error": f"Max capacity cannot be lower than the {event.seats_taken} guest(s) already attending"
+                    }), 400
+            event.max_capacity = max_capacity
+            db.session.flush()
+            # Raising or removing the limit frees seats for waitlisted guests
+            promoted = EventInvitation.promote_from_waitlist(event.id)
+
+        offsets_changed = False
+        if 'reminder_offsets' in data:
+            reminder_offsets = data['reminder_offsets']
+            if reminder_offsets is not None and not is_valid_reminder_offsets(reminder_offsets):
+                return jsonify({
+                    "error": "Reminder offsets must be a list of up to 10 whole minutes before the event (max 30 days)"
+                }), 400
+            offsets_changed = reminder_offsets != event.reminder_offsets
+            event.reminder_offsets = reminder_offsets
+
+        # A moved event gets fresh reminders at its new time
+        rescheduled = event.compute_starts_at() != old_starts_at
+        if rescheduled or offsets_changed:
+            db.session.flush()
+            ReminderSchedule.sync(event, reset=rescheduled)
+
         # Update the updated_at timestamp
         event.updated_at = datetime.now()
 
         db.session.commit()
 
+        if rescheduled or offsets_changed:
+            schedule_event_reminders(event)
+
+        for invitation in promoted:
+            try:
+                send_waitlist_promotion_email(invitation, event)
+            except Exception as e:
+                print(f"Failed to notify promoted guest {invitation.guest_email}: {str(e)}")
+
         return jsonify({
             "message": "Event updated successfully",
             "event": event.to_dict()
@@ -534,12 +662,7 @@ def delete_event(event_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get the event
         event = Event.get_active().filter(Event.id == event_id).first()
@@ -566,6 +689,8 @@ def delete_event(event_id):
         event.soft_delete()
         db.session.commit()
 
+        cancel_event_reminders(event_id)
+
         return jsonify({
             "message": f"Event '{event_title}' scheduled for {event_date} has been deleted successfully"
         }), 200
@@ -584,16 +709,109 @@ def delete_event(event_id):
 @events.route("/admin/trigger-reminders", methods=["POST"])
 @role_required("admin")
 def trigger_reminders():
-    """Admin-only: manually trigger reminder check for testing"""
+    """
+    Admin-only: manually trigger a reminder check. The run is queued for the
+    scheduler leader (202); poll the returned status_url for its stats.
+    With {"dry_run": true, "from": ISO, "to": ISO} it simulates the runs over that
+    range without sending anything (defaults: now to 24 hours from now).
+    """
     try:
         from flask import current_app
-        from scheduler import check_and_send_reminders
-        check_and_send_reminders(current_app._get_current_object())
-        return jsonify({"message": "Reminder check triggered successfully"}), 200
+        from scheduler import dry_run_reminders, queue_manual_reminders
+
+        data = request.get_json(silent=True) or {}
+        if data.get("dry_run"):
+            try:
+                start = datetime.fromisoformat(data["from"]) if data.get("from") else datetime.now(timezone.utc)
+                end = datetime.fromisoformat(data["to"]) if data.get("to") else start + timedelta(hours=24)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Invalid 'from' or 'to'. Use ISO 8601 timestamps"}), 400
+            start = start.astimezone(timezone.utc).replace(tzinfo=None) if start.tzinfo else start
+            end = end.astimezone(timezone.utc).replace(tzinfo=None) if end.tzinfo else end
+            if end <= start:
+                return jsonify({"error": "'to' must be after 'from'"}), 400
+
+            stats = dry_run_reminders(current_app._get_current_object(), start, end)
+            return jsonify({
+                "message": "Dry run completed; no reminders were sent",
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "run": stats
+            }), 200
+
+        trigger_id = queue_manual_reminders()
+        if trigger_id is None:
+            return jsonify({"error": "The reminder scheduler is not running in this process"}), 503
+        return jsonify({
+            "message": "Reminder check queued on the scheduler leader",
+            "trigger_id": trigger_id,
+            "status_url": f"/api/events/admin/trigger-reminders/{trigger_id}"
+        }), 202
     except Exception as e:
         return jsonify({"error": f"Failed to trigger reminders: {str(e)}"}), 500
 
 
+@events.route("/admin/trigger-reminders/<trigger_id>", methods=["GET"])
+@role_required("admin")
+def trigger_reminders_status(trigger_id):
+    """Admin-only: status of a queued manual reminder run, and its stats once finished"""
+    try:
+        from scheduler import manual_reminders_status
+
+        status = manual_reminders_status(trigger_id)
+        if status is None:
+            return jsonify({"error": "Unknown or expired trigger"}), 404
+        status, run = status
+        return jsonify({"trigger_id": trigger_id, "status": status, "run": run}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to load reminder run: {str(e)}"}), 500
+
+
+@events.route("/admin/scheduler-metrics", methods=["GET"])
+@role_required("admin")
+def scheduler_metrics():
+    """
+    Admin-only: reminder scheduler counters, lag histogram and recent run timings
+    over the last ?hours (default 24), from the runs every process recorded,
+    plus this process's live view and connection-pool checkout waits.
+    ?format=prometheus returns this process's metrics in the Prometheus text
+    format instead; scrape every worker for the whole picture.
+    """
+    try:
+        import scheduler
+        from models import SchedulerRun
+        from utils import db_pools
+        from utils.scheduler_metrics import RECENT_RUNS, metrics, summarize_runs
+
+        is_leader = bool(scheduler.election and scheduler.election.is_leader)
+        if request.args.get("format") == "prometheus":
+            body = metrics.to_prometheus(is_leader=is_leader) + db_pools.to_prometheus()
+            return body, 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+        retention_hours = int(scheduler.SCHEDULER_RUN_RETENTION.total_seconds() // 3600)
+        hours = min(max(request.args.get("hours", 24, type=int), 1), retention_hours)
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=hours)
+        runs = [
+            run.to_dict() for run in
+            SchedulerRun.query.filter(SchedulerRun.started_at >= since).order_by(SchedulerRun.started_at.desc()).all()
+        ]
+
+        local = metrics.snapshot()
+        data = summarize_runs(runs)
+        data["hours"] = hours
+        data["recent_runs"] = runs[:RECENT_RUNS]
+        data["process"] = {
+            "pid": local["pid"],
+            "is_leader": is_leader,
+            "active_runs": local["active_runs"],
+            "max_concurrent_runs": local["max_concurrent_runs"],
+            "db_pools": db_pools.snapshot(),
+        }
+        return jsonify(data), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to load scheduler metrics: {str(e)}"}), 500
+
+
 @events.route("/admin/all", methods=["GET"])
 @role_required("admin")
 def admin_get_all_events():
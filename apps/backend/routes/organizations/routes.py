@@ -1,26 +1,28 @@
 import os
 from datetime import datetime, timedelta, timezone
 from flask import request, jsonify
-from flask_jwt_extended import get_jwt, jwt_required
+from utils.auth_context import current_claims, auth_required, current_user, current_principal
 from sqlalchemy import func
 
 from . import organization_bp as organization
 from decorators import admin_or_organizer_required, role_required, organization_member_required
-from models import Organization, User, UserRole, OrganizationInvitation
+from models import BackgroundJob, Event, Organization, User, UserRole, OrganizationInvitation, ReminderSchedule
 from extensions import db
-from utils.validators import is_valid_email, is_non_empty_string, clean_string
+from utils.validators import is_valid_email, is_non_empty_string, clean_string, is_valid_reminder_offsets, normalize_email
 from utils.email_helpers import send_invitation_email, send_registration_invitation_email
 from utils.rate_limiter import invitation_rate_limit
+from utils.search import search_organizations
+from utils.cascades import delete_organization as delete_organization_cascade, start_job as start_cascade_job
+from scheduler import schedule_event_reminders
 
 
 @organization.route("/create", methods=["POST"])
 @role_required("organizer", "admin")
 def create_organization():
     try:
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
+        jwt_data = current_claims()
         user_role = jwt_data.get('role')
-        user = User.query.get(user_id)
+        user = current_user()
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -86,7 +88,9 @@ def create_organization():
 
         return jsonify({
             "message": message,
-            "organization": new_organization.to_dict()
+            "organization": new_organization.to_dict(),
+            # Joining the organization invalidated the old token
+            "token": user.generate_token(timedelta(hours=2))
         }), 201
         
     except Exception as e:
@@ -136,6 +140,55 @@ def get_organizations(filter_type='all'):
         }), 500
 
 
+@organization.route("/search", methods=["GET"])
+@role_required("admin")
+def search_organizations_by_name():
+    """
+    Fuzzy search of organizations by name, most relevant first.
+    ADMIN ONLY
+    Query params: q, limit (default 20, max 100), include_deleted
+    """
+    try:
+        term = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
+
+        if not term:
+            return jsonify({"error": "Search term 'q' is required"}), 400
+
+        filters = [] if include_deleted else [Organization.deleted_at.is_(None)]
+        # One extra result tells whether more matches exist beyond the limit
+        ranked = search_organizations(term, *filters, limit=limit + 1)
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+        orgs = {
+            org.id: org
+            for org in Organization.query.filter(Organization.id.in_([org_id for org_id, _ in ranked]))
+        } if ranked else {}
+
+        results = []
+        for org_id, score in ranked:
+            if org_id in orgs:
+                org_dict = orgs[org_id].to_dict()
+                org_dict['relevance'] = round(score, 3)
+                results.append(org_dict)
+
+        return jsonify({
+            "message": "Organizations retrieved successfully",
+            "query": term,
+            "count": len(results),
+            "has_more": has_more,
+            "organizations": results
+        }), 200
+
+    except Exception as e:
+        print("Error in search_organizations_by_name:", str(e))
+        return jsonify({
+            "error": "Failed to search organizations",
+            "details": str(e)
+        }), 500
+
+
 @organization.route("/list", methods=["GET"])
 @role_required("admin")
 def get_all_organizations():
@@ -144,7 +197,7 @@ def get_all_organizations():
 
 
 @organization.route("/<int:org_id>/invite", methods=["POST"])
-@jwt_required()
+@auth_required
 @invitation_rate_limit
 def invite_user_to_organization(org_id):
     """
@@ -154,9 +207,7 @@ def invite_user_to_organization(org_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        inviter = User.query.get(user_id)
+        inviter = current_user()
 
         if not inviter:
             return jsonify({"error": "User not found"}), 404
@@ -173,7 +224,7 @@ def invite_user_to_organization(org_id):
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
 
-        email = data.get("email")
+        email = normalize_email(data.get("email"))
         role = data.get("role", UserRole.TEAM_MEMBER.value)  # Only team_members can join organizations
 
         # Validate input
@@ -239,8 +290,10 @@ def invite_user_to_organization(org_id):
                     }
                 }), 409
             else:
-                # Remove expired invitation
+                # Remove expired invitation; flushed now because the ORM inserts
+                # before it deletes, which would trip the one-open-invitation index
                 db.session.delete(existing_invite)
+                db.session.flush()
 
         # Create new invitation (works for both registered and unregistered users)
         new_invitation = OrganizationInvitation(
@@ -300,7 +353,7 @@ def invite_user_to_organization(org_id):
 
 
 @organization.route("/<int:org_id>", methods=["PUT"])
-@jwt_required()
+@auth_required
 def update_organization(org_id):
     """
     Update an organization's details.
@@ -308,12 +361,7 @@ def update_organization(org_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Check if the user is an organizer and belongs to this organization
         if user.role != UserRole.ORGANIZER.value:
@@ -361,7 +409,28 @@ def update_organization(org_id):
         if description is not None:
             organization.description = description.strip() if description.strip() else None
 
+        # Reminder offsets apply to every upcoming event that has none of its own
+        rescheduled_events = []
+        if "reminder_offsets" in data:
+            reminder_offsets = data["reminder_offsets"]
+            if reminder_offsets is not None and not is_valid_reminder_offsets(reminder_offsets):
+                return jsonify({
+                    "error": "Reminder offsets must be a list of up to 10 whole minutes before the event (max 30 days)"
+                }), 400
+            if reminder_offsets != organization.reminder_offsets:
+                organization.reminder_offsets = reminder_offsets
+                db.session.flush()
+                rescheduled_events = Event.get_upcoming().filter(
+                    Event.organization_id == org_id,
+                    Event.reminder_offsets.is_(None)
+                ).all()
+                for event in rescheduled_events:
+                    ReminderSchedule.sync(event)
+
         db.session.commit()
+
+        for event in rescheduled_events:
+            schedule_event_reminders(event)
         
         return jsonify({
             "message": "Organization updated successfully",
@@ -387,12 +456,7 @@ def delete_organization(org_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Check if the user is an organizer and belongs to this organization
         if user.role != UserRole.ORGANIZER.value:
@@ -411,35 +475,25 @@ def delete_organization(org_id):
         if organization.is_deleted:
             return jsonify({"error": "Organization is already deleted"}), 400
 
-        # Get all users in this organization
-        org_users = User.query.filter_by(organization_id=org_id).all()
-        
-        # Remove all users from the organization (they become unaffiliated)
-        for org_user in org_users:
-            org_user.organization_id = None
-            # Optionally, you might want to change their role to GUEST
-            if org_user.role in [UserRole.ORGANIZER.value, UserRole.TEAM_MEMBER.value]:
-                org_user.role = UserRole.GUEST.value
-
-        # Soft delete the organization
-        organization.soft_delete()
-        
-        # Cancel any pending invitations for this organization
-        pending_invitations = OrganizationInvitation.query.filter_by(
-            organization_id=org_id,
-            is_accepted=False
-        ).all()
-        
-        for invitation in pending_invitations:
-            db.session.delete(invitation)
-
+        # Detach members and cancel pending invitations with set-based
+        # statements; very large organizations finish in a background job
+        affected_users, cancelled_invitations, job = delete_organization_cascade(
+            organization, requested_by=user.id
+        )
         db.session.commit()
-        
-        return jsonify({
+        if job:
+            start_cascade_job(job)
+
+        # The organizer was detached (and became a guest), so their old token no longer works
+        response = {
             "message": "Organization deleted successfully",
-            "affected_users": len(org_users),
-            "cancelled_invitations": len(pending_invitations)
-        }), 200
+            "affected_users": affected_users,
+            "cancelled_invitations": cancelled_invitations,
+            "token": current_user().generate_token(timedelta(hours=2))
+        }
+        if job:
+            response["job"] = job.to_dict()
+        return jsonify(response), 202 if job else 200
         
     except Exception as e:
         print("Error in delete_organization:", str(e))
@@ -460,12 +514,7 @@ def get_organization(org_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get the organization
         organization = Organization.query.get(org_id)
@@ -518,9 +567,7 @@ def leave_organization():
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
+        user = current_user()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -550,7 +597,9 @@ def leave_organization():
         
         return jsonify({
             "message": f"Successfully left {organization_name}",
-            "new_role": UserRole.GUEST.value
+            "new_role": UserRole.GUEST.value,
+            # Leaving the organization invalidated the old token
+            "token": user.generate_token(timedelta(hours=2))
         }), 200
         
     except Exception as e:
@@ -572,12 +621,7 @@ def get_organization_members(org_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Get the organization
         organization = Organization.query.get(org_id)
@@ -605,7 +649,7 @@ def get_organization_members(org_id):
                 'email': member.email,
                 'role': member.role,
                 'created_at': member.created_at.isoformat() if member.created_at else None,
-                'is_current_user': member.id == user_id
+                'is_current_user': member.id == user.id
             }
             members_data.append(member_info)
 
@@ -646,12 +690,7 @@ def remove_organization_member(org_id, member_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Check if the user is an organizer and belongs to this organization
         if user.role != UserRole.ORGANIZER.value:
@@ -726,12 +765,7 @@ def change_member_role(org_id, member_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Check if the user is an organizer and belongs to this organization
         if user.role != UserRole.ORGANIZER.value:
@@ -835,12 +869,7 @@ def get_organization_invitations(org_id):
     """
     try:
         # Get the current user from JWT token
-        jwt_data = get_jwt()
-        user_id = jwt_data.get('user_id')
-        user = User.query.get(user_id)
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user = current_principal()
 
         # Check permissions: admins can view any org, organizers only their own
         if user.role == UserRole.ORGANIZER.value:
@@ -940,44 +969,52 @@ def admin_delete_organization(org_id):
         data = request.get_json() or {}
         remove_members = data.get('remove_members', True)  # Default: remove members from org
 
-        affected_users = 0
-        cancelled_invitations = 0
-
-        if remove_members:
-            # Get all users in this organization
-            org_users = User.query.filter_by(organization_id=org_id).all()
-            affected_users = len(org_users)
+        affected_users, cancelled_invitations, job = delete_organization_cascade(
+            organization, remove_members=remove_members
+        )
+        db.session.commit()
+        if job:
+            start_cascade_job(job)
 
-            # Remove all users from the organization
-            for org_user in org_users:
-                org_user.organization_id = None
-                if org_user.role in [UserRole.ORGANIZER.value, UserRole.TEAM_MEMBER.value]:
-                    org_user.role = UserRole.GUEST.value
+        response = {
+            "message": f"Organization '{organization.name}' deleted successfully",
+            "affected_users": affected_users,
+            "cancelled_invitations": cancelled_invitations
+        }
+        if job:
+            response["job"] = job.to_dict()
+        return jsonify(response), 202 if job else 200
 
-            # Cancel pending invitations
-            pending_invitations = OrganizationInvitation.query.filter_by(
-                organization_id=org_id,
-                is_accepted=False
-            ).all()
-            cancelled_invitations = len(pending_invitations)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "error": "Failed to delete organization",
+            "details": str(e)
+        }), 500
 
-            for invitation in pending_invitations:
-                db.session.delete(invitation)
 
-        # Soft delete the organization
-        organization.soft_delete()
+@organization.route("/jobs/<int:job_id>", methods=["GET"])
+@auth_required
+def get_background_job(job_id):
+    """
+    Progress of a background job, such as a large organization deletion.
+    Visible to the user who started it and to admins.
+    """
+    try:
+        user = current_principal()
 
-        db.session.commit()
+        job = db.session.get(BackgroundJob, job_id)
+        if not job or (user.role != UserRole.ADMIN.value and job.requested_by != user.id):
+            return jsonify({"error": "Job not found"}), 404
 
         return jsonify({
-            "message": f"Organization '{organization.name}' deleted successfully",
-            "affected_users": affected_users,
-            "cancelled_invitations": cancelled_invitations
+            "message": "Job retrieved successfully",
+            "job": job.to_dict()
         }), 200
 
     except Exception as e:
-        db.session.rollback()
+        print("Error in get_background_job:", str(e))
         return jsonify({
-            "error": "Failed to delete organization",
+            "error": "Failed to retrieve job",
             "details": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
@@ -1,77 +1,655 @@
+import atexit
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_STOPPED
+from sqlalchemy import and_, exists, or_, select, tuple_, update
+from sqlalchemy.orm import aliased
 
+from utils.db_pools import JOBS_BIND
+from utils.scheduler_metrics import metrics
+
+# Housekeeping (leader election) runs in every process
 scheduler = BackgroundScheduler()
+# Per-event reminder jobs live in the database; this scheduler is started paused
+# everywhere so any process can register jobs, and only the leader resumes it
+reminder_scheduler = BackgroundScheduler()
+election = None
+_app = None
 
+# How often every process campaigns for (or renews) scheduler leadership
+LEADER_HEARTBEAT_SECONDS = 30
+
+# The leader re-reads the job store at least this often, so jobs registered
+# by other processes fire at most this late
+REMINDER_JOBSTORE_POLL_SECONDS = 60
+
+# Reminder dispatch: bounded SMTP concurrency, one commit per batch, and a time box
+# so a slow mail server cannot keep a run going indefinitely
+REMINDER_SEND_CONCURRENCY = int(os.environ.get("REMINDER_SEND_CONCURRENCY", 8))
+REMINDER_BATCH_SIZE = int(os.environ.get("REMINDER_BATCH_SIZE", 50))
+REMINDER_RUN_TIME_BUDGET = timedelta(minutes=12)
+
+# Reminders for the same guest due in the same run are sent as one digest.
+# Optionally a run also pulls in that guest's reminders due within this lookahead,
+# sending them early (off by default: an early reminder is not sent again on time)
+REMINDER_DIGEST_LOOKAHEAD = timedelta(minutes=int(os.environ.get("REMINDER_DIGEST_LOOKAHEAD_MINUTES", 0)))
+
+# A claimed reminder whose run died mid-send becomes claimable again after this long
+REMINDER_CLAIM_LEASE = REMINDER_RUN_TIME_BUDGET + timedelta(minutes=3)
+
+# Admin-triggered runs: job name, and how long after queueing one can still be in progress
+MANUAL_RUN_JOB = "manual_reminders"
+MANUAL_RUN_STATUS_WINDOW = REMINDER_RUN_TIME_BUDGET + timedelta(seconds=2 * REMINDER_JOBSTORE_POLL_SECONDS)
+
+# Finished runs are kept in scheduler_run for the metrics endpoint this long
+SCHEDULER_RUN_RETENTION = timedelta(days=int(os.environ.get("SCHEDULER_RUN_RETENTION_DAYS", 7)))
+
+
+@contextmanager
+def _job_context(app):
+    """App context whose db.session runs on the background-job engine and pool"""
+    from extensions import db
 
-def check_and_send_reminders(app):
-    """Check for upcoming events and send reminder emails."""
     with app.app_context():
-        from models import Event, EventInvitation
-        from utils.email_helpers import send_event_reminder_email
-        from extensions import db
+        if JOBS_BIND in app.config.get("SQLALCHEMY_BINDS", {}):
+            db.session.info["bind_key"] = JOBS_BIND
+        yield
 
-        now = datetime.now(timezone.utc)
 
-        # Get all active events (not deleted)
-        active_events = Event.get_active().all()
+def _expire_stale_reminders(now):
+    """
+    Drop unsent reminders that should never go out: the event started or was
+    deleted, the guest is no longer attending, or a more specific reminder for the
+    same guest is also due (a late run only sends the closest one).
+    Returns the number of rows dropped.
+    """
+    from models import Event, EventInvitation, ReminderSchedule
+    from extensions import db
 
-        for event in active_events:
-            # Combine date and time into a datetime for comparison
-            try:
-                event_dt = datetime.combine(event.date, event.time, tzinfo=timezone.utc)
-            except Exception:
-                continue
+    dead_events = select(Event.id).where(or_(Event.deleted_at.isnot(None), Event.starts_at <= now))
+    not_attending = select(EventInvitation.id).where(EventInvitation.status != 'accepted')
+    closer = aliased(ReminderSchedule)
 
-            time_until = event_dt - now
+    expired = db.session.query(ReminderSchedule).filter(
+        ReminderSchedule.sent_at.is_(None),
+        or_(
+            ReminderSchedule.event_id.in_(dead_events),
+            ReminderSchedule.invitation_id.in_(not_attending),
+            and_(
+                ReminderSchedule.due_at <= now,
+                exists().where(
+                    closer.invitation_id == ReminderSchedule.invitation_id,
+                    closer.offset_minutes < ReminderSchedule.offset_minutes,
+                    closer.due_at <= now
+                )
+            )
+        )
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return expired
 
-            # 24-hour reminders: event is between 23h and 25h away
-            if timedelta(hours=23) <= time_until <= timedelta(hours=25):
-                invitations = EventInvitation.query.filter_by(
-                    event_id=event.id,
-                    status='accepted',
-                    reminder_24h_sent=False
-                ).all()
 
-                for inv in invitations:
-                    try:
-                        send_event_reminder_email(inv, event, 24)
-                        inv.reminder_24h_sent = True
-                    except Exception as e:
-                        print(f"Failed 24h reminder for {inv.guest_email}: {e}")
+def _pending_reminders_query(*columns):
+    """Unsent reminders of accepted guests for live events, joined with both"""
+    from models import Event, EventInvitation, ReminderSchedule
+    from extensions import db
+
+    return db.session.query(*columns).join(
+        EventInvitation, ReminderSchedule.invitation_id == EventInvitation.id
+    ).join(
+        Event, ReminderSchedule.event_id == Event.id
+    ).filter(
+        ReminderSchedule.sent_at.is_(None),
+        Event.deleted_at.is_(None),
+        EventInvitation.status == 'accepted'
+    )
+
+
+def _claim_due_reminders(now, skip_ids, event_id=None, due_by=None, guest_emails=None):
+    """
+    Claim the next batch of reminders due by due_by (default now) and return them with
+    their invitation and event. On PostgreSQL the rows are locked with FOR UPDATE
+    SKIP LOCKED, so concurrent runs claim disjoint batches; the conditional UPDATE
+    keeps the claim safe elsewhere.
+    """
+    from models import Event, EventInvitation, ReminderSchedule
+    from extensions import db
+
+    lease_expired = or_(
+        ReminderSchedule.claimed_at.is_(None),
+        ReminderSchedule.claimed_at < now - REMINDER_CLAIM_LEASE
+    )
+    query = _pending_reminders_query(ReminderSchedule.id).filter(
+        ReminderSchedule.due_at <= (due_by or now),
+        lease_expired,
+        Event.starts_at > now
+    )
+    if event_id is not None:
+        query = query.filter(ReminderSchedule.event_id == event_id)
+    if guest_emails is not None:
+        query = query.filter(EventInvitation.guest_email.in_(guest_emails))
+    if skip_ids:
+        query = query.filter(ReminderSchedule.id.notin_(skip_ids))
+
+    candidate_ids = [
+        row.id for row in query.order_by(ReminderSchedule.due_at)
+        .limit(REMINDER_BATCH_SIZE)
+        .with_for_update(skip_locked=True, of=ReminderSchedule)
+    ]
+    if not candidate_ids:
+        db.session.commit()
+        return []
+
+    claimed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.session.execute(
+        update(ReminderSchedule)
+        .where(ReminderSchedule.id.in_(candidate_ids), ReminderSchedule.sent_at.is_(None), lease_expired)
+        .values(claimed_at=claimed_at)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = db.session.query(ReminderSchedule, EventInvitation, Event).join(
+        EventInvitation, ReminderSchedule.invitation_id == EventInvitation.id
+    ).join(
+        Event, ReminderSchedule.event_id == Event.id
+    ).filter(
+        ReminderSchedule.id.in_(candidate_ids),
+        ReminderSchedule.claimed_at == claimed_at
+    ).all()
+    batch = [
+        (reminder.id, reminder.offset_minutes, reminder.due_at, reminder.event_id) + _snapshot(inv, event)
+        for reminder, inv, event in claimed
+    ]
+    db.session.commit()
+    return batch
+
+
+def _finish_reminders(sent_ids, failed_ids):
+    """Mark sent reminders and release failed claims so a later run retries them"""
+    from models import ReminderSchedule
+    from extensions import db
+
+    if sent_ids:
+        db.session.execute(
+            update(ReminderSchedule)
+            .where(ReminderSchedule.id.in_(sent_ids))
+            .values(sent_at=datetime.now(timezone.utc).replace(tzinfo=None), claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    if failed_ids:
+        db.session.execute(
+            update(ReminderSchedule)
+            .where(ReminderSchedule.id.in_(failed_ids))
+            .values(claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
 
-                if invitations:
-                    db.session.commit()
 
-            # 1-hour reminders: event is between 45min and 1h15min away
-            if timedelta(minutes=45) <= time_until <= timedelta(hours=1, minutes=15):
-                invitations = EventInvitation.query.filter_by(
-                    event_id=event.id,
-                    status='accepted',
-                    reminder_1h_sent=False
-                ).all()
+def _send_reminder(app, reminders):
+    """
+    Worker-thread body: send one guest's reminders inside its own app context,
+    as a single email or a digest. Returns when it went out.
+    """
+    from utils.email_helpers import send_event_reminder_email, send_event_reminder_digest_email
 
-                for inv in invitations:
+    # A guest gets each event once, with its closest offset
+    closest = {}
+    for _reminder_id, minutes_before, _due_at, event_id, inv, event in reminders:
+        if event_id not in closest or minutes_before < closest[event_id][2]:
+            closest[event_id] = (inv, event, minutes_before)
+
+    with app.app_context():
+        if len(closest) == 1:
+            inv, event, minutes_before = next(iter(closest.values()))
+            send_event_reminder_email(inv, event, minutes_before)
+        else:
+            inv = reminders[0][4]
+            send_event_reminder_digest_email(inv, [(event, minutes) for _inv, event, minutes in closest.values()])
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _group_by_guest(batch):
+    """Group claimed reminders by recipient address (stored normalized)"""
+    groups = {}
+    for reminder in batch:
+        groups.setdefault(reminder[4].guest_email, []).append(reminder)
+    return groups
+
+
+def _snapshot(invitation, event):
+    """Detach the fields the email needs so worker threads never touch the session"""
+    invitation_data = SimpleNamespace(
+        id=invitation.id,
+        guest_email=invitation.guest_email,
+        guest_name=invitation.guest_name,
+        status=invitation.status,
+    )
+    event_data = SimpleNamespace(
+        title=event.title,
+        date=event.date,
+        time=event.time,
+        starts_at=event.starts_at,
+        location=event.location,
+    )
+    return invitation_data, event_data
+
+
+def _send_due_reminders(app, stats, event_id=None):
+    """
+    Claim, send and commit one batch at a time through one bounded pool.
+    Failures are released for the next run, and nothing new starts after the time box.
+    Fills stats with what the run did.
+    """
+    stats.update(batches=0, claimed=0, emails=0, emails_sent=0, sent=0, failed=0, in_flight=0, events=0, timed_out=False)
+    events = set()
+
+    with _job_context(app):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        deadline = datetime.now(timezone.utc) + REMINDER_RUN_TIME_BUDGET
+        attempted = set()
+
+        pool = ThreadPoolExecutor(max_workers=REMINDER_SEND_CONCURRENCY, thread_name_prefix="reminder")
+        try:
+            while True:
+                remaining = (deadline - datetime.now(timezone.utc)).total_seconds()
+                if remaining <= 0:
+                    stats["timed_out"] = True
+                    print("Reminder run out of time; remaining reminders are left for the next run")
+                    return
+
+                batch = _claim_due_reminders(now, attempted, event_id=event_id)
+                if not batch:
+                    return
+                attempted.update(reminder[0] for reminder in batch)
+
+                # Pull the same guests' other reminders due soon into their digest
+                if REMINDER_DIGEST_LOOKAHEAD:
+                    companions = _claim_due_reminders(
+                        now, attempted,
+                        due_by=now + REMINDER_DIGEST_LOOKAHEAD,
+                        guest_emails=list(_group_by_guest(batch))
+                    )
+                    attempted.update(reminder[0] for reminder in companions)
+                    batch += companions
+
+                groups = _group_by_guest(batch)
+                futures = {pool.submit(_send_reminder, app, reminders): reminders for reminders in groups.values()}
+                events.update(reminder[3] for reminder in batch)
+                stats["batches"] += 1
+                stats["claimed"] += len(batch)
+                stats["emails"] += len(groups)
+                stats["events"] = len(events)
+                done, not_done = wait(futures, timeout=remaining)
+
+                sent, failed = [], []
+                emails_sent = 0
+                for future in done:
+                    reminders = futures[future]
+                    reminder_ids = [reminder[0] for reminder in reminders]
                     try:
-                        send_event_reminder_email(inv, event, 1)
-                        inv.reminder_1h_sent = True
+                        sent_at = future.result()
+                        emails_sent += 1
+                        sent.extend(reminder_ids)
+                        for reminder in reminders:
+                            # Reminders pulled in early by the lookahead were not late
+                            if reminder[2] <= sent_at:
+                                metrics.observe_lag((sent_at - reminder[2]).total_seconds(), stats)
                     except Exception as e:
-                        print(f"Failed 1h reminder for {inv.guest_email}: {e}")
+                        failed.extend(reminder_ids)
+                        print(f"Failed reminder for {reminders[0][4].guest_email}: {e}")
+
+                stats["sent"] += len(sent)
+                stats["failed"] += len(failed)
+                stats["emails_sent"] += emails_sent
+                metrics.inc("reminders_sent", len(sent))
+                metrics.inc("reminders_failed", len(failed))
+                metrics.inc("reminder_emails_sent", emails_sent)
+
+                # Sends still in flight past the deadline count as sent; they may yet succeed
+                # and retrying them could email the guest twice
+                in_flight = [reminder[0] for future in not_done for reminder in futures[future]]
+                stats["in_flight"] += len(in_flight)
+                sent.extend(in_flight)
+                _finish_reminders(sent, failed)
+
+                if not_done:
+                    stats["timed_out"] = True
+                    print(f"Reminder run out of time with {len(not_done)} send(s) still in flight")
+                    return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
 
-                if invitations:
-                    db.session.commit()
+def _expire_and_send(app, stats):
+    with _job_context(app):
+        stats["expired"] = _expire_stale_reminders(datetime.now(timezone.utc).replace(tzinfo=None))
+    metrics.inc("reminders_expired", stats["expired"])
+    _send_due_reminders(app, stats)
+
+
+def check_and_send_reminders(app):
+    """
+    Send every reminder whose time has passed for events that have not started.
+    Used to catch up after downtime. Returns the run's stats.
+    """
+    with metrics.track_run("catch_up") as stats:
+        _expire_and_send(app, stats)
+    return stats
+
+
+def run_manual_reminders(trigger_id):
+    """
+    Job target for the admin manual trigger, queued in the shared job store so
+    it runs on the leader like every other reminder run (see queue_manual_reminders).
+    """
+    if _app is None:
+        return
+    with metrics.track_run(MANUAL_RUN_JOB) as stats:
+        stats["trigger_id"] = trigger_id
+        _expire_and_send(_app, stats)
+
+
+def queue_manual_reminders():
+    """
+    Queue a one-shot catch-up run on the leader. The leader picks it up within
+    REMINDER_JOBSTORE_POLL_SECONDS. Returns its trigger id, or None if no
+    scheduler runs in this process.
+    """
+    if reminder_scheduler.state == STATE_STOPPED:
+        return None
+    trigger_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    reminder_scheduler.add_job(
+        'scheduler:run_manual_reminders',
+        'date',
+        run_date=datetime.now(timezone.utc),
+        args=[trigger_id],
+        id=f"{MANUAL_RUN_JOB}-{trigger_id}",
+        jobstore='reminders',
+        misfire_grace_time=None
+    )
+    return trigger_id
+
+
+def manual_reminders_status(trigger_id):
+    """
+    (status, run) of a queued manual run: queued, running, completed or failed,
+    with the recorded run once finished. None if the trigger id is unknown.
+    Needs an app context.
+    """
+    from models import SchedulerRun
+
+    try:
+        queued_at = datetime.fromtimestamp(int(trigger_id.split("-", 1)[0]), timezone.utc)
+    except ValueError:
+        return None
+    for run in SchedulerRun.query.filter(
+        SchedulerRun.job == MANUAL_RUN_JOB,
+        SchedulerRun.started_at >= queued_at.replace(tzinfo=None)
+    ).all():
+        if run.stats.get("trigger_id") == trigger_id:
+            return ("failed" if run.error else "completed"), run.to_dict()
+
+    if reminder_scheduler.state != STATE_STOPPED and reminder_scheduler.get_job(
+        f"{MANUAL_RUN_JOB}-{trigger_id}", jobstore='reminders'
+    ):
+        return "queued", None
+    # Fired and not recorded yet: running, unless it would have finished long ago
+    if datetime.now(timezone.utc) - queued_at <= MANUAL_RUN_STATUS_WINDOW:
+        return "running", None
+    return None
+
+
+def run_event_reminder(event_id, offset_minutes=None):
+    """
+    Job target for one event and offset. Stored by reference in the job store.
+    Sends every reminder of the event that is due, whichever offset woke it up.
+    """
+    if _app is None:
+        return
+    with metrics.track_run("event_reminder") as stats:
+        stats["event_id"] = event_id
+        _send_due_reminders(_app, stats, event_id=event_id)
+
+
+def dry_run_reminders(app, start, end):
+    """
+    Simulate the reminder runs between start and end (naive UTC) without sending
+    or claiming anything: walk the due rows in claim-sized batches, exactly as the
+    scheduler would read them, and report what would go out and how long reading took.
+    """
+    from models import Event, ReminderSchedule
+
+    with metrics.track_run("dry_run") as stats:
+        with _job_context(app):
+            query = _pending_reminders_query(
+                ReminderSchedule.id, ReminderSchedule.due_at, ReminderSchedule.event_id,
+                ReminderSchedule.offset_minutes
+            ).filter(
+                ReminderSchedule.due_at > start,
+                ReminderSchedule.due_at <= end,
+                Event.starts_at > ReminderSchedule.due_at
+            ).order_by(ReminderSchedule.due_at, ReminderSchedule.id)
+
+            events = set()
+            by_offset = {}
+            stats.update(batches=0, would_send=0, query_ms=0.0)
+            last = None
+            while True:
+                page = query
+                if last is not None:
+                    page = page.filter(tuple_(ReminderSchedule.due_at, ReminderSchedule.id) > tuple_(*last))
+                started = time.perf_counter()
+                rows = page.limit(REMINDER_BATCH_SIZE).all()
+                stats["query_ms"] += (time.perf_counter() - started) * 1000
+                if not rows:
+                    break
+                stats["batches"] += 1
+                stats["would_send"] += len(rows)
+                for row in rows:
+                    events.add(row.event_id)
+                    by_offset[row.offset_minutes] = by_offset.get(row.offset_minutes, 0) + 1
+                last = (rows[-1].due_at, rows[-1].id)
+
+            stats["query_ms"] = round(stats["query_ms"], 1)
+            stats["events"] = len(events)
+            stats["by_offset_minutes"] = dict(sorted(by_offset.items(), reverse=True))
+    return stats
+
+
+def _reminder_job_prefix(event_id):
+    return f"event-{event_id}-reminder-"
+
+
+def _reminder_job_id(event_id, offset_minutes):
+    return f"{_reminder_job_prefix(event_id)}{offset_minutes}m"
+
+
+def schedule_event_reminders(event):
+    """
+    Register (or move) the exact-time reminder jobs for an event, one per offset.
+    Offsets already in the past are dropped; catch-up covers them if still relevant.
+    """
+    if reminder_scheduler.state == STATE_STOPPED or event.starts_at is None:
+        return
+
+    starts_at = event.starts_at.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc)
+    offsets = event.effective_reminder_offsets()
+
+    wanted = set()
+    for offset_minutes in offsets:
+        run_at = starts_at - timedelta(minutes=offset_minutes)
+        if run_at <= now:
+            continue
+        job_id = _reminder_job_id(event.id, offset_minutes)
+        wanted.add(job_id)
+        reminder_scheduler.add_job(
+            'scheduler:run_event_reminder',
+            'date',
+            run_date=run_at,
+            args=[event.id, offset_minutes],
+            id=job_id,
+            jobstore='reminders',
+            replace_existing=True,
+            coalesce=True,
+            misfire_grace_time=None  # run late after downtime; the job itself skips started events
+        )
+
+    for job_id in _event_job_ids(event.id) - wanted:
+        _remove_job(job_id)
+
+
+def cancel_event_reminders(event_id):
+    """Remove every pending reminder job for an event"""
+    if reminder_scheduler.state == STATE_STOPPED:
+        return
+    for job_id in _event_job_ids(event_id):
+        _remove_job(job_id)
+
+
+def _event_job_ids(event_id):
+    prefix = _reminder_job_prefix(event_id)
+    return {job.id for job in reminder_scheduler.get_jobs(jobstore='reminders') if job.id.startswith(prefix)}
+
+
+def _remove_job(job_id):
+    try:
+        reminder_scheduler.remove_job(job_id, jobstore='reminders')
+    except JobLookupError:
+        pass
+
+
+def _register_missing_reminder_jobs(app):
+    """Create jobs for upcoming events that have none yet (e.g. created while no scheduler ran)"""
+    from models import Event
+
+    with _job_context(app):
+        existing = {job.id for job in reminder_scheduler.get_jobs(jobstore='reminders')}
+        now = datetime.now(timezone.utc)
+
+        for event in Event.get_upcoming().all():
+            starts_at = event.starts_at.replace(tzinfo=timezone.utc)
+            job_ids = {
+                _reminder_job_id(event.id, offset_minutes)
+                for offset_minutes in event.effective_reminder_offsets()
+                if starts_at - timedelta(minutes=offset_minutes) > now
+            }
+            if not job_ids <= existing:
+                schedule_event_reminders(event)
+
+
+def _catch_up(app):
+    """
+    First run on a new leader: resume interrupted background jobs, register
+    missing reminder jobs and send what is due, then resume reminder jobs
+    """
+    from utils.cascades import resume_jobs
+
+    try:
+        resume_jobs(app)
+    except Exception as e:
+        print(f"Resuming background jobs failed: {e}")
+    try:
+        _register_missing_reminder_jobs(app)
+        check_and_send_reminders(app)
+    except Exception as e:
+        print(f"Reminder catch-up failed: {e}")
+    if election.is_leader:
+        reminder_scheduler.resume()
+
+
+def _campaign(app):
+    """Election heartbeat; resumes reminder jobs on the leader only"""
+    was_leader = election.is_leader
+    is_leader = election.campaign()
+
+    if is_leader and not was_leader:
+        # One-shot job of its own: the catch-up can take up to a full send budget,
+        # and the heartbeat must not wait for it
+        scheduler.add_job(_catch_up, id='reminder_catch_up', replace_existing=True, args=[app])
+    elif was_leader and not is_leader:
+        reminder_scheduler.pause()
+
+
+def _record_run(run):
+    """Persist a finished run so the metrics endpoint sees it from any process"""
+    from models import SchedulerRun
+    from extensions import db
+
+    if _app is None:
+        return
+    started_at = run["started_at"].astimezone(timezone.utc).replace(tzinfo=None)
+    with _job_context(_app):
+        try:
+            db.session.add(SchedulerRun(
+                job=run["job"],
+                pid=os.getpid(),
+                started_at=started_at,
+                duration_ms=run["duration_ms"],
+                error=run["error"],
+                stats={
+                    key: value for key, value in run.items()
+                    if key not in ("job", "started_at", "duration_ms", "error")
+                }
+            ))
+            db.session.query(SchedulerRun).filter(
+                SchedulerRun.started_at < started_at - SCHEDULER_RUN_RETENTION
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def _wake_up():
+    """No-op job that makes the leader re-read the shared job store"""
 
 
 def init_scheduler(app):
     """Initialize and start the reminder scheduler."""
+    global election, _app
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+    from extensions import db
+    from utils.leader_election import LeaderElection
+
+    _app = app
+    metrics.set_recorder(_record_run)
+    with app.app_context():
+        engine = db.engines.get(JOBS_BIND, db.engine)
+
+    reminder_scheduler.add_jobstore(SQLAlchemyJobStore(engine=engine), 'reminders')
+    reminder_scheduler.add_jobstore(MemoryJobStore(), 'default')
+    reminder_scheduler.start(paused=True)
+    reminder_scheduler.add_job(
+        _wake_up,
+        'interval',
+        seconds=REMINDER_JOBSTORE_POLL_SECONDS,
+        id='reminder_jobstore_poll',
+        replace_existing=True
+    )
+
+    election = LeaderElection(app)
+    atexit.register(election.resign)
+
+    # Followers retry on every heartbeat, so a dead leader is replaced within one
+    # interval. The first campaign runs right away on the scheduler thread, not here,
+    # so app startup never waits for an election or a reminder catch-up
     scheduler.add_job(
-        check_and_send_reminders,
+        _campaign,
         'interval',
-        minutes=15,
-        id='event_reminders',
+        seconds=LEADER_HEARTBEAT_SECONDS,
+        id='leader_election',
         replace_existing=True,
+        next_run_time=datetime.now(timezone.utc),
         args=[app]
     )
     scheduler.start()
-    print("Event reminder scheduler started (runs every 15 minutes)")
+    print("Event reminder scheduler started (exact-time jobs run on the elected leader)")
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+import werkzeug
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("JWT_SECRET_KEY", "test-jwt-secret-key-that-is-long-enough")
+os.environ.setdefault("FLASK_SECRET_KEY", "test-flask-secret-key")
+os.environ.setdefault("VERIFIED_EMAIL", "no-reply@example.com")
+os.environ["BCRYPT_LOG_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["RATE_LIMIT_STORAGE"] = "memory"
+os.environ["RATE_LIMIT_SWEEP_SECONDS"] = "0"
+os.environ.pop("DATABASE_URL", None)
+os.environ.pop("WERKZEUG_RUN_MAIN", None)
+
+# Flask 2.2's test client reads werkzeug.__version__, which Werkzeug 3.1 no longer has
+if not hasattr(werkzeug, "__version__"):
+    werkzeug.__version__ = "3.1.3"
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from utils import token_versions  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Every test's database reuses user ids; versions cached by an earlier test must not apply
+    token_versions._cache.clear()
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
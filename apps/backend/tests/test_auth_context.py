@@ -0,0 +1,50 @@
+"""The access token is verified once per request, however many layers read it"""
+from datetime import date, time, timedelta
+
+import flask_jwt_extended.view_decorators as view_decorators
+
+from extensions import db
+from models import Event, Organization, User
+
+
+def test_token_is_verified_once_per_request(app, client, monkeypatch):
+    with app.app_context():
+        organization = Organization("Verify Org")
+        db.session.add(organization)
+        db.session.flush()
+        organizer = User("verifier@example.com", "Passw0rd!", "Vera", "Verifier", organization.id, role="organizer")
+        db.session.add(organizer)
+        db.session.flush()
+        event = Event(
+            "Meetup", "Monthly", date.today() + timedelta(days=7), "Cafe", True,
+            time(19, 0), organization.id, organizer.id
+        )
+        db.session.add(event)
+        db.session.commit()
+        event_id = event.id
+        headers = {"Authorization": f"Bearer {organizer.generate_token()}"}
+
+    decoded = []
+    decode_token = view_decorators.decode_token
+
+    def counting_decode_token(*args, **kwargs):
+        decoded.append(args[0])
+        return decode_token(*args, **kwargs)
+
+    monkeypatch.setattr(view_decorators, "decode_token", counting_decode_token)
+
+    # role_required, then invitation_rate_limit (keyed on the token's identity), then current_user()
+    response = client.post(
+        f"/api/events/{event_id}/invite-guests",
+        headers=headers,
+        json={"guests": [{"email": "guest@example.com", "name": "Guest"}]},
+    )
+
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["total_sent"] == 1
+    assert len(decoded) == 1
+
+    decoded.clear()
+    response = client.post(f"/api/events/{event_id}/invite-guests", headers=headers, json={"guests": []})
+    assert response.status_code == 400
+    assert len(decoded) == 1
@@ -0,0 +1,128 @@
+"""Seat reservation and waitlist under parallel RSVPs"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from threading import Barrier
+
+from sqlalchemy import event as sqlalchemy_event
+
+from extensions import db
+from models import Event, EventInvitation, Organization, User
+
+CAPACITY = 5
+GUESTS = 40
+
+
+def _create_event(app):
+    with app.app_context():
+        organization = Organization("Capacity Org")
+        db.session.add(organization)
+        db.session.flush()
+        organizer = User("organizer@example.com", "Passw0rd!", "Olive", "Organizer", organization.id, role="organizer")
+        db.session.add(organizer)
+        db.session.flush()
+        event = Event(
+            "Launch", "Limited seats", date.today() + timedelta(days=3), "Hall A", True,
+            time(18, 0), organization.id, organizer.id, max_capacity=CAPACITY
+        )
+        db.session.add(event)
+        db.session.flush()
+        invitations = [EventInvitation(event.id, f"guest{i}@example.com", f"Guest {i}") for i in range(GUESTS)]
+        db.session.add_all(invitations)
+        db.session.commit()
+        return event.id, [invitation.invitation_token for invitation in invitations]
+
+
+def _rsvp_in_parallel(client, tokens, response):
+    barrier = Barrier(len(tokens))
+
+    def rsvp(token):
+        barrier.wait()
+        return client.post(f"/api/events/rsvp/{token}", json={"response": response})
+
+    with ThreadPoolExecutor(max_workers=len(tokens)) as executor:
+        return list(executor.map(rsvp, tokens))
+
+
+def _waitlist(event_id):
+    return (
+        EventInvitation.query
+        .filter_by(event_id=event_id, status="waitlisted")
+        .order_by(EventInvitation.waitlisted_at, EventInvitation.id)
+        .all()
+    )
+
+
+def test_parallel_accepts_fill_capacity_and_waitlist_the_rest(app, client):
+    event_id, tokens = _create_event(app)
+
+    responses = _rsvp_in_parallel(client, tokens, "accept")
+
+    assert all(response.status_code == 200 for response in responses)
+    statuses = [response.get_json()["status"] for response in responses]
+    assert statuses.count("accepted") == CAPACITY
+    assert statuses.count("waitlisted") == GUESTS - CAPACITY
+
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        assert event.seats_taken == event.max_capacity == CAPACITY
+        assert EventInvitation.query.filter_by(event_id=event_id, status="accepted").count() == CAPACITY
+
+        # Positions follow the order guests joined the waitlist
+        waitlist = _waitlist(event_id)
+        assert len(waitlist) == GUESTS - CAPACITY
+        assert [invitation.waitlist_position for invitation in waitlist] == list(range(1, len(waitlist) + 1))
+        joined = [invitation.waitlisted_at for invitation in waitlist]
+        assert joined == sorted(joined)
+
+
+def test_decline_promotes_exactly_one_guest_in_fifo_order(app, client):
+    event_id, tokens = _create_event(app)
+    _rsvp_in_parallel(client, tokens, "accept")
+
+    with app.app_context():
+        waitlist = [invitation.guest_email for invitation in _waitlist(event_id)]
+        accepted = [
+            invitation.invitation_token
+            for invitation in EventInvitation.query.filter_by(event_id=event_id, status="accepted")
+        ]
+
+    for expected_promotion, token in zip(waitlist[:2], accepted[:2]):
+        response = client.post(f"/api/events/rsvp/{token}", json={"response": "decline"})
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "declined"
+
+        with app.app_context():
+            event = db.session.get(Event, event_id)
+            assert event.seats_taken == CAPACITY
+            promoted = EventInvitation.query.filter_by(guest_email=expected_promotion).one()
+            assert promoted.status == "accepted"
+            assert EventInvitation.query.filter_by(event_id=event_id, status="accepted").count() == CAPACITY
+
+    with app.app_context():
+        assert [invitation.guest_email for invitation in _waitlist(event_id)] == waitlist[2:]
+
+
+def test_guest_list_waitlist_positions_take_one_query(app, client):
+    event_id, tokens = _create_event(app)
+    _rsvp_in_parallel(client, tokens, "accept")
+
+    with app.app_context():
+        expected = {invitation.id: invitation.waitlist_position for invitation in _waitlist(event_id)}
+        assert EventInvitation.waitlist_positions(event_id) == expected
+        headers = {"Authorization": f"Bearer {User.query.filter_by(email='organizer@example.com').one().generate_token()}"}
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    sqlalchemy_event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(f"/api/events/{event_id}/guest-list", headers=headers)
+    finally:
+        sqlalchemy_event.remove(engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    positions = {guest["id"]: guest["waitlist_position"] for guest in response.get_json()["guests"] if guest["waitlist_position"]}
+    assert positions == expected
+    # Independent of the number of waitlisted guests
+    assert len(statements) < 10
@@ -0,0 +1,54 @@
+"""Optional event end, on create and update"""
+from datetime import date, timedelta
+
+from extensions import db
+from models import Organization, User
+
+
+def _organizer_headers(app):
+    with app.app_context():
+        organization = Organization("End Org")
+        db.session.add(organization)
+        db.session.flush()
+        organizer = User("ender@example.com", "Passw0rd!", "Ed", "Ender", organization.id, role="organizer")
+        db.session.add(organizer)
+        db.session.commit()
+        return {"Authorization": f"Bearer {organizer.generate_token()}"}
+
+
+def test_padded_end_is_accepted_on_create_and_update(app, client):
+    headers = _organizer_headers(app)
+    event_date = (date.today() + timedelta(days=5)).isoformat()
+
+    response = client.post("/api/events/create", headers=headers, json={
+        "title": "Workshop",
+        "description": "Hands-on",
+        "date": event_date,
+        "time": "10:00",
+        "location": "Room 1",
+        "end_date": f" {event_date} ",
+        "end_time": " 12:00 ",
+    })
+    assert response.status_code == 201, response.get_json()
+    event = response.get_json()["event"]
+    assert event["ends_at"].startswith(f"{event_date}T12:00")
+
+    response = client.put(f"/api/events/{event['id']}", headers=headers, json={
+        "end_date": f" {event_date} ",
+        "end_time": " 13:30 ",
+    })
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["event"]["ends_at"].startswith(f"{event_date}T13:30")
+
+
+def test_blank_end_time_clears_the_end_on_update(app, client):
+    headers = _organizer_headers(app)
+    event_date = (date.today() + timedelta(days=5)).isoformat()
+    event_id = client.post("/api/events/create", headers=headers, json={
+        "title": "Workshop", "description": "Hands-on", "date": event_date, "time": "10:00",
+        "location": "Room 1", "end_time": "12:00",
+    }).get_json()["event"]["id"]
+
+    response = client.put(f"/api/events/{event_id}", headers=headers, json={"end_time": "  "})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["event"]["ends_at"] is None
@@ -0,0 +1,61 @@
+"""The admin reminder trigger queues a run for the leader instead of running it in the request"""
+import time
+
+import pytest
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import scheduler
+from extensions import db, mail
+from models import User
+from utils.scheduler_metrics import metrics
+
+
+@pytest.fixture
+def leader_scheduler(app, monkeypatch):
+    """A paused reminder scheduler, as on a follower, that the test resumes as the leader"""
+    reminder_scheduler = BackgroundScheduler()
+    reminder_scheduler.add_jobstore(MemoryJobStore(), 'reminders')
+    reminder_scheduler.start(paused=True)
+    monkeypatch.setattr(scheduler, "reminder_scheduler", reminder_scheduler)
+    monkeypatch.setattr(scheduler, "_app", app)
+    monkeypatch.setattr(metrics, "_recorder", scheduler._record_run)
+    yield reminder_scheduler
+    reminder_scheduler.shutdown(wait=True)
+
+
+def _admin_headers(app):
+    with app.app_context():
+        admin = User("admin@example.com", "Passw0rd!", "Ada", "Admin", None, role="admin")
+        db.session.add(admin)
+        db.session.commit()
+        return {"Authorization": f"Bearer {admin.generate_token()}"}
+
+
+def test_trigger_is_queued_and_its_stats_can_be_polled(app, client, leader_scheduler, monkeypatch):
+    monkeypatch.setattr(mail, "send", lambda message: None)
+    headers = _admin_headers(app)
+
+    response = client.post("/api/events/admin/trigger-reminders", headers=headers)
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+    assert client.get(status_url, headers=headers).get_json()["status"] == "queued"
+
+    leader_scheduler.resume()
+    for _ in range(50):
+        body = client.get(status_url, headers=headers).get_json()
+        if body["status"] == "completed":
+            break
+        time.sleep(0.1)
+
+    assert body["status"] == "completed"
+    assert body["run"]["job"] == scheduler.MANUAL_RUN_JOB
+    assert body["run"]["sent"] == 0
+
+
+def test_trigger_without_a_scheduler_and_unknown_triggers(app, client):
+    headers = _admin_headers(app)
+
+    assert client.post("/api/events/admin/trigger-reminders", headers=headers).status_code == 503
+    assert client.get("/api/events/admin/trigger-reminders/0-deadbeef", headers=headers).status_code == 404
+    assert client.get("/api/events/admin/trigger-reminders/bogus", headers=headers).status_code == 404
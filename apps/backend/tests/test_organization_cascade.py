@@ -0,0 +1,108 @@
+"""Organization delete jobs: resumed after a restart, never run twice at once"""
+import threading
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import BackgroundJob, Organization, User
+from utils import cascades
+from utils.cascades import ORGANIZATION_DELETE_JOB, resume_jobs
+
+
+def _wait_for_cascades():
+    for thread in threading.enumerate():
+        if thread.name.startswith("org-cascade-"):
+            thread.join(timeout=10)
+
+
+def _deleted_organization(members):
+    organization = Organization("Acme")
+    db.session.add(organization)
+    db.session.flush()
+    db.session.add_all(
+        User(f"member{i}@example.com", "Passw0rd!", "Mem", f"Ber{i}", organization.id, role="team_member")
+        for i in range(members)
+    )
+    organization.soft_delete()
+    db.session.flush()
+    return organization
+
+
+def _assert_completed(job_id, org_id, total):
+    job = db.session.get(BackgroundJob, job_id)
+    assert job.status == "completed"
+    assert job.processed == total
+    assert job.finished_at is not None
+    remaining = db.session.execute(
+        db.select(db.func.count(User.id)).where(User.organization_id == org_id)
+    ).scalar_one()
+    assert remaining == 0
+    assert set(db.session.execute(db.select(User.role)).scalars()) == {"guest"}
+
+
+def test_interrupted_job_is_resumed(app, monkeypatch):
+    monkeypatch.setenv("ORG_CASCADE_BATCH_SIZE", "3")
+    stale = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        organization = _deleted_organization(10)
+        # The process stopped after detaching the first batch
+        Organization.detach_members(organization.id, limit=3)
+        job = BackgroundJob(
+            kind=ORGANIZATION_DELETE_JOB, target_id=organization.id, total=10, processed=3,
+            status="running", heartbeat_at=stale
+        )
+        finished = BackgroundJob(kind=ORGANIZATION_DELETE_JOB, target_id=organization.id, total=1, processed=1, status="completed")
+        db.session.add_all([job, finished])
+        db.session.commit()
+        job_id, org_id = job.id, organization.id
+
+    assert resume_jobs(app) == [job_id]
+    _wait_for_cascades()
+
+    with app.app_context():
+        _assert_completed(job_id, org_id, 10)
+
+
+def test_job_with_a_live_lease_is_left_alone(app):
+    with app.app_context():
+        organization = _deleted_organization(4)
+        job = BackgroundJob(
+            kind=ORGANIZATION_DELETE_JOB, target_id=organization.id, total=4,
+            status="running", heartbeat_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+        job_id, org_id = job.id, organization.id
+
+    assert resume_jobs(app) == []
+    cascades._detach_members_in_batches(app, job_id)
+
+    with app.app_context():
+        assert db.session.get(BackgroundJob, job_id).processed == 0
+        remaining = db.session.execute(
+            db.select(db.func.count(User.id)).where(User.organization_id == org_id)
+        ).scalar_one()
+        assert remaining == 4
+
+
+def test_concurrent_starts_claim_the_job_once(app, monkeypatch):
+    monkeypatch.setenv("ORG_CASCADE_BATCH_SIZE", "2")
+    with app.app_context():
+        organization = _deleted_organization(9)
+        job = BackgroundJob(kind=ORGANIZATION_DELETE_JOB, target_id=organization.id, total=9)
+        db.session.add(job)
+        db.session.commit()
+        job_id, org_id = job.id, organization.id
+
+    claims = []
+    claim = cascades._claim
+    monkeypatch.setattr(cascades, "_claim", lambda job_id: claims.append(claim(job_id)) or claims[-1])
+
+    # The request's thread and a new leader's resume race for the same pending job
+    for _ in range(4):
+        cascades._start(app, job_id)
+    _wait_for_cascades()
+
+    assert len(claims) == 4
+    assert sum(heartbeat is not None for heartbeat in claims) == 1
+    with app.app_context():
+        _assert_completed(job_id, org_id, 9)
@@ -0,0 +1,46 @@
+"""Bounds of the password hashing pool"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.password_hashing import HashingPool, PasswordHashingBusy
+
+
+@pytest.fixture
+def pool():
+    pool = HashingPool(workers=1, queue_size=0, wait_seconds=0, timeout_seconds=0.2)
+    yield pool
+    if pool._executor is not None:
+        pool._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes(pool):
+    with pytest.raises(PasswordHashingBusy):
+        pool.run(time.sleep, 1)
+
+    # The abandoned job is still running, so the pool is still full
+    with pytest.raises(PasswordHashingBusy):
+        pool.run(time.sleep, 0)
+    assert pool.rejected == 2
+
+    time.sleep(1.2)
+    assert pool.run(pow, 2, 10) == 1024
+
+
+def test_rejections_are_all_counted(pool):
+    pool.timeout_seconds = 5
+    pool._get_executor().submit(pow, 1, 1).result()  # Start the worker process up front
+
+    def attempt(_):
+        try:
+            pool.run(time.sleep, 0.5)
+            return True
+        except PasswordHashingBusy:
+            return False
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(attempt, range(20)))
+
+    assert results.count(True) >= 1
+    assert pool.rejected == results.count(False)
@@ -0,0 +1,181 @@
+"""The same cases for every rate-limit store backend"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from types import SimpleNamespace
+
+import pytest
+
+import utils.rate_limiter as rate_limiter
+from utils.rate_limit_stores import DatabaseStore, MemoryStore, SQLiteStore
+
+WINDOW = 100
+START = 1_000_000
+
+
+def _at_most(limit):
+    return lambda previous, current: current < limit
+
+
+@pytest.fixture(params=["memory", "sqlite", "database"])
+def store(request, app, tmp_path):
+    if request.param == "memory":
+        store = MemoryStore(max_keys=1000)
+    elif request.param == "sqlite":
+        store = SQLiteStore(str(tmp_path / "rate_limits.db"))
+    else:
+        store = DatabaseStore(app)
+    with app.app_context():
+        yield store
+
+
+def test_unknown_key_has_no_counts(store):
+    assert store.get_counts("nobody", START, WINDOW) == (0, 0)
+
+
+def test_hit_counts_allowed_requests_only(store):
+    results = [store.hit("client", START, WINDOW, _at_most(3)) for _ in range(5)]
+
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False, False]
+    assert results[2] == (True, 0, 3)
+    assert results[4] == (False, 0, 3)
+    assert store.get_counts("client", START, WINDOW) == (0, 3)
+
+
+def test_increment_always_counts(store):
+    for _ in range(4):
+        store.increment("client", START, WINDOW)
+    assert store.get_counts("client", START, WINDOW) == (0, 4)
+
+
+def test_keys_are_counted_separately(store):
+    store.hit("a", START, WINDOW, _at_most(10))
+    store.hit("a", START, WINDOW, _at_most(10))
+    store.hit("b", START, WINDOW, _at_most(10))
+    assert store.get_counts("a", START, WINDOW) == (0, 2)
+    assert store.get_counts("b", START, WINDOW) == (0, 1)
+
+
+def test_window_rollover(store):
+    for _ in range(3):
+        store.hit("client", START, WINDOW, _at_most(10))
+
+    # The next window sees the old one as its previous window
+    assert store.get_counts("client", START + WINDOW, WINDOW) == (3, 0)
+    assert store.hit("client", START + WINDOW, WINDOW, _at_most(10)) == (True, 3, 1)
+
+    # Once a whole window has passed, nothing counts any more
+    assert store.get_counts("client", START + 3 * WINDOW, WINDOW) == (0, 0)
+    assert store.hit("client", START + 3 * WINDOW, WINDOW, _at_most(10)) == (True, 0, 1)
+
+
+def test_sweep_removes_only_expired_keys(store):
+    store.hit("old", START, WINDOW, _at_most(10))
+    store.hit("new", START + WINDOW, WINDOW, _at_most(10))
+
+    # A key expires once its current window has also ended
+    assert store.sweep(now=START + 2 * WINDOW - 1) == 0
+    assert store.size() == 2
+
+    assert store.sweep(now=START + 2 * WINDOW) == 1
+    assert store.size() == 1
+    assert store.get_counts("new", START + WINDOW, WINDOW) == (0, 1)
+    assert store.swept == 1
+    assert store.last_sweep_at == START + 2 * WINDOW
+
+    assert store._delete_expired(START + 3 * WINDOW) == 1
+    assert store.size() == 0
+
+
+def test_clear_and_size(store):
+    assert store.size() == 0
+    for key in ("a", "b", "c"):
+        store.hit(key, START, WINDOW, _at_most(10))
+    assert store.size() == 3
+
+    store.clear()
+    assert store.size() == 0
+    assert store.get_counts("a", START, WINDOW) == (0, 0)
+
+
+def test_stats(store):
+    store.hit("client", START, WINDOW, _at_most(10))
+    stats = store.stats()
+    assert stats["backend"] == store.backend
+    assert stats["size"] == 1
+    assert stats["evictions"] == 0
+
+
+def test_memory_store_evicts_least_recently_used_key():
+    store = MemoryStore(max_keys=2, stripes=1)
+    store.hit("a", START, WINDOW, _at_most(10))
+    store.hit("b", START, WINDOW, _at_most(10))
+    # Touch "a" so "b" becomes the least recently used key
+    store.get_counts("a", START, WINDOW)
+
+    store.hit("c", START, WINDOW, _at_most(10))
+
+    assert store.size() == 2
+    assert store.evictions == 1
+    assert store.stats()["max_keys"] == 2
+    assert store.get_counts("a", START, WINDOW) == (0, 1)
+    # "b" was evicted, so it starts over (and evicts the next least recently used key)
+    assert store.get_counts("b", START, WINDOW) == (0, 0)
+
+
+def _hammer(app, hit, threads, hits):
+    """Call hit() hits times from many threads at once; returns the allowed count"""
+    barrier = Barrier(threads)
+
+    def worker(count):
+        with app.app_context():
+            barrier.wait()
+            return sum(1 for _ in range(count) if hit())
+
+    per_thread = [hits // threads + (1 if i < hits % threads else 0) for i in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return sum(executor.map(worker, per_thread))
+
+
+def test_concurrent_hits_on_one_key_never_exceed_the_limit(app, store):
+    allowed = _hammer(app, lambda: store.hit("hot", START, WINDOW, _at_most(100))[0], threads=32, hits=1000)
+
+    assert allowed == 100
+    assert store.get_counts("hot", START, WINDOW) == (0, 100)
+
+
+def test_concurrent_rate_limited_requests_allow_exactly_the_limit(app, store, monkeypatch):
+    # Freeze the limiter's clock mid-window so the whole run falls in one window
+    now = START + WINDOW / 2
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(time=lambda: now))
+
+    allowed = _hammer(
+        app,
+        lambda: rate_limiter.hit_rate_limit("ip:203.0.113.7", 100, WINDOW, store=store)[0],
+        threads=32,
+        hits=1000,
+    )
+
+    assert allowed == 100
+    assert rate_limiter.check_rate_limit("ip:203.0.113.7", 100, WINDOW, store=store)[0] is False
+
+
+def test_sqlite_store_switches_the_file_to_wal_once(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    SQLiteStore(path)
+
+    # Persistent: a second store (another worker) finds it set and new connections inherit it
+    store = SQLiteStore(path)
+    assert store._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_store_failure_lets_the_request_through(app):
+    class BrokenStore(MemoryStore):
+        def hit(self, key, window_start, window_seconds, allow):
+            raise RuntimeError("database is locked")
+
+    @rate_limiter.rate_limit(max_requests=1, window_seconds=WINDOW, key_func=lambda: "ip:203.0.113.7", store=BrokenStore())
+    def view():
+        return "ok"
+
+    with app.test_request_context():
+        assert view() == "ok"
@@ -0,0 +1,59 @@
+"""Reminder emails: wording from the event's start, nothing sent ahead of time by default"""
+from datetime import datetime, timedelta
+
+import scheduler
+from extensions import db, mail
+from models import Event, EventInvitation, Organization, ReminderSchedule, User
+from utils.email_helpers import _offset_text
+
+
+def test_offset_text():
+    assert _offset_text(24 * 60) == "tomorrow"
+    assert _offset_text(3 * 24 * 60) == "in 3 days"
+    assert _offset_text(5 * 60) == "in 5 hours"
+    assert _offset_text(110) == "in 1 hour 50 minutes"
+    assert _offset_text(60) == "in 1 hour"
+    assert _offset_text(15) == "in 15 minutes"
+
+
+def _event(organization_id, organizer_id, title, starts_in):
+    starts_at = (datetime.utcnow() + starts_in).replace(microsecond=0)
+    event = Event(title, "", starts_at.date(), "Hall", True, starts_at.time(), organization_id, organizer_id)
+    db.session.add(event)
+    db.session.flush()
+    invitation = EventInvitation(event.id, "guest@example.com", "Gus")
+    invitation.status = "accepted"
+    db.session.add(invitation)
+    db.session.flush()
+    db.session.add(ReminderSchedule(
+        invitation_id=invitation.id, event_id=event.id, offset_minutes=60, due_at=starts_at - timedelta(minutes=60)
+    ))
+    return event
+
+
+def test_final_reminder_states_the_real_time_left_and_later_reminders_wait(app, monkeypatch):
+    with app.app_context():
+        organization = Organization("Reminder Org")
+        db.session.add(organization)
+        db.session.flush()
+        organizer = User("organizer@example.com", "Passw0rd!", "Olive", "Organizer", organization.id, role="organizer")
+        db.session.add(organizer)
+        db.session.flush()
+        # Due 10 minutes ago (a late run), and due in 50 minutes
+        _event(organization.id, organizer.id, "Late", timedelta(minutes=50))
+        later = _event(organization.id, organizer.id, "Later", timedelta(minutes=110))
+        db.session.commit()
+        later_id = later.id
+
+    sent = []
+    monkeypatch.setattr(mail, "send", sent.append)
+    stats = {}
+    scheduler._send_due_reminders(app, stats)
+
+    assert [message.subject for message in sent] == ["Final Reminder: Late is in 50 minutes"]
+    assert stats["sent"] == 1
+    with app.app_context():
+        pending = db.session.execute(
+            db.select(ReminderSchedule).where(ReminderSchedule.event_id == later_id)
+        ).scalar_one()
+        assert pending.sent_at is None
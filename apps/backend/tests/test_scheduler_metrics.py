@@ -0,0 +1,77 @@
+"""Scheduler metrics come from the runs every process recorded, not one worker's memory"""
+from datetime import datetime, timedelta
+
+import scheduler
+from extensions import db, mail
+from models import Event, EventInvitation, Organization, ReminderSchedule, SchedulerRun, User
+from utils.scheduler_metrics import metrics
+
+
+def _admin_headers():
+    admin = User("admin@example.com", "Passw0rd!", "Ada", "Admin", None, role="admin")
+    db.session.add(admin)
+    db.session.commit()
+    return {"Authorization": f"Bearer {admin.generate_token()}"}
+
+
+def _due_reminder():
+    organization = Organization("Metrics Org")
+    db.session.add(organization)
+    db.session.flush()
+    organizer = User("organizer@example.com", "Passw0rd!", "Olive", "Organizer", organization.id, role="organizer")
+    db.session.add(organizer)
+    db.session.flush()
+    starts_at = (datetime.utcnow() + timedelta(minutes=50)).replace(microsecond=0)
+    event = Event("Soon", "", starts_at.date(), "Hall", True, starts_at.time(), organization.id, organizer.id)
+    db.session.add(event)
+    db.session.flush()
+    invitation = EventInvitation(event.id, "guest@example.com", "Gus")
+    invitation.status = "accepted"
+    db.session.add(invitation)
+    db.session.flush()
+    db.session.add(ReminderSchedule(
+        invitation_id=invitation.id, event_id=event.id, offset_minutes=60, due_at=starts_at - timedelta(minutes=60)
+    ))
+    db.session.commit()
+
+
+def test_metrics_endpoint_reports_runs_recorded_by_any_process(app, client, monkeypatch):
+    monkeypatch.setattr(scheduler, "_app", app)
+    monkeypatch.setattr(metrics, "_recorder", scheduler._record_run)
+    monkeypatch.setattr(mail, "send", lambda message: None)
+    with app.app_context():
+        headers = _admin_headers()
+        _due_reminder()
+
+    scheduler.check_and_send_reminders(app)
+    # The request is served by a worker that ran nothing itself
+    metrics.reset()
+
+    body = client.get("/api/events/admin/scheduler-metrics", headers=headers).get_json()
+    assert body["counters"]["runs"] == 1
+    assert body["counters"]["reminders_sent"] == 1
+    assert body["counters"]["reminder_emails_sent"] == 1
+    assert body["reminder_lag_seconds"]["count"] == 1
+    assert [run["job"] for run in body["recent_runs"]] == ["catch_up"]
+    assert body["process"]["active_runs"] == 0
+
+
+def test_old_runs_are_purged_and_prometheus_output_is_per_process(app, client, monkeypatch):
+    monkeypatch.setattr(scheduler, "_app", app)
+    with app.app_context():
+        headers = _admin_headers()
+        db.session.add(SchedulerRun(
+            job="catch_up", pid=1, started_at=datetime.utcnow() - timedelta(days=30), duration_ms=1.0, stats={}
+        ))
+        db.session.commit()
+
+    scheduler._record_run({
+        "job": "event_reminder", "started_at": datetime.now().astimezone(), "duration_ms": 2.0, "error": None
+    })
+
+    with app.app_context():
+        assert [run.job for run in SchedulerRun.query.all()] == ["event_reminder"]
+
+    body = client.get("/api/events/admin/scheduler-metrics?format=prometheus", headers=headers).get_data(as_text=True)
+    assert body.startswith("# Metrics of process")
+    assert 'scheduler_runs_total{pid="' in body
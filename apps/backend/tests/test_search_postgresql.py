@@ -0,0 +1,45 @@
+"""PostgreSQL search queries: short words as prefixes, ranking over bounded candidates"""
+from sqlalchemy.dialects import postgresql
+
+from utils import search
+
+
+class _RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, *args):
+        self.statements.append(statement)
+        return self
+
+    def all(self):
+        return []
+
+
+def _search_sql(app, monkeypatch, words, limit=10):
+    session = _RecordingSession()
+    with app.app_context(), monkeypatch.context() as patch:
+        patch.setattr(search.db, "session", session)
+        search.users._search_postgresql(words, [], limit)
+    return str(session.statements[-1].compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    ))
+
+
+def test_short_words_only_match_field_prefixes(app, monkeypatch):
+    sql = _search_sql(app, monkeypatch, ["jo", "smith"])
+
+    assert "LIKE 'jo%%'" in sql
+    assert "'%%jo%%'" not in sql
+    assert "'jo' <%" not in sql
+    assert "word_similarity('jo'" not in sql
+    # Longer words still use the trigram match
+    assert "'%%smith%%'" in sql
+    assert "'smith' <%" in sql
+
+
+def test_only_a_bounded_set_of_candidates_is_ranked(app, monkeypatch):
+    monkeypatch.setenv("SEARCH_MAX_CANDIDATES", "500")
+    assert "LIMIT 500)" in _search_sql(app, monkeypatch, ["smith"])
+    # Never fewer candidates than the results asked for
+    assert "LIMIT 800)" in _search_sql(app, monkeypatch, ["smith"], limit=800)
@@ -0,0 +1,57 @@
+"""Revocations reach every worker's filter, whatever order their rows commit in"""
+from datetime import datetime, timedelta, timezone
+
+from extensions import db
+from models import RevokedToken
+from utils.token_blocklist import RevocationList
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _insert(row_id, jti, revoked_at):
+    db.session.add(RevokedToken(
+        id=row_id, jti=jti, user_id=1, expires_at=_utcnow() + timedelta(hours=1), revoked_at=revoked_at
+    ))
+    db.session.commit()
+
+
+def test_row_committed_out_of_id_order_is_still_synced(app):
+    with app.app_context():
+        worker = RevocationList(capacity=1000, sync_seconds=0, rebuild_seconds=3600)
+        assert not worker.is_revoked("never-revoked")
+
+        # A transaction that began first (lower id, earlier revoked_at) commits last
+        began_at = _utcnow()
+        _insert(5, "committed-first", _utcnow())
+        assert worker.is_revoked("committed-first")
+
+        _insert(3, "committed-last", began_at)
+        assert worker.is_revoked("committed-last")
+
+
+def test_rows_read_again_are_not_added_twice(app):
+    with app.app_context():
+        worker = RevocationList(capacity=1000, sync_seconds=0, rebuild_seconds=3600)
+        worker.is_revoked("warm-up")
+        _insert(1, "a", _utcnow())
+        _insert(2, "b", _utcnow())
+
+        for _ in range(5):
+            worker.is_revoked("x")
+        assert worker._filter.count == 2
+
+
+def test_revoke_is_seen_by_other_workers(app):
+    with app.app_context():
+        revoking = RevocationList(capacity=1000, sync_seconds=0, rebuild_seconds=3600)
+        other = RevocationList(capacity=1000, sync_seconds=0, rebuild_seconds=3600)
+        assert not other.is_revoked("logout-jti")
+
+        revoking.revoke({"jti": "logout-jti", "user_id": 1, "exp": (_utcnow() + timedelta(hours=1)).replace(tzinfo=timezone.utc).timestamp()})
+        db.session.commit()
+
+        assert revoking.is_revoked("logout-jti")
+        assert other.is_revoked("logout-jti")
+        assert revoking._filter.count == 1
@@ -0,0 +1,31 @@
+"""Tokens issued before token versions existed keep working until their user changes"""
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import Organization, User
+
+
+def _legacy_token(user):
+    # The claims tokens carried before token_version and organization_id were added
+    return create_access_token(identity=user.email, additional_claims={"user_id": user.id, "role": user.role})
+
+
+def test_legacy_token_is_accepted_with_claims_from_the_user_row(app, client):
+    with app.app_context():
+        organization = Organization("Legacy Org")
+        db.session.add(organization)
+        db.session.flush()
+        member = User("legacy@example.com", "Passw0rd!", "Lee", "Gacy", organization.id, role="team_member")
+        db.session.add(member)
+        db.session.commit()
+        org_id, member_id = organization.id, member.id
+        headers = {"Authorization": f"Bearer {_legacy_token(member)}"}
+
+    response = client.get(f"/api/organization/{org_id}", headers=headers)
+    assert response.status_code == 200, response.get_json()
+
+    # The first role change bumps the version past 0 and retires the token
+    with app.app_context():
+        db.session.get(User, member_id).role = "organizer"
+        db.session.commit()
+    assert client.get(f"/api/organization/{org_id}", headers=headers).status_code == 401
@@ -0,0 +1,56 @@
+"""CSV user import: hash cost and per-row failures"""
+from extensions import db
+from models import User
+from utils.user_import import UserImport, import_users
+
+CSV = [
+    "email,first_name,last_name,password",
+    "ann@example.com,Ann,Lee,Passw0rd!",
+]
+
+
+def _cost(email):
+    return int(db.session.execute(db.select(User.password).where(User.email == email)).scalar_one().split("$")[2])
+
+
+def test_imported_passwords_use_the_configured_cost(app, monkeypatch):
+    monkeypatch.delenv("USER_IMPORT_LOG_ROUNDS", raising=False)
+    with app.app_context():
+        assert import_users(CSV)["imported"] == 1
+        assert _cost("ann@example.com") == app.config["BCRYPT_LOG_ROUNDS"]
+
+
+def test_import_cost_can_be_lowered_explicitly(app, monkeypatch):
+    monkeypatch.setenv("USER_IMPORT_LOG_ROUNDS", "5")
+    with app.app_context():
+        assert import_users(CSV)["imported"] == 1
+        assert _cost("ann@example.com") == 5
+
+
+def test_rows_failing_a_constraint_report_their_own_reason(app, monkeypatch):
+    from sqlalchemy import event as sqlalchemy_event
+
+    with app.app_context():
+        sqlalchemy_event.listen(
+            db.engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys=ON")
+        )
+        db.engine.dispose()
+        db.session.add(User("taken@example.com", "Passw0rd!", "Tak", "En", None))
+        db.session.commit()
+
+        importer = UserImport()
+        # Both checks passed, then the account was registered and the organization deleted meanwhile
+        importer._organizations = {999: True}
+        monkeypatch.setattr(importer, "_check_emails", lambda chunk: chunk)
+        result = importer.run([
+            "email,first_name,last_name,role,organization_id",
+            "taken@example.com,Tak,En,guest,",
+            "org@example.com,Or,Gan,organizer,999",
+            "ok@example.com,O,K,guest,",
+        ])
+
+        assert result["imported"] == 1
+        errors = {error["email"]: error["error"] for error in result["errors"]}
+        assert errors["taken@example.com"] == "Email already registered"
+        assert errors["org@example.com"].startswith("Could not be inserted: ")
+        assert "FOREIGN KEY" in errors["org@example.com"]
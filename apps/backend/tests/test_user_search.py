@@ -0,0 +1,43 @@
+"""Admin user search: ranked pages and an uncapped total"""
+from extensions import db
+from models import User
+
+
+def _admin_headers(app, smiths):
+    with app.app_context():
+        admin = User("admin@example.com", "Passw0rd!", "Ada", "Admin", None, role="admin")
+        db.session.add(admin)
+        db.session.add_all(
+            User(f"smith{i}@example.com", "Passw0rd!", f"Sam{i}", "Smith", None) for i in range(smiths)
+        )
+        db.session.add(User("jones@example.com", "Passw0rd!", "Jo", "Jones", None))
+        db.session.commit()
+        return {"Authorization": f"Bearer {admin.generate_token()}"}
+
+
+def test_total_is_not_capped_by_the_result_limit(app, client, monkeypatch):
+    monkeypatch.setenv("SEARCH_MAX_RESULTS", "10")
+    headers = _admin_headers(app, 30)
+
+    first = client.get("/api/auth/admin/users?search=smith&per_page=5", headers=headers).get_json()
+    assert first["total_count"] == 30
+    assert first["total_pages"] == 6
+    assert first["has_more"] is True
+
+    # Pages beyond the default result cap are still reachable
+    seen = set()
+    for page in range(1, 7):
+        body = client.get(f"/api/auth/admin/users?search=smith&per_page=5&page={page}", headers=headers).get_json()
+        assert len(body["users"]) == 5
+        assert body["has_more"] is (page < 6)
+        seen.update(user["email"] for user in body["users"])
+    assert seen == {f"smith{i}@example.com" for i in range(30)}
+
+
+def test_search_count_can_be_skipped(app, client):
+    headers = _admin_headers(app, 3)
+
+    body = client.get("/api/auth/admin/users?search=smith&include_count=false", headers=headers).get_json()
+    assert len(body["users"]) == 3
+    assert body["total_count"] is None
+    assert body["has_more"] is False
@@ -0,0 +1,140 @@
+"""
+Per-request authentication context.
+
+The access token is verified and decoded once per request and cached on flask.g.
+auth_required, role_required, the rate limiters and the route handlers all read
+the identity and claims from there instead of verifying the token again, and
+current_user() loads the token's user at most once per request.
+"""
+from functools import wraps
+from flask import g
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+from extensions import db
+
+_NOT_LOADED = object()
+
+
+class AuthContext:
+    """
+    Identity and claims of the request's verified access token. Tokens with an
+    outdated token_version are rejected during verification, so the role and
+    organization claims are current and the context can stand in for the user
+    in authorization checks (see current_principal).
+    """
+    __slots__ = ("identity", "claims", "user")
+
+    def __init__(self, identity, claims):
+        self.identity = identity
+        self.claims = claims
+        self.user = _NOT_LOADED
+
+    @property
+    def user_id(self):
+        return self.claims.get("user_id")
+
+    # Same names as the User columns, so handlers can use either
+    id = user_id
+
+    @property
+    def email(self):
+        return self.identity
+
+    @property
+    def role(self):
+        return self.claims.get("role")
+
+    @property
+    def organization_id(self):
+        return self.claims.get("organization_id")
+
+
+def load_auth_context(optional=False):
+    """
+    Verify the request's token on first use and return its AuthContext.
+    With optional=True a request without a token gets None instead of an error.
+    Invalid tokens raise the usual Flask-JWT-Extended errors (handled as 401/422).
+    """
+    context = g.get("auth_context", _NOT_LOADED)
+    if context is _NOT_LOADED or (context is None and not optional):
+        verified = verify_jwt_in_request(optional=optional)
+        context = AuthContext(get_jwt_identity(), _current_claims(verified[1])) if verified else None
+        g.auth_context = context
+    return context
+
+
+def _current_claims(claims):
+    """
+    Tokens issued before token versions existed lack the organization_id claim
+    and may carry an outdated role; take both from the user row for them. Such
+    tokens expire within their lifetime (a day), after which this costs nothing.
+    """
+    from models import User
+
+    if "token_version" in claims:
+        return claims
+    row = db.session.execute(
+        db.select(User.role, User.organization_id).where(User.id == claims.get("user_id"))
+    ).one_or_none()
+    if row is None:
+        return claims
+    return {**claims, "role": row.role, "organization_id": row.organization_id}
+
+
+def current_identity():
+    """Identity (email) of the authenticated user"""
+    return load_auth_context().identity
+
+
+def current_claims():
+    """Decoded claims of the request's access token"""
+    return load_auth_context().claims
+
+
+def current_principal():
+    """
+    The authenticated user as seen by the token: id, email, role and
+    organization_id, without touching the database. Use current_user() when
+    the handler needs other columns or modifies the user.
+    """
+    return load_auth_context()
+
+
+def current_user(full=False):
+    """
+    The authenticated User, or None if the account no longer exists. Loaded once
+    per request with only the columns authorization checks and display names
+    need. Pass full=True when the handler also reads other columns (such as the
+    password hash), to load them in one query instead of one lazy load each.
+    """
+    from models import User
+
+    context = load_auth_context()
+    if context.user is _NOT_LOADED:
+        context.user = None
+        if context.user_id is not None:
+            context.user = db.session.get(
+                User, context.user_id,
+                options=[load_only(
+                    User.id, User.email, User.role, User.organization_id, User.first_name, User.last_name
+                )]
+            )
+
+    user = context.user
+    if full and user is not None:
+        unloaded = inspect(user).unloaded
+        missing = [column.key for column in User.__mapper__.column_attrs if column.key in unloaded]
+        if missing:
+            db.session.refresh(user, attribute_names=missing)
+    return user
+
+
+def auth_required(f):
+    """Require a valid access token, verifying it once per request"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        load_auth_context()
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,212 @@
+"""
+Organization deletion cascade.
+
+Deleting an organization soft-deletes it, cancels its pending invitations and
+detaches its members (see Organization.detach_members), all with set-based
+statements. Organizations with up to ORG_CASCADE_SYNC_LIMIT members (default
+1000) are handled in the request's transaction. Larger ones detach their members
+in a background thread, ORG_CASCADE_BATCH_SIZE (default 500) per transaction,
+recording progress in a BackgroundJob row that clients can poll.
+
+A job is run by whichever thread claims it: a conditional UPDATE takes it only
+if no other thread has renewed its heartbeat within ORG_CASCADE_JOB_LEASE_SECONDS
+(default 300), and the owner renews it with every batch. Every batch commits
+and picks the next members by organization, so a job cut short by a restart can
+simply run again: the scheduler leader resumes jobs whose lease has expired
+when it takes over (see resume_jobs).
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+from extensions import db
+
+ORGANIZATION_DELETE_JOB = "organization_delete"
+
+# Statuses a job can be (re)claimed from
+UNFINISHED_STATUSES = ("pending", "running")
+
+
+def _sync_limit():
+    return int(os.environ.get("ORG_CASCADE_SYNC_LIMIT", 1000))
+
+
+def _batch_size():
+    return int(os.environ.get("ORG_CASCADE_BATCH_SIZE", 500))
+
+
+def _lease():
+    return timedelta(seconds=int(os.environ.get("ORG_CASCADE_JOB_LEASE_SECONDS", 300)))
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _lease_expired(now):
+    """Condition: nobody has renewed the job's heartbeat within the lease"""
+    from models import BackgroundJob
+
+    return or_(BackgroundJob.heartbeat_at.is_(None), BackgroundJob.heartbeat_at < now - _lease())
+
+
+def delete_organization(organization, remove_members=True, requested_by=None):
+    """
+    Soft-delete the organization and cascade (caller commits, then calls
+    start_job with the returned job if there is one). The requesting user is
+    always detached right away so they can be issued a fresh token.
+    Returns (affected_users, cancelled_invitations, job or None).
+    """
+    from models import BackgroundJob, Organization, OrganizationInvitation, User
+
+    organization.soft_delete()
+    if not remove_members:
+        return 0, 0, None
+
+    cancelled_invitations = OrganizationInvitation.cancel_pending(organization.id)
+    member_count = db.session.execute(
+        db.select(db.func.count(User.id)).where(User.organization_id == organization.id)
+    ).scalar_one()
+
+    if member_count <= _sync_limit():
+        affected_users = len(Organization.detach_members(organization.id))
+        return affected_users, cancelled_invitations, None
+
+    detached = []
+    if requested_by is not None:
+        detached = Organization.detach_members(organization.id, user_ids=[requested_by])
+    job = BackgroundJob(
+        kind=ORGANIZATION_DELETE_JOB,
+        target_id=organization.id,
+        requested_by=requested_by,
+        total=member_count,
+        processed=len(detached)
+    )
+    db.session.add(job)
+    db.session.flush()
+    return member_count, cancelled_invitations, job
+
+
+def start_job(job):
+    """Run a committed organization_delete job in a background thread"""
+    _start(current_app._get_current_object(), job.id)
+
+
+def resume_jobs(app):
+    """
+    Restart organization_delete jobs left unfinished by a stopped process, i.e.
+    pending or running with an expired lease. Returns the ids of the resumed jobs.
+    """
+    from models import BackgroundJob
+
+    with app.app_context():
+        try:
+            job_ids = db.session.execute(
+                db.select(BackgroundJob.id).where(
+                    BackgroundJob.kind == ORGANIZATION_DELETE_JOB,
+                    BackgroundJob.status.in_(UNFINISHED_STATUSES),
+                    _lease_expired(_utcnow())
+                ).order_by(BackgroundJob.id)
+            ).scalars().all()
+        finally:
+            db.session.remove()
+
+    for job_id in job_ids:
+        print(f"[Cascade] Resuming job {job_id}")
+        _start(app, job_id)
+    return job_ids
+
+
+def _start(app, job_id):
+    threading.Thread(
+        target=_detach_members_in_batches,
+        args=(app, job_id),
+        name=f"org-cascade-{job_id}",
+        daemon=True
+    ).start()
+
+
+def _claim(job_id):
+    """
+    Take the job if it is unfinished and its lease has expired. Returns the
+    heartbeat written, or None if another thread holds the job (or it is done).
+    """
+    from models import BackgroundJob
+
+    now = _utcnow()
+    claimed = db.session.execute(
+        update(BackgroundJob).where(
+            BackgroundJob.id == job_id,
+            BackgroundJob.status.in_(UNFINISHED_STATUSES),
+            _lease_expired(now)
+        ).values(status="running", heartbeat_at=now),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    db.session.commit()
+    return now if claimed else None
+
+
+def _update_owned(job_id, heartbeat, **values):
+    """
+    Write the job's progress if this thread still holds it (its last heartbeat
+    is unchanged); caller commits. Returns the new heartbeat, or None if the job
+    was taken over.
+    """
+    from models import BackgroundJob
+
+    now = _utcnow()
+    updated = db.session.execute(
+        update(BackgroundJob).where(
+            BackgroundJob.id == job_id,
+            BackgroundJob.heartbeat_at == heartbeat
+        ).values(heartbeat_at=now, **values),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    return now if updated else None
+
+
+def _detach_members_in_batches(app, job_id):
+    from models import BackgroundJob, Organization
+    from scheduler import _job_context
+
+    with _job_context(app):
+        heartbeat = None
+        try:
+            heartbeat = _claim(job_id)
+            if heartbeat is None:
+                print(f"[Cascade] Job {job_id} is held by another worker or finished; not running it")
+                return
+            job = db.session.get(BackgroundJob, job_id)
+            processed, total = job.processed, job.total
+
+            while True:
+                detached = Organization.detach_members(job.target_id, limit=_batch_size())
+                if not detached:
+                    break
+                processed = min(processed + len(detached), total)
+                heartbeat = _update_owned(job_id, heartbeat, processed=processed)
+                if heartbeat is None:
+                    # Our lease ran out and another thread took over; leave the batch to it
+                    db.session.rollback()
+                    print(f"[Cascade] Job {job_id} was taken over by another worker; stopping")
+                    return
+                db.session.commit()
+
+            if _update_owned(job_id, heartbeat, processed=total, status="completed", finished_at=_utcnow()) is None:
+                db.session.rollback()
+                print(f"[Cascade] Job {job_id} was taken over by another worker; stopping")
+                return
+            db.session.commit()
+            print(f"[Cascade] Organization {job.target_id}: detached members, job {job_id} completed")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[Cascade] Job {job_id} failed: {str(e)}")
+            if heartbeat is not None:
+                _update_owned(job_id, heartbeat, status="failed", error=str(e), finished_at=_utcnow())
+                db.session.commit()
+        finally:
+            db.session.remove()
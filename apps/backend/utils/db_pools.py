@@ -0,0 +1,158 @@
+"""
+Database connection pools.
+
+Web requests use the default engine. Background jobs (the reminder scheduler,
+leader election and the APScheduler job store) use a separately sized engine
+under the "jobs" bind, with its own statement timeout, so a long reminder run
+cannot starve API requests of connections.
+
+Both pools record how long each checkout waited for a connection.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+JOBS_BIND = "jobs"
+
+# Upper bounds (milliseconds) of the checkout-wait histogram buckets; the last bucket is +Inf
+WAIT_BUCKETS_MS = (1, 5, 25, 100, 500, 2000, 10000)
+
+
+class PoolWaitStats:
+    """Thread-safe checkout-wait histogram for one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bucket_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.timeouts = 0
+
+    def observe(self, wait_ms, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            for index, bound in enumerate(WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    break
+            else:
+                index = len(WAIT_BUCKETS_MS)
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum_ms += wait_ms
+            self.max_ms = max(self.max_ms, wait_ms)
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(list(WAIT_BUCKETS_MS) + ["+Inf"], self.bucket_counts):
+                cumulative += count
+                buckets.append({"le": bound, "count": cumulative})
+            return {
+                "buckets": buckets,
+                "count": self.count,
+                "sum_ms": round(self.sum_ms, 3),
+                "max_ms": round(self.max_ms, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+# Pool name -> (stats, live pool instances)
+_pools = {}
+
+
+def timed_pool_class(name):
+    """A QueuePool subclass that records checkout waits under the given name"""
+    stats = PoolWaitStats()
+    instances = []
+    _pools[name] = (stats, instances)
+
+    class TimedQueuePool(QueuePool):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            instances.append(self)
+
+        def recreate(self):
+            pool = super().recreate()
+            instances.remove(self)
+            return pool
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                stats.observe(0, timed_out=True)
+                raise
+            stats.observe((time.perf_counter() - started) * 1000)
+            return connection
+
+    TimedQueuePool.__name__ = f"TimedQueuePool_{name}"
+    return TimedQueuePool
+
+
+def _set_statement_timeout(pool_class, timeout_ms):
+    """Apply a session statement_timeout to every new PostgreSQL connection of the pool"""
+
+    @event.listens_for(pool_class, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        cursor.close()
+        dbapi_connection.commit()
+
+
+def jobs_engine_options(database_uri, engine_options):
+    """
+    SQLALCHEMY_BINDS entry for the background-job engine: same database as the
+    web engine, with its own small pool and statement timeout.
+    """
+    pool_class = timed_pool_class(JOBS_BIND)
+    options = dict(engine_options)
+    options.update({
+        "url": database_uri,
+        "poolclass": pool_class,
+        "pool_size": int(os.environ.get("JOBS_DB_POOL_SIZE", 3)),
+        "max_overflow": int(os.environ.get("JOBS_DB_MAX_OVERFLOW", 2)),
+        "pool_timeout": int(os.environ.get("JOBS_DB_POOL_TIMEOUT", 30)),
+    })
+
+    if not str(database_uri).startswith("sqlite"):
+        _set_statement_timeout(pool_class, int(os.environ.get("JOBS_DB_STATEMENT_TIMEOUT_MS", 60000)))
+    return options
+
+
+def snapshot():
+    """Checkout-wait histograms and current usage of every timed pool"""
+    data = {}
+    for name, (stats, instances) in _pools.items():
+        pool = instances[-1] if instances else None
+        data[name] = {
+            "checkout_wait_ms": stats.snapshot(),
+            "size": pool.size() if pool else None,
+            "checked_out": pool.checkedout() if pool else None,
+            "overflow": pool.overflow() if pool else None,
+        }
+    return data
+
+
+def to_prometheus():
+    """Render the pool metrics in the Prometheus text format"""
+    lines = ["# TYPE db_pool_checkout_wait_ms histogram"]
+    for name, pool in snapshot().items():
+        wait = pool["checkout_wait_ms"]
+        for bucket in wait["buckets"]:
+            lines.append(f'db_pool_checkout_wait_ms_bucket{{pool="{name}",le="{bucket["le"]}"}} {bucket["count"]}')
+        lines.append(f'db_pool_checkout_wait_ms_sum{{pool="{name}"}} {wait["sum_ms"]}')
+        lines.append(f'db_pool_checkout_wait_ms_count{{pool="{name}"}} {wait["count"]}')
+        lines.append(f'db_pool_checkout_timeouts_total{{pool="{name}"}} {wait["timeouts"]}')
+        if pool["checked_out"] is not None:
+            lines.append(f'db_pool_checked_out{{pool="{name}"}} {pool["checked_out"]}')
+    return "\n".join(lines) + "\n"
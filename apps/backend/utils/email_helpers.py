@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 from flask_mail import Message
 from extensions import mail
 
@@ -262,7 +263,35 @@ def send_event_invitation_email(event_invitation, event, organizer):
         raise e
 
 
-def send_event_reminder_email(event_invitation, event, hours_before):
+def _offset_text(minutes):
+    """Human wording for a number of minutes ahead, e.g. tomorrow or in 2 hours"""
+    if 20 * 60 <= minutes < 36 * 60:
+        return "tomorrow"
+    if minutes >= 36 * 60:
+        return f"in {round(minutes / (24 * 60))} days"
+    if minutes >= 3 * 60:
+        return f"in {round(minutes / 60)} hours"
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"in {hours} hour{'s' if hours > 1 else ''} {minutes} minutes"
+    if hours:
+        return f"in {hours} hour{'s' if hours > 1 else ''}"
+    return f"in {minutes} minutes"
+
+
+def _reminder_time_text(event, minutes_before):
+    """
+    How far away the event is as the reminder goes out. Taken from the event's
+    start, not the reminder's offset: a late run, or a reminder sent early in
+    another event's digest, must not announce the wrong time.
+    """
+    if event.starts_at is None:
+        return _offset_text(minutes_before)
+    remaining = event.starts_at - datetime.now(timezone.utc).replace(tzinfo=None)
+    return _offset_text(max(0, round(remaining.total_seconds() / 60)))
+
+
+def send_event_reminder_email(event_invitation, event, minutes_before):
     """Send event reminder email to guests who accepted"""
     try:
         if event_invitation.status != 'accepted':
@@ -270,15 +299,13 @@ def send_event_reminder_email(event_invitation, event, hours_before):
             
         guest_name = event_invitation.guest_name or "Guest"
         
-        if hours_before == 24:
-            subject = f"Reminder: {event.title} is tomorrow"
-            time_text = "tomorrow"
-        elif hours_before == 1:
-            subject = f"Final Reminder: {event.title} is in 1 hour"
-            time_text = "in 1 hour"
+        time_text = _reminder_time_text(event, minutes_before)
+        if minutes_before == 24 * 60:
+            subject = f"Reminder: {event.title} is {time_text}"
+        elif minutes_before == 60:
+            subject = f"Final Reminder: {event.title} is {time_text}"
         else:
             subject = f"Reminder: {event.title}"
-            time_text = f"in {hours_before} hours"
         
         msg = Message(
             subject,
@@ -316,4 +343,96 @@ def send_event_reminder_email(event_invitation, event, hours_before):
         
     except Exception as e:
         print(f"Failed to send event reminder email: {str(e)}")
-        raise e
\ No newline at end of file
+        raise e
+
+def send_event_reminder_digest_email(event_invitation, reminders):
+    """
+    Send one email covering several event reminders for the same guest.
+    reminders is a list of (event, minutes_before); event_invitation is any of the
+    guest's invitations and only supplies the name and address.
+    """
+    try:
+        guest_name = event_invitation.guest_name or "Guest"
+        reminders = sorted(reminders, key=lambda reminder: (reminder[0].date, reminder[0].time))
+
+        msg = Message(
+            f"Reminder: you have {len(reminders)} upcoming events",
+            sender=os.environ.get("VERIFIED_EMAIL"),
+            recipients=[event_invitation.guest_email],
+        )
+
+        event_blocks = "".join(f"""
+            <div style="background: #e8f4fd; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #007bff;">
+                <h3 style="margin: 0 0 10px 0; color: #333;">{event.title} <span style="font-weight: normal; font-size: 14px;">({_reminder_time_text(event, minutes_before)})</span></h3>
+                <p style="margin: 5px 0; color: #004085;"><strong>📅 When:</strong> {event.date.strftime('%B %d, %Y')} at {event.time.strftime('%I:%M %p')}</p>
+                <p style="margin: 5px 0; color: #004085;"><strong>📍 Where:</strong> {event.location}</p>
+            </div>
+        """ for event, minutes_before in reminders)
+
+        msg.html = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #333; text-align: center;">⏰ Event Reminders</h2>
+            <p style="color: #666; font-size: 16px;">Hello {guest_name},</p>
+            <p style="color: #666; font-size: 16px;">
+                This is a reminder of the events you are attending soon.
+            </p>
+            {event_blocks}
+            <p style="color: #666; font-size: 14px;">
+                We look forward to seeing you there!
+            </p>
+            <hr style="border: 1px solid #eee; margin: 20px 0;">
+            <p style="color: #999; font-size: 12px; text-align: center;">
+                This email was sent by Event Planner. You're receiving this because you accepted invitations to these events.
+            </p>
+        </div>
+        """
+
+        mail.send(msg)
+
+    except Exception as e:
+        print(f"Failed to send event reminder digest email: {str(e)}")
+        raise e
+
+def send_waitlist_promotion_email(event_invitation, event):
+    """Let a waitlisted guest know a spot opened up and they are now attending"""
+    try:
+        guest_name = event_invitation.guest_name or "Guest"
+
+        msg = Message(
+            f"You're in: {event.title}",
+            sender=os.environ.get("VERIFIED_EMAIL"),
+            recipients=[event_invitation.guest_email],
+        )
+
+        event_datetime = f"{event.date.strftime('%B %d, %Y')} at {event.time.strftime('%I:%M %p')}"
+
+        msg.html = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #333; text-align: center;">🎟️ A Spot Opened Up!</h2>
+            <p style="color: #666; font-size: 16px;">Hello {guest_name},</p>
+            <p style="color: #666; font-size: 16px;">
+                Good news! A spot opened up for <strong>{event.title}</strong> and you have been moved off the waitlist.
+                You are now confirmed as attending.
+            </p>
+
+            <div style="background: #e8f4fd; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #28a745;">
+                <h3 style="margin: 0 0 10px 0; color: #333;">{event.title}</h3>
+                <p style="margin: 5px 0; color: #004085;"><strong>📅 When:</strong> {event_datetime}</p>
+                <p style="margin: 5px 0; color: #004085;"><strong>📍 Where:</strong> {event.location}</p>
+            </div>
+
+            <p style="color: #666; font-size: 14px;">
+                If you can no longer attend, please decline using the link in your original invitation so the spot can go to someone else.
+            </p>
+            <hr style="border: 1px solid #eee; margin: 20px 0;">
+            <p style="color: #999; font-size: 12px; text-align: center;">
+                This email was sent by Event Planner. You're receiving this because you joined the waitlist for this event.
+            </p>
+        </div>
+        """
+
+        mail.send(msg)
+
+    except Exception as e:
+        print(f"Failed to send waitlist promotion email: {str(e)}")
+        raise e
@@ -0,0 +1,170 @@
+"""
+Leader election so scheduled jobs run in exactly one process.
+
+Every worker campaigns periodically; only the holder of the lock runs jobs.
+- PostgreSQL: a session-level advisory lock held on a dedicated connection.
+  Requires a session-mode connection (e.g. Supabase port 5432, not the
+  transaction pooler on 6543), since the lock lives as long as the session.
+- SQLite: an exclusive file lock next to the database file.
+
+Both locks are released by the operating system / database when the holding
+process dies, so a follower takes over on its next campaign.
+"""
+import os
+import zlib
+
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:  # Windows - no file locking, single process development only
+    fcntl = None
+
+
+class _AdvisoryLock:
+    """PostgreSQL session advisory lock kept on its own connection"""
+
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.key = zlib.crc32(name.encode())
+        self.connection = None
+
+    def acquire(self):
+        if self.connection is None:
+            self.connection = self.engine.connect()
+        acquired = self.connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+        ).scalar()
+        self.connection.commit()
+        if not acquired:
+            self._close()
+        return bool(acquired)
+
+    def check(self):
+        """Heartbeat - the lock is held for as long as the session is alive"""
+        try:
+            self.connection.execute(text("SELECT 1"))
+            self.connection.commit()
+            return True
+        except Exception:
+            self._close()
+            return False
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self.connection.commit()
+        finally:
+            self._close()
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+class _FileLock:
+    """Exclusive, non-blocking flock on a lock file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
+
+    def check(self):
+        return self.fd is not None
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+
+class _NoLock:
+    """Fallback when the platform offers no usable lock - every process leads"""
+
+    def acquire(self):
+        return True
+
+    def check(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class LeaderElection:
+    """
+    Lease-style leader election. Call campaign() on a fixed interval:
+    followers try to take the lock, the leader verifies it still holds it.
+    """
+
+    def __init__(self, app, name="event_scheduler"):
+        self.name = name
+        self.is_leader = False
+        self._lock = self._build_lock(app)
+
+    def _build_lock(self, app):
+        from extensions import db
+        from utils.db_pools import JOBS_BIND
+
+        # The lock holds a connection for as long as this process leads, so take it
+        # from the background-job pool rather than the web pool
+        with app.app_context():
+            engine = db.engines.get(JOBS_BIND, db.engine)
+
+        if engine.dialect.name == "postgresql":
+            return _AdvisoryLock(engine, self.name)
+
+        if engine.dialect.name == "sqlite" and fcntl is not None:
+            database = engine.url.database
+            lock_dir = os.path.dirname(os.path.abspath(database)) if database else app.instance_path
+            os.makedirs(lock_dir, exist_ok=True)
+            return _FileLock(os.path.join(lock_dir, f"{self.name}.lock"))
+
+        print(f"[Leader] No lock available for {engine.dialect.name}; this process will run scheduled jobs")
+        return _NoLock()
+
+    def campaign(self):
+        """Acquire or renew leadership. Returns True while this process is leader."""
+        try:
+            if self.is_leader:
+                if not self._lock.check():
+                    self.is_leader = False
+                    print(f"[Leader] Process {os.getpid()} lost leadership")
+            elif self._lock.acquire():
+                self.is_leader = True
+                print(f"[Leader] Process {os.getpid()} became scheduler leader")
+        except Exception as e:
+            self.is_leader = False
+            print(f"[Leader] Election failed: {e}")
+        return self.is_leader
+
+    def resign(self):
+        """Give up leadership so another process can take over immediately"""
+        if self.is_leader:
+            try:
+                self._lock.release()
+            except Exception as e:
+                print(f"[Leader] Failed to release lock: {e}")
+            self.is_leader = False
@@ -0,0 +1,217 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is deliberately slow, so hashing and verification run on a small process
+pool instead of the worker handling the request. The pool accepts at most
+PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE jobs at a time; beyond that
+callers get PasswordHashingBusy, which the app turns into a 503, rather than
+piling up behind a login storm. So do callers whose job does not finish within
+PASSWORD_HASH_TIMEOUT_SECONDS; the job keeps its place in the bound until it
+has actually finished or been cancelled.
+
+Bulk hashing (hash_passwords, for user imports) feeds the same pool one chunk
+per worker at a time, so logins during an import wait for a chunk, not the batch.
+
+The work factor comes from BCRYPT_LOG_ROUNDS. Hashes made with another cost are
+re-hashed the next time their owner logs in (see needs_rehash).
+"""
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from flask import current_app, has_app_context, jsonify
+
+DEFAULT_LOG_ROUNDS = 12
+
+
+class PasswordHashingBusy(Exception):
+    """The hashing pool is saturated; the request should be retried shortly"""
+
+
+def _hash_worker(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _hash_chunk_worker(passwords, rounds):
+    return [_hash_worker(password, rounds) for password in passwords]
+
+
+def _verify_worker(password, password_hash):
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+class HashingPool:
+    """Process pool with a bounded number of queued and running jobs"""
+
+    def __init__(self, workers, queue_size, wait_seconds, timeout_seconds):
+        self.workers = workers
+        self.wait_seconds = wait_seconds
+        self.timeout_seconds = timeout_seconds
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Workers only ever run bcrypt, so forking from a threaded process is safe
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def run(self, fn, *args):
+        if self.wait_seconds > 0:
+            acquired = self._slots.acquire(timeout=self.wait_seconds)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashingBusy()
+
+        if self.workers == 0:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_executor(executor)
+            raise
+        # The slot is freed when the job is really done, not when the caller stops
+        # waiting, so abandoned jobs still count against workers + queue size
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FuturesTimeoutError:
+            # Drop the job if it has not started; a running one holds its slot until it ends
+            future.cancel()
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashingBusy()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool for the next caller
+            self._reset_executor(executor)
+            raise
+
+    def run_chunked(self, fn, items, chunk_size, *args):
+        """
+        fn(chunk, *args) over items in chunks, results concatenated in order.
+        At most one chunk per worker is in flight, so jobs submitted through
+        run() meanwhile wait for one chunk at most, not for the whole batch.
+        Bulk work bypasses the slot limit: it is admin-initiated and self-limiting.
+        """
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        if self.workers == 0:
+            return [result for chunk in chunks for result in fn(chunk, *args)]
+
+        executor = self._get_executor()
+        results = [None] * len(chunks)
+        pending = {}
+        try:
+            for index, chunk in enumerate(chunks):
+                if len(pending) >= self.workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                pending[executor.submit(fn, chunk, *args)] = index
+            for future in as_completed(pending):
+                results[pending[future]] = future.result()
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+        return [result for chunk_results in results for result in chunk_results]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Log rounds -> hash of a random password, for timing-safe misses
+_dummy_hashes = {}
+
+
+def get_pool():
+    """The process-wide hashing pool, created from the environment on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.environ.get("PASSWORD_HASH_WORKERS", min(os.cpu_count() or 1, 4)))
+            _pool = HashingPool(
+                workers=workers,
+                queue_size=int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", workers * 8)),
+                wait_seconds=float(os.environ.get("PASSWORD_HASH_QUEUE_WAIT_SECONDS", 0)),
+                timeout_seconds=float(os.environ.get("PASSWORD_HASH_TIMEOUT_SECONDS", 10)),
+            )
+        return _pool
+
+
+def log_rounds():
+    """Configured bcrypt work factor"""
+    if has_app_context():
+        return int(current_app.config.get("BCRYPT_LOG_ROUNDS", DEFAULT_LOG_ROUNDS))
+    return int(os.environ.get("BCRYPT_LOG_ROUNDS", DEFAULT_LOG_ROUNDS))
+
+
+def hash_password(password):
+    """bcrypt hash of the password at the configured cost"""
+    return get_pool().run(_hash_worker, password, log_rounds())
+
+
+def hash_passwords(passwords, rounds=None):
+    """
+    bcrypt hashes of many passwords, in order, spread over the pool in chunks of
+    PASSWORD_HASH_CHUNK_SIZE (default 50). For bulk provisioning.
+    """
+    return get_pool().run_chunked(
+        _hash_chunk_worker,
+        list(passwords),
+        int(os.environ.get("PASSWORD_HASH_CHUNK_SIZE", 50)),
+        rounds or log_rounds()
+    )
+
+
+def verify_password(password_hash, password):
+    """Whether the password matches the stored bcrypt hash"""
+    return get_pool().run(_verify_worker, password, password_hash)
+
+
+def needs_rehash(password_hash):
+    """Whether the hash was made with a different cost than the configured one"""
+    try:
+        return int(password_hash.split("$")[2]) != log_rounds()
+    except (IndexError, ValueError):
+        return True
+
+
+def dummy_verify(password):
+    """
+    Spend as long as a real verification, for logins with an unknown email, so
+    response times do not reveal which accounts exist.
+    """
+    rounds = log_rounds()
+    dummy_hash = _dummy_hashes.get(rounds)
+    if dummy_hash is None:
+        dummy_hash = _dummy_hashes[rounds] = get_pool().run(_hash_worker, os.urandom(16).hex(), rounds)
+    verify_password(dummy_hash, password)
+    return False
+
+
+def busy_response():
+    """503 returned while the hashing pool is saturated"""
+    return jsonify({
+        "error": "The server is busy. Please try again in a moment.",
+        "retry_after_seconds": 1
+    }), 503, {"Retry-After": "1"}
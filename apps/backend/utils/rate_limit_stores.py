@@ -0,0 +1,429 @@
+"""
+Storage backends for the rate limiter.
+
+Every store keeps sliding-window-counter state: a request count per key and
+fixed window. The limiter only needs the counts of the current and previous
+windows, and hit(), which checks and records a request as one atomic step so
+concurrent requests cannot both slip under the limit.
+
+- MemoryStore: striped LRU maps in this process. Each worker enforces its own limit.
+- SQLiteStore: a WAL-mode SQLite file shared by every worker on one host.
+- DatabaseStore: the rate_limit_counter table in the application database,
+  shared by every replica.
+
+Choose one with RATE_LIMIT_STORAGE=memory|sqlite|database (default memory).
+
+Keys whose windows have both ended are swept periodically, and the memory store
+holds at most RATE_LIMIT_MAX_KEYS keys, evicting the least recently used.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class _WindowCounter:
+    """Fixed-size state for one key in the memory store"""
+    __slots__ = ("window_start", "window_seconds", "previous", "current")
+
+    def __init__(self, window_start, window_seconds):
+        self.window_start = window_start
+        self.window_seconds = window_seconds
+        self.previous = 0
+        self.current = 0
+
+    def expires_at(self):
+        """Once the current window is also over, the key counts nothing"""
+        return self.window_start + 2 * self.window_seconds
+
+
+class RateLimitStore:
+    """Interface every rate-limit backend implements"""
+
+    backend = None
+    # Only a capped store evicts live keys
+    evictions = 0
+
+    def __init__(self):
+        self.swept = 0
+        self.last_sweep_at = None
+
+    def get_counts(self, key, window_start, window_seconds):
+        """Return (previous window count, current window count)"""
+        raise NotImplementedError
+
+    def increment(self, key, window_start, window_seconds):
+        """Atomically add one request to the key's current window"""
+        raise NotImplementedError
+
+    def hit(self, key, window_start, window_seconds, allow):
+        """
+        Atomically check and record one request. allow(previous, current) decides
+        from the counts before this request; the request is counted only if it
+        returns True. Returns (allowed, previous, current) with the counts as
+        they stand afterwards.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Forget every counter"""
+        raise NotImplementedError
+
+    def size(self):
+        """Number of tracked keys (or window rows for the SQL stores)"""
+        raise NotImplementedError
+
+    def _delete_expired(self, now):
+        raise NotImplementedError
+
+    def sweep(self, now=None):
+        """Delete every key whose windows have all ended. Returns how many were removed."""
+        now = time.time() if now is None else now
+        removed = self._delete_expired(now)
+        self.swept += removed
+        self.last_sweep_at = now
+        return removed
+
+    def stats(self):
+        """Size and eviction metrics"""
+        return {
+            "backend": self.backend,
+            "size": self.size(),
+            "max_keys": getattr(self, "max_keys", None),
+            "evictions": self.evictions,
+            "swept": self.swept,
+            "last_sweep_at": self.last_sweep_at,
+        }
+
+
+class _Stripe:
+    """One lock and the LRU map of the keys that hash to it"""
+    __slots__ = ("lock", "counters", "evictions")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = OrderedDict()
+        self.evictions = 0
+
+
+class MemoryStore(RateLimitStore):
+    """
+    Per-process LRU maps of fixed-size counters, capped at max_keys in total.
+    Keys are spread over independently locked stripes, so requests for
+    different keys rarely wait on each other; each stripe evicts its own least
+    recently used key when it is full.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_keys=100_000, stripes=16):
+        super().__init__()
+        self.max_keys = max_keys
+        self._stripe_max_keys = max(1, -(-max_keys // stripes))
+        self._stripes = [_Stripe() for _ in range(stripes)]
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def _counter(self, stripe, key, window_start, window_seconds):
+        # Caller holds stripe.lock
+        counters = stripe.counters
+        counter = counters.get(key)
+        if counter is None:
+            if len(counters) >= self._stripe_max_keys:
+                counters.popitem(last=False)
+                stripe.evictions += 1
+            counter = counters[key] = _WindowCounter(window_start, window_seconds)
+            return counter
+
+        counters.move_to_end(key)
+        if counter.window_start != window_start:
+            # The old current window becomes the previous one only if it is directly adjacent
+            adjacent = counter.window_start == window_start - window_seconds
+            counter.previous = counter.current if adjacent else 0
+            counter.current = 0
+            counter.window_start = window_start
+        return counter
+
+    def get_counts(self, key, window_start, window_seconds):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            counter = self._counter(stripe, key, window_start, window_seconds)
+            return counter.previous, counter.current
+
+    def increment(self, key, window_start, window_seconds):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            self._counter(stripe, key, window_start, window_seconds).current += 1
+
+    def hit(self, key, window_start, window_seconds, allow):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            counter = self._counter(stripe, key, window_start, window_seconds)
+            allowed = allow(counter.previous, counter.current)
+            if allowed:
+                counter.current += 1
+            return allowed, counter.previous, counter.current
+
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.counters.clear()
+
+    def size(self):
+        return sum(len(stripe.counters) for stripe in self._stripes)
+
+    @property
+    def evictions(self):
+        return sum(stripe.evictions for stripe in self._stripes)
+
+    def _delete_expired(self, now):
+        removed = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                expired = [key for key, counter in stripe.counters.items() if counter.expires_at() <= now]
+                for key in expired:
+                    del stripe.counters[key]
+            removed += len(expired)
+        return removed
+
+
+class SQLiteStore(RateLimitStore):
+    """
+    Counters in a local SQLite file, shared by every worker process on the host.
+    Increments are single UPSERT statements, so concurrent workers never lose a count.
+    """
+
+    backend = "sqlite"
+
+    # Switching a file to WAL needs an exclusive lock the busy timeout does not
+    # wait for, so it is done once per store, retried while other workers hold it
+    WAL_ATTEMPTS = 10
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._initialize()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _initialize(self):
+        """Switch the file to WAL (a persistent setting) and create the table"""
+        connection = self._connect()
+        try:
+            for attempt in range(self.WAL_ATTEMPTS):
+                try:
+                    if connection.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                        connection.execute("PRAGMA journal_mode=WAL")
+                    break
+                except sqlite3.OperationalError:
+                    if attempt == self.WAL_ATTEMPTS - 1:
+                        raise
+                    time.sleep(0.05 * (attempt + 1))
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(rate_limit_counter)")}
+            if columns and "expires_at" not in columns:
+                # Counters are disposable; rebuild files created before expiry tracking
+                connection.execute("DROP TABLE rate_limit_counter")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_counter ("
+                " key TEXT NOT NULL,"
+                " window_start INTEGER NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " expires_at INTEGER NOT NULL,"
+                " PRIMARY KEY (key, window_start)"
+                ") WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_limit_counter_expires_at ON rate_limit_counter (expires_at)"
+            )
+        finally:
+            connection.close()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def get_counts(self, key, window_start, window_seconds):
+        rows = dict(self._connection().execute(
+            "SELECT window_start, count FROM rate_limit_counter WHERE key = ? AND window_start IN (?, ?)",
+            (key, window_start - window_seconds, window_start)
+        ).fetchall())
+        return rows.get(window_start - window_seconds, 0), rows.get(window_start, 0)
+
+    def increment(self, key, window_start, window_seconds):
+        self.hit(key, window_start, window_seconds, lambda previous, current: True)
+
+    def hit(self, key, window_start, window_seconds, allow):
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so the read below and the
+        # increment are one step for every process sharing the file
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            previous, current = self.get_counts(key, window_start, window_seconds)
+            allowed = allow(previous, current)
+            if allowed:
+                connection.execute(
+                    "INSERT INTO rate_limit_counter (key, window_start, count, expires_at) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (key, window_start) DO UPDATE SET count = count + 1",
+                    (key, window_start, window_start + 2 * window_seconds)
+                )
+                current += 1
+                # Windows before the previous one no longer count
+                connection.execute(
+                    "DELETE FROM rate_limit_counter WHERE key = ? AND window_start < ?",
+                    (key, window_start - window_seconds)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return allowed, previous, current
+
+    def clear(self):
+        self._connection().execute("DELETE FROM rate_limit_counter")
+
+    def size(self):
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limit_counter").fetchone()[0]
+
+    def _delete_expired(self, now):
+        return self._connection().execute(
+            "DELETE FROM rate_limit_counter WHERE expires_at <= ?", (int(now),)
+        ).rowcount
+
+
+class DatabaseStore(RateLimitStore):
+    """
+    Counters in the rate_limit_counter table of the application database, shared
+    by every replica. Uses its own short transaction so a request that rolls back
+    still counts, and an INSERT ... ON CONFLICT DO UPDATE for atomic increments.
+    Needs an app context; the sweeper thread passes the app in.
+    """
+
+    backend = "database"
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.app = app
+
+    def _upsert(self, connection):
+        from models import RateLimitCounter
+
+        if connection.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        statement = insert(RateLimitCounter.__table__)
+        return statement.on_conflict_do_update(
+            index_elements=["key", "window_start"],
+            set_={"count": RateLimitCounter.__table__.c.count + 1}
+        )
+
+    def get_counts(self, key, window_start, window_seconds):
+        from models import RateLimitCounter
+        from extensions import db
+
+        table = RateLimitCounter.__table__
+        with db.engine.connect() as connection:
+            rows = dict(connection.execute(
+                table.select()
+                .with_only_columns(table.c.window_start, table.c.count)
+                .where(table.c.key == key, table.c.window_start.in_([window_start - window_seconds, window_start]))
+            ).fetchall())
+        return rows.get(window_start - window_seconds, 0), rows.get(window_start, 0)
+
+    def increment(self, key, window_start, window_seconds):
+        self.hit(key, window_start, window_seconds, lambda previous, current: True)
+
+    def hit(self, key, window_start, window_seconds, allow):
+        from models import RateLimitCounter
+        from extensions import db
+
+        table = RateLimitCounter.__table__
+        with db.engine.begin() as connection:
+            # Count the request first: the upsert locks the key's current-window row
+            # until commit, so concurrent hits on the key queue up behind it
+            connection.execute(self._upsert(connection), {
+                "key": key,
+                "window_start": window_start,
+                "count": 1,
+                "expires_at": window_start + 2 * window_seconds,
+            })
+            rows = dict(connection.execute(
+                table.select()
+                .with_only_columns(table.c.window_start, table.c.count)
+                .where(table.c.key == key, table.c.window_start.in_([window_start - window_seconds, window_start]))
+            ).fetchall())
+            previous, current = rows.get(window_start - window_seconds, 0), rows[window_start]
+
+            allowed = allow(previous, current - 1)
+            if allowed:
+                connection.execute(
+                    table.delete().where(table.c.key == key, table.c.window_start < window_start - window_seconds)
+                )
+            else:
+                # Take the request back out within the same transaction
+                connection.execute(
+                    table.update()
+                    .where(table.c.key == key, table.c.window_start == window_start)
+                    .values(count=table.c.count - 1)
+                )
+                current -= 1
+        return allowed, previous, current
+
+    def clear(self):
+        from models import RateLimitCounter
+        from extensions import db
+
+        with db.engine.begin() as connection:
+            connection.execute(RateLimitCounter.__table__.delete())
+
+    def size(self):
+        from models import RateLimitCounter
+        from extensions import db
+        from sqlalchemy import func, select
+
+        with db.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(RateLimitCounter.__table__)).scalar()
+
+    def _delete_expired(self, now):
+        from models import RateLimitCounter
+        from extensions import db
+
+        table = RateLimitCounter.__table__
+        with db.engine.begin() as connection:
+            return connection.execute(table.delete().where(table.c.expires_at <= int(now))).rowcount
+
+    def sweep(self, now=None):
+        if self.app is None:
+            return super().sweep(now)
+        with self.app.app_context():
+            return super().sweep(now)
+
+    def stats(self):
+        if self.app is None:
+            return super().stats()
+        with self.app.app_context():
+            return super().stats()
+
+
+def create_store(kind=None, app=None):
+    """Build the store named by kind or RATE_LIMIT_STORAGE"""
+    kind = (kind or os.environ.get("RATE_LIMIT_STORAGE", "memory")).lower()
+    if kind == "memory":
+        return MemoryStore(max_keys=int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100_000)))
+    if kind == "sqlite":
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        default_path = os.path.join(backend_dir, "instance", "rate_limits.db")
+        return SQLiteStore(os.environ.get("RATE_LIMIT_SQLITE_PATH", default_path))
+    if kind == "database":
+        return DatabaseStore(app)
+    raise ValueError(f"Unknown RATE_LIMIT_STORAGE '{kind}'. Use memory, sqlite or database")
@@ -1,15 +1,66 @@
 """
-Simple in-memory rate limiter for protecting email endpoints.
+Simple rate limiter for protecting email endpoints.
 Prevents abuse of Gmail quota from demo credentials.
+
+Uses a sliding-window counter: each key keeps the request counts of the current
+and previous fixed window, and the previous one is weighted by how much of it
+still overlaps the sliding window. State per key is a couple of numbers, whatever
+the traffic, and every check is O(1).
+
+Counters live in a pluggable store (utils/rate_limit_stores.py), so the limit can
+be shared by every worker on a host (sqlite) or every replica (database). The
+decorator checks and records each request in one atomic store operation, so
+concurrent requests from threaded or gevent workers cannot overshoot the limit.
+If the store fails, the decorator logs it and lets the request through.
 """
-from datetime import datetime, timedelta
+import math
+import os
+import threading
+import time
 from functools import wraps
 from flask import request, jsonify
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 
-# In-memory storage for rate limiting
-# Format: { "identifier": [timestamp1, timestamp2, ...] }
-_rate_limit_store = {}
+from utils.auth_context import load_auth_context
+from utils.rate_limit_stores import create_store
+
+# Counter storage, created from RATE_LIMIT_STORAGE on first use
+_store = None
+
+
+def get_store():
+    """The configured rate-limit store"""
+    global _store
+    if _store is None:
+        _store = create_store()
+    return _store
+
+
+def set_store(store):
+    """Replace the rate-limit store (e.g. with another backend)"""
+    global _store
+    _store = store
+
+
+def _sweep_forever(interval_seconds):
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            removed = get_store().sweep()
+            if removed:
+                print(f"[RateLimit] Swept {removed} expired keys")
+        except Exception as e:
+            print(f"[RateLimit] Sweep failed: {str(e)}")
+
+
+def init_rate_limiter(app):
+    """
+    Create the configured store for this app and start a daemon thread that
+    sweeps expired windows every RATE_LIMIT_SWEEP_SECONDS (default 60).
+    """
+    set_store(create_store(app=app))
+    interval = int(os.environ.get("RATE_LIMIT_SWEEP_SECONDS", 60))
+    if interval > 0:
+        threading.Thread(target=_sweep_forever, args=(interval,), name="rate-limit-sweeper", daemon=True).start()
 
 
 def _get_client_identifier():
@@ -18,10 +69,9 @@ def _get_client_identifier():
     Uses JWT email if authenticated, otherwise falls back to IP address.
     """
     try:
-        verify_jwt_in_request(optional=True)
-        identity = get_jwt_identity()
-        if identity:
-            return f"user:{identity}"
+        context = load_auth_context(optional=True)
+        if context and context.identity:
+            return f"user:{context.identity}"
     except:
         pass
 
@@ -29,18 +79,34 @@ def _get_client_identifier():
     return f"ip:{request.remote_addr}"
 
 
-def _clean_old_entries(identifier, window_seconds):
-    """Remove entries older than the time window"""
-    if identifier not in _rate_limit_store:
-        return
+def _key(identifier, window_seconds):
+    return f"{window_seconds}:{identifier}"
+
 
-    cutoff = datetime.now() - timedelta(seconds=window_seconds)
-    _rate_limit_store[identifier] = [
-        ts for ts in _rate_limit_store[identifier] if ts > cutoff
-    ]
+def _window_start(now, window_seconds):
+    # Wall-clock windows, so every process sharing a store agrees on them
+    return int(now // window_seconds) * window_seconds
 
 
-def check_rate_limit(identifier, max_requests, window_seconds):
+def _retry_after(previous, current, window_start, max_requests, window_seconds, now):
+    """
+    Exact seconds until the weighted count drops low enough for one more request:
+    solve previous * (1 - elapsed / window) + current <= max_requests - 1 for the
+    earliest time, moving to the next window when the current one alone is full.
+    """
+    allowance = max_requests - 1
+    if current <= allowance:
+        # Wait for enough of the previous window to slide out
+        fraction = 1 - (allowance - current) / previous
+        allowed_at = window_start + window_seconds * fraction
+    else:
+        # Wait for the next window, then for enough of this one to slide out
+        fraction = 1 - allowance / current
+        allowed_at = window_start + window_seconds * (1 + fraction)
+    return max(math.ceil(allowed_at - now), 1)
+
+
+def check_rate_limit(identifier, max_requests, window_seconds, store=None):
     """
     Check if the identifier has exceeded the rate limit.
 
@@ -48,31 +114,55 @@ def check_rate_limit(identifier, max_requests, window_seconds):
         identifier: Unique identifier for the client
         max_requests: Maximum number of requests allowed
         window_seconds: Time window in seconds
+        store: Counter storage (default: the configured store)
 
     Returns:
         tuple: (is_allowed, requests_remaining, retry_after_seconds)
     """
-    _clean_old_entries(identifier, window_seconds)
+    store = store or get_store()
+    now = time.time()
+    window_start = _window_start(now, window_seconds)
+    previous, current = store.get_counts(_key(identifier, window_seconds), window_start, window_seconds)
 
-    current_requests = _rate_limit_store.get(identifier, [])
+    overlap = 1 - (now - window_start) / window_seconds
+    weighted = previous * overlap + current
 
-    if len(current_requests) >= max_requests:
-        # Calculate retry after
-        oldest_request = min(current_requests)
-        retry_after = (oldest_request + timedelta(seconds=window_seconds) - datetime.now()).seconds
-        return False, 0, retry_after
+    if weighted > max_requests - 1:
+        return False, 0, _retry_after(previous, current, window_start, max_requests, window_seconds, now)
 
-    return True, max_requests - len(current_requests), 0
+    return True, max_requests - math.ceil(weighted), 0
 
 
-def record_request(identifier):
+def hit_rate_limit(identifier, max_requests, window_seconds, store=None):
+    """
+    Check the rate limit and, if allowed, record the request, as one atomic step.
+
+    Returns:
+        tuple: (is_allowed, requests_remaining, retry_after_seconds)
+    """
+    store = store or get_store()
+    now = time.time()
+    window_start = _window_start(now, window_seconds)
+    overlap = 1 - (now - window_start) / window_seconds
+
+    def allow(previous, current):
+        return previous * overlap + current <= max_requests - 1
+
+    allowed, previous, current = store.hit(_key(identifier, window_seconds), window_start, window_seconds, allow)
+    if not allowed:
+        return False, 0, _retry_after(previous, current, window_start, max_requests, window_seconds, now)
+
+    return True, max(max_requests - math.ceil(previous * overlap + current), 0), 0
+
+
+def record_request(identifier, window_seconds, store=None):
     """Record a request for the given identifier"""
-    if identifier not in _rate_limit_store:
-        _rate_limit_store[identifier] = []
-    _rate_limit_store[identifier].append(datetime.now())
+    store = store or get_store()
+    window_start = _window_start(time.time(), window_seconds)
+    store.increment(_key(identifier, window_seconds), window_start, window_seconds)
 
 
-def rate_limit(max_requests=5, window_seconds=3600, key_func=None):
+def rate_limit(max_requests=5, window_seconds=3600, key_func=None, store=None):
     """
     Decorator to apply rate limiting to a Flask route.
 
@@ -80,6 +170,7 @@ def rate_limit(max_requests=5, window_seconds=3600, key_func=None):
         max_requests: Maximum number of requests allowed (default: 5)
         window_seconds: Time window in seconds (default: 3600 = 1 hour)
         key_func: Optional function to generate custom identifier
+        store: Optional counter storage (default: the configured store)
 
     Usage:
         @rate_limit(max_requests=3, window_seconds=3600)
@@ -95,20 +186,22 @@ def rate_limit(max_requests=5, window_seconds=3600, key_func=None):
             else:
                 identifier = _get_client_identifier()
 
-            # Check rate limit
-            is_allowed, remaining, retry_after = check_rate_limit(
-                identifier, max_requests, window_seconds
-            )
+            # Check the limit and record this request in one step. A failing
+            # store lets the request through rather than failing the route
+            try:
+                is_allowed, remaining, retry_after = hit_rate_limit(
+                    identifier, max_requests, window_seconds, store=store
+                )
+            except Exception as e:
+                print(f"[RateLimit] Store error, allowing request: {str(e)}")
+                is_allowed = True
 
             if not is_allowed:
                 return jsonify({
                     "error": "Rate limit exceeded. Please try again later.",
                     "retry_after_seconds": retry_after,
                     "message": f"You can make {max_requests} requests per {window_seconds // 60} minutes."
-                }), 429
-
-            # Record this request
-            record_request(identifier)
+                }), 429, {"Retry-After": str(retry_after)}
 
             # Call the original function
             return f(*args, **kwargs)
@@ -0,0 +1,214 @@
+"""
+Metrics for the reminder scheduler.
+
+Counters, a reminder-lag histogram and timings of recent job runs, kept in the
+memory of the process that runs the jobs. Jobs run on whichever process is the
+elected leader (and manual runs elsewhere), so each finished run is also handed
+to a recorder that persists it (the scheduler_run table, see scheduler.py); the
+metrics endpoint summarizes those rows with summarize_runs. The in-memory view,
+and the Prometheus output built from it, cover one process only and are
+labelled with its pid.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Upper bounds (seconds) of the reminder-lag histogram buckets; the last bucket is +Inf
+LAG_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 3600)
+
+# How many recent runs to keep for the metrics endpoint
+RECENT_RUNS = 50
+
+
+class SchedulerMetrics:
+    """Thread-safe counters, lag histogram and run log"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recorder = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                "runs": 0,
+                "runs_failed": 0,
+                "runs_overlapping": 0,
+                "reminders_sent": 0,
+                "reminder_emails_sent": 0,
+                "reminders_failed": 0,
+                "reminders_expired": 0,
+            }
+            self.lag_bucket_counts = [0] * (len(LAG_BUCKETS) + 1)
+            self.lag_sum = 0.0
+            self.lag_count = 0
+            self.active_runs = 0
+            self.max_concurrent_runs = 0
+            self.recent_runs = deque(maxlen=RECENT_RUNS)
+
+    def set_recorder(self, recorder):
+        """Call recorder(run) with every finished run, e.g. to persist it"""
+        self._recorder = recorder
+
+    def inc(self, name, amount=1):
+        if not amount:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_lag(self, seconds, stats=None):
+        """
+        Record how late a reminder went out compared to its due time, here and,
+        if given, in the run's stats (which are persisted with the run)
+        """
+        seconds = max(seconds, 0.0)
+        index = _lag_bucket(seconds)
+        with self._lock:
+            self.lag_bucket_counts[index] += 1
+            self.lag_sum += seconds
+            self.lag_count += 1
+        if stats is not None:
+            lag = stats.setdefault("lag", {"buckets": [0] * (len(LAG_BUCKETS) + 1), "sum": 0.0, "count": 0})
+            lag["buckets"][index] += 1
+            lag["sum"] = round(lag["sum"] + seconds, 3)
+            lag["count"] += 1
+
+    @contextmanager
+    def track_run(self, job):
+        """
+        Time one job run. Yields a dict the run fills with its own stats; the
+        finished run is logged as one structured line and kept in the run log.
+        """
+        stats = {}
+        with self._lock:
+            overlapping = self.active_runs > 0
+            self.active_runs += 1
+            self.max_concurrent_runs = max(self.max_concurrent_runs, self.active_runs)
+            self.counters["runs"] += 1
+            if overlapping:
+                self.counters["runs_overlapping"] += 1
+
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        error = None
+        try:
+            yield stats
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            run = {
+                "job": job,
+                "started_at": started_at.isoformat(),
+                "duration_ms": duration_ms,
+                "overlapping": overlapping,
+                "error": error,
+                **stats,
+            }
+            with self._lock:
+                self.active_runs -= 1
+                if error is not None:
+                    self.counters["runs_failed"] += 1
+                self.recent_runs.append(run)
+            print("[Scheduler] " + " ".join(
+                f"{key}={value}" for key, value in run.items() if value is not None and key != "lag"
+            ))
+            if self._recorder is not None:
+                try:
+                    self._recorder(dict(run, started_at=started_at))
+                except Exception as e:
+                    print(f"[Scheduler] Failed to record {job} run: {str(e)}")
+
+    def snapshot(self):
+        """Everything the metrics endpoint reports, as plain JSON-able data"""
+        with self._lock:
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(list(LAG_BUCKETS) + ["+Inf"], self.lag_bucket_counts):
+                cumulative += count
+                buckets.append({"le": bound, "count": cumulative})
+            return {
+                "pid": os.getpid(),
+                "counters": dict(self.counters),
+                "active_runs": self.active_runs,
+                "max_concurrent_runs": self.max_concurrent_runs,
+                "reminder_lag_seconds": {
+                    "buckets": buckets,
+                    "sum": round(self.lag_sum, 3),
+                    "count": self.lag_count,
+                },
+                "recent_runs": list(self.recent_runs),
+            }
+
+    def to_prometheus(self, is_leader=False):
+        """
+        Render this process's counters and lag histogram in the Prometheus text
+        format, labelled with its pid and leadership. Scrape every worker and
+        sum across pids for the scheduler as a whole.
+        """
+        data = self.snapshot()
+        labels = f'pid="{data["pid"]}",leader="{str(bool(is_leader)).lower()}"'
+        lines = [
+            f"# Metrics of process {data['pid']} only; scheduler jobs run on the elected leader,",
+            "# so scrape every worker process and aggregate by pid",
+        ]
+        for name, value in data["counters"].items():
+            lines.append(f"# TYPE scheduler_{name}_total counter")
+            lines.append(f"scheduler_{name}_total{{{labels}}} {value}")
+        lines.append("# TYPE scheduler_active_runs gauge")
+        lines.append(f"scheduler_active_runs{{{labels}}} {data['active_runs']}")
+        lines.append("# TYPE scheduler_reminder_lag_seconds histogram")
+        for bucket in data["reminder_lag_seconds"]["buckets"]:
+            lines.append(f'scheduler_reminder_lag_seconds_bucket{{{labels},le="{bucket["le"]}"}} {bucket["count"]}')
+        lines.append(f"scheduler_reminder_lag_seconds_sum{{{labels}}} {data['reminder_lag_seconds']['sum']}")
+        lines.append(f"scheduler_reminder_lag_seconds_count{{{labels}}} {data['reminder_lag_seconds']['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _lag_bucket(seconds):
+    for index, bound in enumerate(LAG_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(LAG_BUCKETS)
+
+
+def summarize_runs(runs):
+    """
+    Counters and lag histogram over persisted runs (SchedulerRun.to_dict()),
+    from every process, in the same shape as SchedulerMetrics.snapshot()
+    """
+    counters = {
+        "runs": len(runs),
+        "runs_failed": sum(1 for run in runs if run.get("error")),
+        "runs_overlapping": sum(1 for run in runs if run.get("overlapping")),
+        "reminders_sent": sum(run.get("sent", 0) for run in runs),
+        "reminder_emails_sent": sum(run.get("emails_sent", 0) for run in runs),
+        "reminders_failed": sum(run.get("failed", 0) for run in runs),
+        "reminders_expired": sum(run.get("expired", 0) for run in runs),
+    }
+    bucket_counts = [0] * (len(LAG_BUCKETS) + 1)
+    lag_sum = 0.0
+    lag_count = 0
+    for run in runs:
+        lag = run.get("lag")
+        if lag:
+            bucket_counts = [total + count for total, count in zip(bucket_counts, lag["buckets"])]
+            lag_sum += lag["sum"]
+            lag_count += lag["count"]
+
+    cumulative = 0
+    buckets = []
+    for bound, count in zip(list(LAG_BUCKETS) + ["+Inf"], bucket_counts):
+        cumulative += count
+        buckets.append({"le": bound, "count": cumulative})
+    return {
+        "counters": counters,
+        "reminder_lag_seconds": {"buckets": buckets, "sum": round(lag_sum, 3), "count": lag_count},
+    }
+
+
+metrics = SchedulerMetrics()
@@ -0,0 +1,309 @@
+"""
+Fuzzy search over users and organizations.
+
+A search term matches a row when every word of the term is a substring of one
+of the row's search fields or close to a word in it by trigram similarity, so
+small typos ("smiht") still find the row. Rows are ranked by how well they
+match: prefix matches first, then substring matches, then typo matches.
+
+On PostgreSQL matching and ranking run in the database, on the pg_trgm GIN
+indexes over lower(field) (ix_user_*_search, ix_organization_name_search).
+Words shorter than MIN_TRIGRAM_WORD_LENGTH have no trigrams and no index could
+serve a substring match, so there they only match the start of a field, on
+btree text_pattern_ops indexes (ix_*_prefix). Only the first
+SEARCH_MAX_CANDIDATES (default 5000) matching rows are ranked, so a very broad
+term costs a bounded amount of work; the count stays exact.
+Other databases get the same behaviour from an in-process trigram index per
+worker. It is rebuilt after this worker changes a searchable field and at least
+every SEARCH_INDEX_REFRESH_SECONDS (default 60) to pick up other workers' writes.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from sqlalchemy import and_, case, func, literal, or_
+
+from extensions import db
+
+# Words of a search term that take part in matching; the rest are ignored
+MAX_TERM_WORDS = 4
+
+# Shorter words have no trigrams; on PostgreSQL they match as field prefixes
+MIN_TRIGRAM_WORD_LENGTH = 3
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _similarity_threshold():
+    return float(os.environ.get("SEARCH_SIMILARITY_THRESHOLD", 0.3))
+
+
+def _max_results():
+    return int(os.environ.get("SEARCH_MAX_RESULTS", 500))
+
+
+def _max_candidates():
+    return int(os.environ.get("SEARCH_MAX_CANDIDATES", 5000))
+
+
+def _refresh_seconds():
+    return float(os.environ.get("SEARCH_INDEX_REFRESH_SECONDS", 60))
+
+
+def term_words(term):
+    """Lower-cased words of a search term, as pg_trgm splits them"""
+    return _WORD_RE.findall(term.lower())[:MAX_TERM_WORDS]
+
+
+@lru_cache(maxsize=100_000)
+def trigrams(word):
+    """pg_trgm trigrams of one word: padded with two spaces in front, one behind"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _word_similarity(word, text_words, cache):
+    """
+    Best trigram similarity between the word and any of the text's words.
+    cache maps words already compared with this word to their similarity.
+    """
+    grams = trigrams(word)
+    best = 0.0
+    for other in text_words:
+        similarity = cache.get(other)
+        if similarity is None:
+            other_grams = trigrams(other)
+            similarity = cache[other] = len(grams & other_grams) / len(grams | other_grams)
+        best = max(best, similarity)
+    return best
+
+
+def _match_score(word, text, text_words, cache):
+    """Score of one term word against one field: 2 prefix, 1 substring, plus similarity"""
+    if text.startswith(word):
+        bonus = 2.0
+    elif word in text:
+        bonus = 1.0
+    else:
+        bonus = 0.0
+    return bonus + _word_similarity(word, text_words, cache)
+
+
+class NgramIndex:
+    """In-process trigram index over a few text fields per document"""
+
+    def __init__(self, documents):
+        self._fields = {}
+        self._postings = defaultdict(set)
+        for doc_id, fields in documents:
+            # (text, words) per field, split once here rather than on every search
+            fields = tuple((text, tuple(_WORD_RE.findall(text))) for text in ((field or "").lower() for field in fields))
+            self._fields[doc_id] = fields
+            for _, words in fields:
+                for word in words:
+                    for gram in trigrams(word):
+                        self._postings[gram].add(doc_id)
+
+    def _candidates(self, word, threshold):
+        """Documents that may match the word, by substring or by shared trigrams"""
+        if len(word) < 3:
+            # Too short for trigrams to narrow anything down
+            return self._fields.keys()
+        shared = Counter()
+        for gram in trigrams(word):
+            shared.update(self._postings.get(gram, ()))
+        # A similar word shares at least threshold * |grams| trigrams with the
+        # term; a containing word shares all len(word) - 2 inner ones
+        needed = min(math.ceil(threshold * len(trigrams(word))), len(word) - 2)
+        return [doc_id for doc_id, count in shared.items() if count >= needed]
+
+    def search(self, term, threshold):
+        """[(doc_id, score)] for documents matching every word, best first"""
+        words = term_words(term)
+        if not words:
+            return []
+
+        scores = Counter()
+        matched = None
+        for word in words:
+            word_matches = set()
+            cache = {}
+            for doc_id in self._candidates(word, threshold):
+                if matched is not None and doc_id not in matched:
+                    continue
+                best = max(_match_score(word, text, text_words, cache) for text, text_words in self._fields[doc_id])
+                if best >= threshold:
+                    word_matches.add(doc_id)
+                    scores[doc_id] += best
+            matched = word_matches
+            if not matched:
+                return []
+
+        return sorted(((doc_id, scores[doc_id]) for doc_id in matched), key=lambda item: (-item[1], item[0]))
+
+
+class SearchTarget:
+    """One searchable model: its id column and text fields, plus the fallback index"""
+
+    def __init__(self, model_name, field_names):
+        self.model_name = model_name
+        self.field_names = field_names
+        self._index = None
+        self._built_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        import models
+        return getattr(models, self.model_name)
+
+    def columns(self):
+        return [func.lower(getattr(self.model, name)) for name in self.field_names]
+
+    def invalidate(self):
+        """Rebuild the fallback index before the next search"""
+        self._stale = True
+
+    def _fallback_index(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._index is None or self._stale or now - self._built_at >= _refresh_seconds():
+                # Cleared before reading, so a write committed meanwhile marks it stale again
+                self._stale = False
+                model = self.model
+                rows = db.session.execute(
+                    db.select(model.id, *(getattr(model, name) for name in self.field_names))
+                ).all()
+                self._index = NgramIndex((row[0], row[1:]) for row in rows)
+                self._built_at = now
+            return self._index
+
+    def _postgresql_match(self, words):
+        """(condition, score) of the term words against the search fields"""
+        columns = self.columns()
+        db.session.execute(
+            db.text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+            {"threshold": str(_similarity_threshold())}
+        )
+
+        conditions = []
+        scores = []
+        # Term words are alphanumeric (see term_words), so they need no LIKE escaping
+        for word in words:
+            if len(word) < MIN_TRIGRAM_WORD_LENGTH:
+                # No trigrams to search by: a prefix match, served by the ix_*_prefix btrees
+                conditions.append(or_(*(column.like(f"{word}%") for column in columns)))
+                scores.append(func.greatest(*(
+                    case((column.like(f"{word}%"), 2.0), else_=0.0) for column in columns
+                )))
+                continue
+            # "word <% field" is the index-assisted form of word_similarity(word, field) >= threshold
+            conditions.append(or_(*(
+                or_(column.like(f"%{word}%"), literal(word).op("<%")(column))
+                for column in columns
+            )))
+            scores.append(func.greatest(*(
+                case(
+                    (column.like(f"{word}%"), 2.0),
+                    (column.like(f"%{word}%"), 1.0),
+                    else_=0.0
+                ) + func.word_similarity(word, column)
+                for column in columns
+            )))
+        return and_(*conditions), sum(scores[1:], scores[0])
+
+    def _search_postgresql(self, words, filters, limit):
+        model = self.model
+        condition, score = self._postgresql_match(words)
+        score = score.label("score")
+        # Rank a bounded set of matches: sorting every match of a broad term by
+        # similarity would read and score the whole table
+        candidates = (
+            db.select(model.id).where(condition, *filters).limit(max(_max_candidates(), limit)).scalar_subquery()
+        )
+        rows = db.session.execute(
+            db.select(model.id, score)
+            .where(model.id.in_(candidates))
+            .order_by(score.desc(), model.id)
+            .limit(limit)
+        ).all()
+        return [(row.id, float(row.score)) for row in rows]
+
+    def _search_fallback(self, term, filters, limit):
+        """Ranked matches passing the filters; limit None for all of them"""
+        ranked = self._fallback_index().search(term, _similarity_threshold())
+        if not filters:
+            return ranked[:limit]
+
+        # Filters live in the database; keep the ranked ids that pass them
+        model = self.model
+        results = []
+        for start in range(0, len(ranked), 500):
+            chunk = ranked[start:start + 500]
+            allowed = set(db.session.execute(
+                db.select(model.id).where(model.id.in_([doc_id for doc_id, _ in chunk]), *filters)
+            ).scalars())
+            results.extend(item for item in chunk if item[0] in allowed)
+            if limit is not None and len(results) >= limit:
+                break
+        return results[:limit]
+
+    def search(self, term, *filters, limit=None):
+        """
+        [(id, score)] of rows matching the term and the extra SQL filters, best
+        match first, at most limit of them (default SEARCH_MAX_RESULTS, 500).
+        count() gives the uncapped number of matches.
+        """
+        words = term_words(term)
+        if not words:
+            return []
+        limit = limit or _max_results()
+        if db.engine.dialect.name == "postgresql":
+            return self._search_postgresql(words, filters, limit)
+        return self._search_fallback(term, filters, limit)
+
+    def count(self, term, *filters):
+        """Number of rows matching the term and filters, without the result cap"""
+        words = term_words(term)
+        if not words:
+            return 0
+        if db.engine.dialect.name == "postgresql":
+            condition, _ = self._postgresql_match(words)
+            return db.session.execute(
+                db.select(func.count(self.model.id)).where(condition, *filters)
+            ).scalar_one()
+        return len(self._search_fallback(term, filters, None))
+
+
+users = SearchTarget("User", ("first_name", "last_name", "email"))
+organizations = SearchTarget("Organization", ("name",))
+
+TARGETS = {target.model_name: target for target in (users, organizations)}
+
+
+def search_users(term, *filters, limit=None):
+    """Ranked [(user_id, score)] for the term; see SearchTarget.search"""
+    return users.search(term, *filters, limit=limit)
+
+
+def count_users(term, *filters):
+    """Number of users matching the term; see SearchTarget.count"""
+    return users.count(term, *filters)
+
+
+def search_organizations(term, *filters, limit=None):
+    """Ranked [(organization_id, score)] for the term; see SearchTarget.search"""
+    return organizations.search(term, *filters, limit=limit)
+
+
+def invalidate(model_names):
+    """Mark the fallback indexes of the changed models stale"""
+    for model_name in model_names:
+        target = TARGETS.get(model_name)
+        if target is not None:
+            target.invalidate()
@@ -0,0 +1,166 @@
+"""
+Revoked-token blocklist.
+
+Revoked JWT IDs live in the revoked_token table. Each worker mirrors them in a
+Bloom filter that it tops up at most every REVOCATION_SYNC_SECONDS (default 5).
+A sync reads the rows revoked since REVOCATION_SYNC_OVERLAP_SECONDS (default 60)
+before the previous sync, not the rows with a higher id, because concurrent
+transactions can commit ids out of order; rows seen in the overlap before are
+skipped. A token the filter has never seen is certainly not revoked and skips the
+database; only filter hits (revoked tokens and the rare false positive) are
+confirmed with a query.
+
+A token revoked by another worker is therefore rejected everywhere within one
+sync interval. Expired rows are purged and the filter rebuilt every
+REVOCATION_REBUILD_SECONDS (default 3600), since a Bloom filter cannot forget.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.size_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RevocationList:
+    """Per-worker Bloom-filter mirror of the revoked_token table"""
+
+    def __init__(self, capacity=None, sync_seconds=None, rebuild_seconds=None, overlap_seconds=None):
+        self.initial_capacity = capacity or int(os.environ.get("REVOCATION_BLOOM_CAPACITY", 100_000))
+        self.sync_seconds = sync_seconds if sync_seconds is not None else float(os.environ.get("REVOCATION_SYNC_SECONDS", 5))
+        self.rebuild_seconds = rebuild_seconds if rebuild_seconds is not None else float(os.environ.get("REVOCATION_REBUILD_SECONDS", 3600))
+        # Longer than any revoking transaction (plus clock skew between workers)
+        self.overlap = timedelta(seconds=overlap_seconds if overlap_seconds is not None else float(os.environ.get("REVOCATION_SYNC_OVERLAP_SECONDS", 60)))
+        self._lock = threading.Lock()
+        self._filter = None
+        # The next sync reads rows revoked at or after this time
+        self._sync_from = None
+        # jti -> revoked_at of the rows already in the filter that a sync can read again
+        self._recent = {}
+        self._synced_at = 0.0
+        self._built_at = 0.0
+        self.db_checks = 0
+        self.false_positives = 0
+
+    # Filter upkeep uses its own connection, so it never touches the request's session
+
+    def _rebuild(self, now):
+        from models import RevokedToken
+        from extensions import db
+
+        table = RevokedToken.__table__
+        started_at = _utcnow()
+        with db.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.expires_at <= started_at))
+            rows = connection.execute(db.select(table.c.jti, table.c.revoked_at)).all()
+        bloom = BloomFilter(max(self.initial_capacity, len(rows) * 2))
+        for jti, revoked_at in rows:
+            bloom.add(jti)
+        self._filter = bloom
+        self._sync_from = started_at - self.overlap
+        self._recent = {jti: revoked_at for jti, revoked_at in rows if revoked_at >= self._sync_from}
+        self._synced_at = self._built_at = now
+
+    def _sync(self, now):
+        from models import RevokedToken
+        from extensions import db
+
+        table = RevokedToken.__table__
+        started_at = _utcnow()
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                db.select(table.c.jti, table.c.revoked_at).where(table.c.revoked_at >= self._sync_from)
+            ).all()
+        for jti, revoked_at in rows:
+            if jti not in self._recent:
+                self._filter.add(jti)
+                self._recent[jti] = revoked_at
+        self._sync_from = started_at - self.overlap
+        # Rows older than the next sync's window are never read again
+        self._recent = {jti: revoked_at for jti, revoked_at in self._recent.items() if revoked_at >= self._sync_from}
+        self._synced_at = now
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._synced_at < self.sync_seconds:
+            return
+        with self._lock:
+            if self._filter is None or now - self._built_at >= self.rebuild_seconds:
+                self._rebuild(now)
+            elif now - self._synced_at >= self.sync_seconds:
+                self._sync(now)
+                if self._filter.count > self._filter.capacity:
+                    # Past capacity the false-positive rate climbs; rebuild at twice the size
+                    self._rebuild(now)
+
+    def is_revoked(self, jti):
+        """Whether the token with this JWT ID has been revoked"""
+        if not jti:
+            return False
+        self._refresh()
+        if jti not in self._filter:
+            return False
+
+        from models import RevokedToken
+        from extensions import db
+
+        self.db_checks += 1
+        table = RevokedToken.__table__
+        with db.engine.connect() as connection:
+            revoked = connection.execute(db.select(table.c.id).where(table.c.jti == jti)).first() is not None
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    def revoke(self, jwt_payload):
+        """Revoke the token (caller commits). This worker rejects it immediately."""
+        from models import RevokedToken
+        from extensions import db
+
+        jti = jwt_payload["jti"]
+        revoked_at = _utcnow()
+        if db.session.execute(db.select(RevokedToken.id).where(RevokedToken.jti == jti)).first() is None:
+            db.session.add(RevokedToken(
+                jti=jti,
+                user_id=jwt_payload.get("user_id"),
+                expires_at=datetime.fromtimestamp(jwt_payload["exp"], timezone.utc).replace(tzinfo=None),
+                revoked_at=revoked_at
+            ))
+        self._refresh()
+        with self._lock:
+            if jti not in self._recent:
+                self._filter.add(jti)
+                self._recent[jti] = revoked_at
+
+
+revocation_list = RevocationList()
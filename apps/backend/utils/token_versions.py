@@ -0,0 +1,67 @@
+"""
+Per-user token versions.
+
+Every access token carries the token_version its user had when it was issued.
+Changing a user's role or organization bumps the version (see the before_flush
+hook in models.py), so tokens with outdated role and organization claims stop
+being accepted and authorization can trust the claims without loading the user.
+
+Current versions are cached in memory for TOKEN_VERSION_CACHE_SECONDS (default
+30). The process that made a change drops its cache entry immediately; other
+workers pick the new version up when their entry expires.
+"""
+import os
+import threading
+import time
+
+# Cap on cached users; the cache is simply emptied when it fills up
+MAX_CACHED_USERS = 10_000
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _ttl_seconds():
+    return float(os.environ.get("TOKEN_VERSION_CACHE_SECONDS", 30))
+
+
+def current_version(user_id):
+    """The user's current token version, or None if the user no longer exists"""
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(user_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    from models import User
+    from extensions import db
+
+    version = db.session.execute(
+        db.select(User.token_version).where(User.id == user_id)
+    ).scalar_one_or_none()
+    with _lock:
+        if len(_cache) >= MAX_CACHED_USERS:
+            _cache.clear()
+        _cache[user_id] = (version, now + _ttl_seconds())
+    return version
+
+
+def forget(user_ids):
+    """Drop cached versions after they changed"""
+    with _lock:
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+
+
+def is_stale(jwt_payload):
+    """
+    Whether the token was issued before its user's latest role or organization
+    change, or for a user that no longer exists. Tokens from before token
+    versions existed carry no version; they count as version 0 (the column's
+    default), so they stay valid until their user's first change instead of
+    logging everyone out on deploy (see load_auth_context for their claims).
+    """
+    user_id = jwt_payload.get("user_id")
+    if user_id is None:
+        return True
+    return current_version(user_id) != jwt_payload.get("token_version", 0)
@@ -0,0 +1,271 @@
+"""
+Bulk user provisioning from CSV.
+
+The CSV is read row by row, never held in memory as a whole. Valid rows are
+collected in chunks of USER_IMPORT_CHUNK_SIZE (default 500); per chunk, emails
+already registered and unknown organizations are looked up with one query each,
+passwords are hashed across the hashing pool (see hash_passwords) and the users
+are inserted with a single executemany INSERT and committed. A chunk that still
+hits a constraint (say, an account registered meanwhile) is retried row by row
+in savepoints, so only the offending rows fail, each with its own reason.
+
+Supplied passwords are hashed at BCRYPT_LOG_ROUNDS, like any other password.
+USER_IMPORT_LOG_ROUNDS, if set, hashes them at that cost instead to speed up
+large imports; they are then upgraded to BCRYPT_LOG_ROUNDS the first time their
+owner logs in (see needs_rehash). Rows without a password get an unusable one
+and a set-password link in the result: a password reset token, valid for 30
+minutes, after which users can request a new one with "forgot password". Files
+longer than USER_IMPORT_MAX_ROWS (default 50000) are imported up to that row
+and reported as truncated.
+"""
+import csv
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from utils.password_hashing import hash_passwords, log_rounds
+from utils.validators import clean_string, is_strong_password, is_valid_email, normalize_email
+
+REQUIRED_COLUMNS = ("email", "first_name", "last_name")
+
+# Admins are never provisioned in bulk
+IMPORTABLE_ROLES = ("guest", "team_member", "organizer")
+
+# Column lengths of the user table
+MAX_NAME_LENGTH = 150
+MAX_EMAIL_LENGTH = 150
+
+
+class UserImportError(Exception):
+    """The file as a whole cannot be imported (empty, missing columns)"""
+
+
+def _chunk_size():
+    return int(os.environ.get("USER_IMPORT_CHUNK_SIZE", 500))
+
+
+def _max_rows():
+    return int(os.environ.get("USER_IMPORT_MAX_ROWS", 50_000))
+
+
+def _import_log_rounds():
+    rounds = os.environ.get("USER_IMPORT_LOG_ROUNDS")
+    return int(rounds) if rounds else log_rounds()
+
+
+def _parse_row(row):
+    """Validated user fields of one CSV row; raises ValueError with the reason"""
+    email = normalize_email(clean_string(row.get("email") or ""))
+    first_name = clean_string(row.get("first_name") or "")
+    last_name = clean_string(row.get("last_name") or "")
+    role = clean_string(row.get("role") or "").lower() or "guest"
+    organization_id = clean_string(row.get("organization_id") or "")
+    password = row.get("password") or ""
+
+    if not email or not is_valid_email(email) or len(email) > MAX_EMAIL_LENGTH:
+        raise ValueError("Invalid email address")
+    if not first_name or not last_name:
+        raise ValueError("First and last name are required")
+    if len(first_name) > MAX_NAME_LENGTH or len(last_name) > MAX_NAME_LENGTH:
+        raise ValueError(f"Names must be at most {MAX_NAME_LENGTH} characters")
+    if role not in IMPORTABLE_ROLES:
+        raise ValueError(f"Invalid role. Valid roles are: {', '.join(IMPORTABLE_ROLES)}")
+
+    if organization_id:
+        try:
+            organization_id = int(organization_id)
+        except ValueError:
+            raise ValueError("organization_id must be a number")
+    else:
+        organization_id = None
+    if role == "team_member" and organization_id is None:
+        raise ValueError("Team members need an organization_id")
+    if role == "guest":
+        organization_id = None
+
+    if password and not is_strong_password(password):
+        raise ValueError(
+            "Password must be at least 8 characters long and include uppercase, lowercase, numeric, and special characters."
+        )
+
+    return {
+        "email": email,
+        "first_name": first_name,
+        "last_name": last_name,
+        "role": role,
+        "organization_id": organization_id,
+        "password": password or None,
+    }
+
+
+class UserImport:
+    """One CSV import; run() returns the summary the admin route responds with"""
+
+    def __init__(self):
+        self.chunk_size = _chunk_size()
+        self.max_rows = _max_rows()
+        self.log_rounds = _import_log_rounds()
+        self.imported = 0
+        self.errors = []
+        self.set_password_links = []
+        self._seen_emails = set()
+        self._organizations = {}
+        self._unusable_hash = None
+        self._frontend_url = os.environ.get("FRONTEND_URL", "http://localhost:3000")
+
+    def _fail(self, line, email, error):
+        self.errors.append({"row": line, "email": email or None, "error": error})
+
+    def run(self, lines):
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None:
+            raise UserImportError("The file is empty")
+        reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+        missing = [name for name in REQUIRED_COLUMNS if name not in reader.fieldnames]
+        if missing:
+            raise UserImportError(f"Missing columns: {', '.join(missing)}")
+
+        chunk = []
+        rows = 0
+        truncated = False
+        for row in reader:
+            if rows >= self.max_rows:
+                # Rows already committed stay; the rest of the file is left for another import
+                truncated = True
+                break
+            rows += 1
+            line = reader.line_num
+            try:
+                user = _parse_row(row)
+            except ValueError as e:
+                self._fail(line, normalize_email(row.get("email") or ""), str(e))
+                continue
+            if user["email"] in self._seen_emails:
+                self._fail(line, user["email"], "Duplicate email in file")
+                continue
+            self._seen_emails.add(user["email"])
+            user["line"] = line
+            chunk.append(user)
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+
+        return {
+            "rows": rows,
+            "truncated": truncated,
+            "imported": self.imported,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "set_password_links": self.set_password_links,
+        }
+
+    def _check_organizations(self, chunk):
+        from models import Organization
+
+        unknown = {user["organization_id"] for user in chunk if user["organization_id"] is not None} - self._organizations.keys()
+        if unknown:
+            active = set(db.session.execute(
+                db.select(Organization.id).where(Organization.id.in_(unknown), Organization.deleted_at.is_(None))
+            ).scalars())
+            self._organizations.update((org_id, org_id in active) for org_id in unknown)
+
+        valid = []
+        for user in chunk:
+            if user["organization_id"] is not None and not self._organizations[user["organization_id"]]:
+                self._fail(user["line"], user["email"], "Organization not found")
+            else:
+                valid.append(user)
+        return valid
+
+    def _check_emails(self, chunk):
+        from models import User
+
+        taken = set(db.session.execute(
+            db.select(User.email).where(User.email.in_([user["email"] for user in chunk]))
+        ).scalars())
+        valid = []
+        for user in chunk:
+            if user["email"] in taken:
+                self._fail(user["line"], user["email"], "Email already registered")
+            else:
+                valid.append(user)
+        return valid
+
+    def _password_hashes(self, chunk):
+        hashes = iter(hash_passwords([user["password"] for user in chunk if user["password"]], self.log_rounds))
+        if self._unusable_hash is None and not all(user["password"] for user in chunk):
+            # One hash of a discarded random secret serves every row without a password
+            self._unusable_hash = hash_passwords([os.urandom(32).hex()], self.log_rounds)[0]
+        return [next(hashes) if user["password"] else self._unusable_hash for user in chunk]
+
+    def _constraint_error(self, user, error):
+        """Why the row's INSERT failed: the email was taken meanwhile, or the database's own message"""
+        from models import User
+
+        if db.session.execute(db.select(User.id).where(User.email == user["email"])).first() is not None:
+            return "Email already registered"
+        # e.g. a foreign key failure: the organization was deleted meanwhile
+        return f"Could not be inserted: {error.orig}"
+
+    def _import_chunk(self, chunk):
+        from models import User
+
+        chunk = self._check_emails(self._check_organizations(chunk))
+        if not chunk:
+            return
+
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        params = [
+            {
+                "email": user["email"],
+                "first_name": user["first_name"],
+                "last_name": user["last_name"],
+                "password": password_hash,
+                "role": user["role"],
+                "organization_id": user["organization_id"],
+                "created_at": created_at,
+                "pending_organizer_approval": False,
+                "token_version": 0,
+            }
+            for user, password_hash in zip(chunk, self._password_hashes(chunk))
+        ]
+
+        # Bulk INSERTs skip the flush hooks; the search indexes must still hear of the new users
+        try:
+            db.session.execute(insert(User), params)
+            db.session.info.setdefault("search_changed", set()).add("User")
+            db.session.commit()
+            inserted = chunk
+        except IntegrityError:
+            db.session.rollback()
+            inserted = []
+            for user, values in zip(chunk, params):
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(insert(User), [values])
+                    inserted.append(user)
+                except IntegrityError as e:
+                    self._fail(user["line"], user["email"], self._constraint_error(user, e))
+            db.session.info.setdefault("search_changed", set()).add("User")
+            db.session.commit()
+
+        self.imported += len(inserted)
+        for user in inserted:
+            if not user["password"]:
+                token = User.reset_token_for_email(user["email"])
+                self.set_password_links.append({
+                    "row": user["line"],
+                    "email": user["email"],
+                    "url": f"{self._frontend_url}/reset-password?token={token}",
+                })
+        print(f"[UserImport] Imported {len(inserted)} of {len(chunk)} users, {self.imported} so far")
+
+
+def import_users(lines):
+    """Import users from CSV text lines; see UserImport.run for the result"""
+    return UserImport().run(lines)
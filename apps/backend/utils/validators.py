@@ -24,6 +24,16 @@ def is_valid_email(email):
     return re.match(email_regex, email.strip()) is not None
 
 
+def normalize_email(email):
+    """
+    Canonical form emails are stored and looked up in: trimmed and lower-cased.
+    Non-strings are returned unchanged so validation can still reject them.
+    """
+    if not isinstance(email, str):
+        return email
+    return email.strip().lower()
+
+
 def is_strong_password(password):
     """Validate password strength"""
     return (
@@ -35,6 +45,16 @@ def is_strong_password(password):
     )
 
 
+def is_valid_reminder_offsets(offsets):
+    """Validate a list of reminder offsets in minutes before an event (max 30 days, 10 entries)"""
+    if not isinstance(offsets, list) or len(offsets) > 10:
+        return False
+    return all(
+        isinstance(offset, int) and not isinstance(offset, bool) and 0 < offset <= 30 * 24 * 60
+        for offset in offsets
+    )
+
+
 def sanitize_input(text):
     """Sanitize user input to prevent injection attacks"""
     if not text or not isinstance(text, str):
@@ -159,7 +159,7 @@ export default function SettingsPage() {
       await apiClient.deleteAccount(trimmedPassword);
 
       // Logout and redirect
-      logout();
+      await logout();
       router.push('/login?deleted=true');
     } catch (error: unknown) {
       const errorMessage = error instanceof Error ? error.message : 'Failed to delete account';
@@ -9,7 +9,7 @@ import {
   logout,
   clearError
 } from '@/lib/redux/features/authSlice';
-import { LoginRequest, RegisterRequest } from '@/lib/api';
+import { apiClient, LoginRequest, RegisterRequest } from '@/lib/api';
 import { useRouter } from 'next/navigation';
 
 export function useReduxAuth() {
@@ -51,7 +51,9 @@ export function useReduxAuth() {
     return result.payload;
   };
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    // Revoke the token server-side before the local session is cleared
+    await apiClient.logout();
     dispatch(logout());
     router.push('/login');
   };
@@ -285,7 +285,19 @@ class ApiClient {
   }
 
   async logout() {
-    this.clearToken();
+    try {
+      // Revoke the token server-side; the local session is cleared either way
+      if (this.getToken()) {
+        await this.request('/api/auth/logout', { method: 'POST' });
+      }
+    } catch (error) {
+      // An expired or already revoked token (401) needs no revoking
+      if (!(error instanceof ApiError && error.status === 401)) {
+        console.error('Failed to revoke token on logout:', error);
+      }
+    } finally {
+      this.clearToken();
+    }
   }
 
   async getUserProfile(): Promise<{user: User}> {
@@ -333,19 +345,32 @@ class ApiClient {
     return this.request('/api/auth/my-invitations');
   }
 
-  async acceptInvitation(invitationId: number): Promise<ApiResponse> {
-    return this.request('/api/auth/accept-invitation', {
+  async acceptInvitation(invitationId: number): Promise<ApiResponse & { token?: string }> {
+    const response = await this.request<ApiResponse & { token?: string }>('/api/auth/accept-invitation', {
       method: 'POST',
       body: JSON.stringify({ invitation_id: invitationId }),
     });
+
+    // Joining an organization invalidates the old token
+    if (response.token) {
+      this.setToken(response.token);
+    }
+
+    return response;
   }
 
   // Organization endpoints
-  async createOrganization(data: CreateOrganizationRequest): Promise<ApiResponse & { organization: Organization }> {
-    return this.request('/api/organization/create', {
+  async createOrganization(data: CreateOrganizationRequest): Promise<ApiResponse & { organization: Organization; token?: string }> {
+    const response = await this.request<ApiResponse & { organization: Organization; token?: string }>('/api/organization/create', {
       method: 'POST',
       body: JSON.stringify(data),
     });
+
+    if (response.token) {
+      this.setToken(response.token);
+    }
+
+    return response;
   }
 
   async getOrganization(orgId: number): Promise<ApiResponse & { organization: Organization }> {
@@ -359,10 +384,16 @@ class ApiClient {
     });
   }
 
-  async deleteOrganization(orgId: number): Promise<ApiResponse> {
-    return this.request(`/api/organization/${orgId}`, {
+  async deleteOrganization(orgId: number): Promise<ApiResponse & { token?: string }> {
+    const response = await this.request<ApiResponse & { token?: string }>(`/api/organization/${orgId}`, {
       method: 'DELETE',
     });
+
+    if (response.token) {
+      this.setToken(response.token);
+    }
+
+    return response;
   }
 
   async getOrganizationMembers(orgId: number): Promise<ApiResponse & { members: OrganizationMember[], member_count: number }> {
@@ -389,10 +420,16 @@ class ApiClient {
     });
   }
 
-  async leaveOrganization(): Promise<ApiResponse> {
-    return this.request('/api/organization/leave', {
+  async leaveOrganization(): Promise<ApiResponse & { token?: string }> {
+    const response = await this.request<ApiResponse & { token?: string }>('/api/organization/leave', {
       method: 'POST',
     });
+
+    if (response.token) {
+      this.setToken(response.token);
+    }
+
+    return response;
   }
 
   async getOrganizations(filter: 'all' | 'active' | 'deleted' = 'active'): Promise<ApiResponse & { organizations: Organization[], count: number }> {
@@ -495,6 +532,8 @@ class ApiClient {
     page: number;
     per_page: number;
     total_pages: number;
+    has_more: boolean;
+    next_cursor: string | null;
   }> {
     const queryParams = new URLSearchParams();
     if (params?.page) queryParams.append('page', params.page.toString());